@@ -0,0 +1,7 @@
+"""
+client-side overhead of ripley measured with a stub driver: no ClickHouse server is required.
+
+    python -m benchmarks [--output results.json] [--baseline previous.json] [--tolerance 0.2]
+
+Each bench_* module has run() -> {name: {metric: value}} and can be started alone: python -m benchmarks.bench_*
+"""
@@ -0,0 +1,68 @@
+import argparse
+import json
+import platform
+import sys
+from typing import Dict
+
+from benchmarks import bench_get_records, bench_run_cmd, bench_s3_mapping, bench_sql_render
+
+_BENCHMARKS = {
+    'get_records': bench_get_records,
+    'run_cmd': bench_run_cmd,
+    'sql_render': bench_sql_render,
+    's3_mapping': bench_s3_mapping,
+}
+
+
+def get_regressions(results: Dict[str, dict], baseline: Dict[str, dict], tolerance: float) -> Dict[str, dict]:
+    """
+    benchmarks which are slower than {baseline} by more than {tolerance} (0.2 = 20%)
+    """
+    regressions = {}
+    for name, metrics in results.items():
+        previous = baseline.get(name)
+        if not previous or not previous.get('ops_per_sec'):
+            continue
+
+        change = metrics['ops_per_sec'] / previous['ops_per_sec'] - 1
+        if change < -tolerance:
+            regressions[name] = {'ops_per_sec': metrics['ops_per_sec'], 'baseline': previous['ops_per_sec'],
+                                 'change': round(change, 3)}
+
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description=__doc__)
+    parser.add_argument('--output', help='JSON file of results. Default: stdout')
+    parser.add_argument('--baseline', help='JSON file of previous results')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed slowdown vs baseline')
+    parser.add_argument('--only', nargs='*', choices=sorted(_BENCHMARKS), help='benchmarks to run. Default: all')
+    args = parser.parse_args()
+
+    results = {}
+    for group, module in _BENCHMARKS.items():
+        if args.only and group not in args.only:
+            continue
+
+        for name, metrics in module.run().items():
+            results[f'{group}.{name}'] = metrics
+
+    report = {'python': platform.python_version(), 'platform': platform.platform(), 'results': results}
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)['results']
+        report['regressions'] = get_regressions(results, baseline, args.tolerance)
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    return 1 if report.get('regressions') else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
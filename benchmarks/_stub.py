@@ -0,0 +1,83 @@
+import time
+import tracemalloc
+from dataclasses import fields
+from typing import Any, Callable, Iterator, List, Tuple, Type
+
+from ripley._clickhouse.client_pool import SingleClientPool
+from ripley._clickhouse.cmd_service import CmdService
+
+_COLUMN_TYPES = {int: 'UInt64', str: 'String'}
+
+
+class _StubConnection:
+    database = 'default'
+
+    def ping(self) -> bool:
+        return True
+
+
+class StubClient:
+    """
+    clickhouse_driver.Client replacement: returns the same synthetic result for any query
+    """
+
+    def __init__(self, data: list = None, columns: list = None) -> None:
+        self._data = data or []
+        self._columns = columns or []
+        self.last_query = None
+
+    def get_connection(self) -> _StubConnection:
+        return _StubConnection()
+
+    def execute(self, sql: str, params: dict = None, with_column_types: bool = False, settings: dict = None, **kwargs):
+        return (self._data, self._columns) if with_column_types else self._data
+
+    def execute_iter(self, sql: str, params: dict = None, with_column_types: bool = False, settings: dict = None,
+                     **kwargs) -> Iterator[Any]:
+        if with_column_types:
+            yield self._columns
+
+        yield from self._data
+
+
+def get_model_result(model: Type, rows: int) -> Tuple[List[tuple], List[Tuple[str, str]]]:
+    """
+    synthetic (rows, column_types) of {model} fields
+    """
+    columns = [(field.name, _COLUMN_TYPES.get(field.type, 'Nullable(UInt64)')) for field in fields(model)]
+    data = [
+        tuple(f'{name}_{ix}' if type_ == 'String' else ix for name, type_ in columns)
+        for ix in range(rows)
+    ]
+    return data, columns
+
+
+def get_cmd(client: StubClient) -> CmdService:
+    return CmdService(SingleClientPool(client))
+
+
+def measure(func: Callable[[], Any], count: int = 1, repeat: int = 3) -> dict:
+    """
+    best of {repeat} runs. {count} - number of operations (rows, commands) processed by one call of {func}
+    """
+    best = min(_elapsed(func) for _ in range(repeat))
+    return {'ops_per_sec': int(count / best), 'us_per_op': round(best / count * 1_000_000, 3)}
+
+
+def measure_memory(func: Callable[[], Any], count: int = 1) -> dict:
+    """
+    bytes allocated by one call of {func} per operation
+    """
+    tracemalloc.start()
+    result = func()
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+
+    return {'bytes_per_op': allocated // count}
+
+
+def _elapsed(func: Callable) -> float:
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
@@ -0,0 +1,62 @@
+"""
+get_records / iter_records row materialization: 100k system.columns rows, 100k system.parts rows.
+'columns_legacy' is mapping before precompiled mappers: dict + model(**params) on a plain dataclass.
+
+    python -m benchmarks.bench_get_records [rows]
+"""
+import json
+import re
+import sys
+from dataclasses import fields, make_dataclass
+from typing import Any, List, Type
+
+from benchmarks._stub import StubClient, get_cmd, get_model_result, measure, measure_memory
+from ripley.clickhouse_models.column import ClickhouseColumnModel
+from ripley.clickhouse_models.partition import ClickhousePartitionModel
+
+# model / mapping before precompiled mappers: plain dataclass with __dict__
+_LegacyColumnModel = make_dataclass(
+    'LegacyColumnModel',
+    [(field.name, field.type, field) for field in fields(ClickhouseColumnModel)],
+)
+
+
+def legacy_get_records(client: StubClient, sql: str, model: Type) -> List[Any]:
+    data, columns = client.execute(sql, with_column_types=True)
+    columns = [re.sub(r'\W', '_', name) for name, type_ in columns]
+    records = []
+
+    for rec in data:
+        params = {columns[ix_]: value_ for ix_, value_ in enumerate(rec)}
+        records.append(model(**params) if model else params)
+
+    return records
+
+
+def _get_records(model: Type, rows: int, legacy: bool = False, stream: bool = False) -> dict:
+    client = StubClient(*get_model_result(model, rows))
+    cmd = get_cmd(client)
+    sql = 'SELECT * FROM system.table'
+
+    def func() -> List[Any]:
+        if legacy:
+            return legacy_get_records(client, sql, _LegacyColumnModel)
+        if stream:
+            return list(cmd.iter_records(sql, model=model))
+        return cmd.get_records(sql, model=model)
+
+    assert len(func()) == rows
+    return {**measure(func, rows), **measure_memory(func, rows)}
+
+
+def run(rows: int = 100_000) -> dict:
+    return {
+        'columns_legacy': _get_records(ClickhouseColumnModel, rows, legacy=True),
+        'columns': _get_records(ClickhouseColumnModel, rows),
+        'columns_iter': _get_records(ClickhouseColumnModel, rows, stream=True),
+        'parts': _get_records(ClickhousePartitionModel, rows),
+    }
+
+
+if __name__ == '__main__':
+    print(json.dumps(run(*map(int, sys.argv[1:2])), indent=2))
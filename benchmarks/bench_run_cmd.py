@@ -0,0 +1,52 @@
+"""
+CmdService.run_cmd overhead per command: deepcopy of params, ON CLUSTER check, logging, rendering,
+metadata cache invalidation, query hooks. 'exec' is the baseline: rendered SQL sent without run_cmd.
+
+    python -m benchmarks.bench_run_cmd [width]
+"""
+import json
+import sys
+
+from benchmarks._stub import StubClient, get_cmd, measure
+from benchmarks.bench_sql_render import _get_samples
+from ripley._sql_cmd.clickhouse import InsertFromS3Cmd, TruncateOnClusterCmd
+
+
+def run(width: int = 1_000, count: int = 1_000) -> dict:
+    samples = _get_samples(width)
+    wide_params = dict(
+        table_name='db.table',
+        s3_settings=samples['s3_settings'],
+        fields=samples['fields'],
+        field_types=samples['field_types'],
+    )
+    small_params = dict(table_name='db.table')
+    cmd = get_cmd(StubClient())
+    sql = InsertFromS3Cmd(**wide_params).to_sql()
+
+    def _exec() -> None:
+        for _ in range(count):
+            cmd.exec(sql)
+
+    def _run_small() -> None:
+        for _ in range(count):
+            cmd.run_cmd(TruncateOnClusterCmd, model_params=small_params)
+
+    def _run_wide() -> None:
+        for _ in range(count):
+            cmd.run_cmd(InsertFromS3Cmd, model_params=wide_params)
+
+    results = {
+        'exec': measure(_exec, count),
+        'run_cmd_small': measure(_run_small, count),
+        'run_cmd_wide': measure(_run_wide, count),
+    }
+
+    cmd.set_metadata_cache()
+    cmd.set_query_stats()
+    results['run_cmd_small_cache_stats'] = measure(_run_small, count)
+    return results
+
+
+if __name__ == '__main__':
+    print(json.dumps(run(*map(int, sys.argv[1:2])), indent=2))
@@ -0,0 +1,48 @@
+"""
+insert_from_s3 column mapping of wide tables: plain mapping and S3SelectSettingsModel with name transformer
+and convertors. Columns are served by stub system.columns.
+
+    python -m benchmarks.bench_s3_mapping [columns]
+"""
+import json
+import sys
+
+from benchmarks._stub import StubClient, get_cmd, get_model_result, measure
+from ripley._clickhouse.system_service import SystemService
+from ripley._clickhouse.table_service import TableService
+from ripley.clickhouse_models.column import ClickhouseColumnModel
+from ripley.clickhouse_models.s3_settings import S3SelectSettingsModel
+from ripley.clickhouse_models.table import ClickhouseTableModel
+
+
+def run(columns: int = 2_000, count: int = 20) -> dict:
+    data, column_types = get_model_result(ClickhouseColumnModel, columns)
+    cmd = get_cmd(StubClient(data, column_types))
+    service = TableService(None, SystemService(cmd), cmd)
+    table = ClickhouseTableModel.__new__(ClickhouseTableModel)
+    table.database = 'db'
+    table.name = 'table'
+
+    names = [rec[2] for rec in data]
+    select_settings = S3SelectSettingsModel(
+        s3_file_name_column=names[0],
+        field_name_transformer=lambda name: f'{{{name}}}',
+        field_convertors=[[names[1::2], 'String', lambda name: f'toUInt64({name})']],
+    )
+
+    def _map(s3_select_settings: S3SelectSettingsModel = None):
+        def _run() -> None:
+            for _ in range(count):
+                fields, field_types = service._get_s3_fields(table, s3_select_settings)
+                fields('https://bucket.s3.amazonaws.com/file.csv')
+
+        return _run
+
+    return {
+        'plain': measure(_map(), count * columns),
+        'select_settings': measure(_map(select_settings), count * columns),
+    }
+
+
+if __name__ == '__main__':
+    print(json.dumps(run(*map(int, sys.argv[1:2])), indent=2))
@@ -0,0 +1,109 @@
+"""
+to_sql / __repr__ rendering of every command of ripley._sql_cmd with sample parameters.
+Lists (fields, urls, manifest items, alter actions) have {width} items.
+
+    python -m benchmarks.bench_sql_render [width]
+"""
+import inspect
+import json
+import sys
+from typing import Any, Dict, List, Type
+
+from benchmarks._stub import measure
+from ripley._sql_cmd import clickhouse, general
+from ripley._sql_cmd.general import AbstractSql
+from ripley.clickhouse_models.s3_manifest import ClickhouseS3ManifestModel
+from ripley.clickhouse_models.s3_settings import ClickhouseS3SettingsModel
+
+_S3_SETTINGS = ClickhouseS3SettingsModel(
+    url='https://bucket.s3.amazonaws.com/events/{partition_id}.parquet',
+    access_key_id='key',
+    secret_access_key='secret',
+)
+_REMOTE = clickhouse.Remote('remote-host:9000', 'db', 'table', 'user', 'password')
+
+
+def _get_samples(width: int) -> Dict[str, Any]:
+    """
+    sample value by parameter name. Parameters with default value are not required
+    """
+    urls = [f'https://bucket.s3.amazonaws.com/events/{ix}.csv' for ix in range(width)]
+    fields = [f'toString("column_{ix}") AS column_{ix}' for ix in range(width)]
+    return {
+        'name': 'db',
+        'table': 'table',
+        'table_name': 'db.table',
+        'new_name': 'db.new_table',
+        'from_table': 'db.from_table',
+        'to_table': 'db.to_table',
+        'to_table_name': 'db.to_table',
+        'other_table': 'db.other_table',
+        'to_type': 'VOLUME',
+        'to_name': 'cold',
+        'from_table_name': 'db.from_table',
+        'create_table': 'db.distributed_table',
+        'database': 'db',
+        'partition': '2024-01-01',
+        'partition_id': '20240101',
+        'column': 'column',
+        'codec': 'Delta, ZSTD(1)',
+        'on_cluster': 'cluster',
+        'query_id': 'query-id',
+        's3_settings': _S3_SETTINGS,
+        'from_remote': _REMOTE,
+        'remote_address': 'remote-host:9000',
+        'remote_db': 'db',
+        'remote_table': 'table',
+        'remote_user': 'user',
+        'remote_password': 'password',
+        'urls': urls,
+        'fields': fields,
+        'field_types': [f"'\"column_{ix}\" String,'" for ix in range(width)],
+        'selects': [(url, fields) for url in urls[:10]],
+        'items': [ClickhouseS3ManifestModel(url, str(ix), ix, ix) for ix, url in enumerate(urls)],
+        'actions': [clickhouse.DropPartitionIdCmd('db.table', str(ix)) for ix in range(width)],
+    }
+
+
+def get_commands() -> List[Type[AbstractSql]]:
+    commands = []
+    for module in (general, clickhouse):
+        for _, item in inspect.getmembers(module, inspect.isclass):
+            if issubclass(item, AbstractSql) and item is not AbstractSql and item.__module__ == module.__name__:
+                commands.append(item)
+
+    return commands
+
+
+def create_command(command: Type[AbstractSql], samples: Dict[str, Any]) -> AbstractSql:
+    params = {}
+    for name, param in inspect.signature(command.__init__).parameters.items():
+        if name == 'self':
+            continue
+
+        if name in samples:
+            params[name] = samples[name]
+        elif param.default is inspect.Parameter.empty:
+            raise KeyError(f'no sample value of {command.__name__}.{name}: add it to benchmarks.bench_sql_render')
+
+    return command(**params)
+
+
+def run(width: int = 100, count: int = 1_000) -> dict:
+    samples = _get_samples(width)
+    results = {}
+    for command in get_commands():
+        cmd = create_command(command, samples)
+
+        def _render() -> None:
+            for _ in range(count):
+                cmd.to_sql()
+                repr(cmd)
+
+        results[command.__name__] = measure(_render, count)
+
+    return results
+
+
+if __name__ == '__main__':
+    print(json.dumps(run(*map(int, sys.argv[1:2])), indent=2))
@@ -1,8 +1,27 @@
+from concurrent.futures import Executor
 from typing import Any
 
+from ._clickhouse.async_main_service import AsyncMainService as _AsyncMainClickhouse
 from ._clickhouse.main_service import MainService as _MainClickhouse
+from ._protocols.async_clickhouse import AsyncClickhouseProtocol
 from ._protocols.clickhouse import ClickhouseProtocol
+from .clickhouse_models.pool_settings import ClickhousePoolSettingsModel
 
 
-def from_clickhouse(client: Any) -> ClickhouseProtocol:
-    return _MainClickhouse(client)
+def from_clickhouse(client: Any, pool_settings: ClickhousePoolSettingsModel = None) -> ClickhouseProtocol:
+    """
+    {client} - client or client factory. Factory creates a thread-safe pool of clients, see: {pool_settings}
+    """
+    return _MainClickhouse(client, pool_settings)
+
+
+def from_clickhouse_async(
+    client: Any,
+    executor: Executor = None,
+    pool_settings: ClickhousePoolSettingsModel = None,
+) -> AsyncClickhouseProtocol:
+    """
+    {client} - sync client, sync client factory (calls are offloaded to {executor} threads)
+    or async client with coroutine execute
+    """
+    return _AsyncMainClickhouse(client, executor, pool_settings)
@@ -1,10 +1,30 @@
-from dataclasses import dataclass
-from typing import Any
+from dataclasses import dataclass, fields
+from typing import Any, Type
+
+
+def slotted(cls: Type) -> Type:
+    """
+    recreates dataclass with __slots__. dataclass(slots=True) is not available in python < 3.10
+    """
+    cls_dict = dict(cls.__dict__)
+    field_names = tuple(field.name for field in fields(cls))
+    cls_dict['__slots__'] = field_names
+    for name in field_names:
+        # default values are stored in generated __init__
+        cls_dict.pop(name, None)
+
+    cls_dict.pop('__dict__', None)
+    cls_dict.pop('__weakref__', None)
+    new_cls = type(cls)(cls.__name__, cls.__bases__, cls_dict)
+    new_cls.__qualname__ = cls.__qualname__
+    return new_cls
 
 
 @dataclass
 class BaseModel:
-    def __eq__(self, __value: Any):
-        return isinstance(__value, self.__class__) and self.__dict__ == __value.__dict__
-
+    __slots__ = ()
 
+    def __eq__(self, __value: Any):
+        return isinstance(__value, self.__class__) and all(
+            getattr(self, name) == getattr(__value, name) for name in self.__dataclass_fields__
+        )
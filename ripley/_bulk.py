@@ -0,0 +1,41 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, List
+
+from ._log import log
+from .clickhouse_models.bulk_result import ClickhouseBulkResultModel
+from .clickhouse_models.bulk_settings import ClickhouseBulkSettingsModel
+
+
+def run_bulk(
+    keys: List[str],
+    action: Callable[[str], Any],
+    settings: ClickhouseBulkSettingsModel = None,
+) -> List[ClickhouseBulkResultModel]:
+    """
+    runs action for each key in worker pool. Errors are not raised, see ClickhouseBulkResultModel.error
+    """
+    settings = settings or ClickhouseBulkSettingsModel()
+
+    def _run(key: str) -> ClickhouseBulkResultModel:
+        start = time.monotonic()
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                value = action(key)
+                return ClickhouseBulkResultModel(key, attempt, time.monotonic() - start, value=value)
+            except Exception as error:
+                if attempt > settings.retries:
+                    log.error('%s failed after %s attempt(s): %s', key, attempt, error)
+                    return ClickhouseBulkResultModel(key, attempt, time.monotonic() - start, error)
+
+                delay = settings.retry_delay * 2 ** (attempt - 1)
+                log.warning('%s attempt %s failed: %s. retry in %s sec', key, attempt, error, delay)
+                time.sleep(delay)
+
+    if not keys:
+        return []
+
+    with ThreadPoolExecutor(max_workers=min(settings.max_workers, len(keys))) as executor:
+        return list(executor.map(_run, keys))
@@ -0,0 +1,624 @@
+import asyncio
+import inspect
+from concurrent.futures import Executor, ThreadPoolExecutor
+from functools import partial
+from itertools import islice
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterator, List, Union
+
+from .main_service import MainService, PlanService
+from .wait_service import Waiter
+from .._protocols.async_clickhouse import AsyncClickhousePlanProtocol, AsyncClickhouseProtocol
+from ..clickhouse_models.bulk_result import ClickhouseBulkResultModel as BulkResult
+from ..clickhouse_models.bulk_settings import ClickhouseBulkSettingsModel as BulkSettings
+from ..clickhouse_models.cache_stats import ClickhouseCacheStatsModel as CacheStats
+from ..clickhouse_models.checkpoint_settings import ClickhouseCheckpointSettingsModel as CheckpointSettings
+from ..clickhouse_models.codec import ClickhouseCodecAdviceModel as CodecAdvice
+from ..clickhouse_models.column import ClickhouseColumnModel as Column
+from ..clickhouse_models.column import ClickhouseColumnSummaryModel as ColumnSummary
+from ..clickhouse_models.db import ClickhouseDbModel as Db
+from ..clickhouse_models.ddl_queue import ClickhouseDdlQueueModel as DdlQueue
+from ..clickhouse_models.disk import ClickhouseDiskModel as Disk
+from ..clickhouse_models.merge import ClickhouseMergeModel as Merge
+from ..clickhouse_models.merge_schedule import ClickhouseMergeCandidateModel as MergeCandidate
+from ..clickhouse_models.merge_schedule import ClickhouseMergeScheduleSettingsModel as MergeScheduleSettings
+from ..clickhouse_models.metadata_snapshot import ClickhouseMetadataSnapshotModel as MetadataSnapshot
+from ..clickhouse_models.mutation import ClickhouseMutationModel as Mutation
+from ..clickhouse_models.part import ClickhousePartModel as Part
+from ..clickhouse_models.partition import ClickhousePartitionModel as Partition
+from ..clickhouse_models.plan_step import ClickhousePlanStepModel as PlanStep
+from ..clickhouse_models.pool_settings import ClickhousePoolSettingsModel as PoolSettings
+from ..clickhouse_models.process import ClickhouseProcessModel as Process
+from ..clickhouse_models.process import ClickhouseProcessEventModel as ProcessEvent
+from ..clickhouse_models.process import ClickhouseProcessKillRuleModel as KillRule
+from ..clickhouse_models.process import ClickhouseProcessSummaryModel as ProcessSummary
+from ..clickhouse_models.query_event import ClickhouseQueryEventModel as QueryEvent
+from ..clickhouse_models.query_event import ClickhouseQueryStatsModel as QueryStats
+from ..clickhouse_models.remote_settings import ClickhouseRemoteSettingsModel as RemoteSettings
+from ..clickhouse_models.retention import ClickhouseRetentionPolicyModel as RetentionPolicy
+from ..clickhouse_models.s3_settings import ClickhouseS3SettingsModel as S3Settings
+from ..clickhouse_models.s3_settings import S3SelectSettingsModel as S3SelectSettings
+from ..clickhouse_models.storage import ClickhousePartitionDiskModel as PartitionDisk
+from ..clickhouse_models.storage import ClickhousePartitionMoveModel as PartitionMove
+from ..clickhouse_models.storage import ClickhouseTierRuleModel as TierRule
+from ..clickhouse_models.storage import ClickhouseVolumeModel as Volume
+from ..clickhouse_models.table import ClickhouseTableModel as Table
+from ..clickhouse_models.table import ClickhouseTableSummaryModel as TableSummary
+from ..clickhouse_models.wait_settings import ClickhouseWaitSettingsModel as WaitSettings
+
+# records per hop to a worker thread for iter_* methods
+_ITER_CHUNK_SIZE = 10_000
+
+
+class _AsyncConnectionBridge:
+    """
+    sync facade of connection of async driver: coroutine methods (ping, ...) are awaited in the event loop
+    """
+
+    def __init__(self, connection: Any, wait: Callable[[Awaitable], Any]) -> None:
+        self._connection = connection
+        self._wait = wait
+
+    def __getattr__(self, name: str) -> Any:
+        value = getattr(self._connection, name)
+        if inspect.iscoroutinefunction(value):
+            return lambda *args, **kwargs: self._wait(value(*args, **kwargs))
+
+        return value
+
+
+class _AsyncClientBridge:
+    """
+    sync facade of async driver (coroutine execute / execute_iter) for services running in worker threads
+    """
+
+    def __init__(self, client: Any) -> None:
+        self._client = client
+        self.loop: asyncio.AbstractEventLoop = None
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._client, name)
+
+    def _wait(self, coro) -> Any:
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+    def _resolve(self, value: Any) -> Any:
+        return self._wait(value) if inspect.isawaitable(value) else value
+
+    def get_connection(self) -> _AsyncConnectionBridge:
+        return _AsyncConnectionBridge(self._resolve(self._client.get_connection()), self._wait)
+
+    def disconnect(self) -> None:
+        self._resolve(self._client.disconnect())
+
+    def execute(self, *args, **kwargs) -> Any:
+        return self._wait(self._client.execute(*args, **kwargs))
+
+    def execute_iter(self, *args, **kwargs) -> Iterator[Any]:
+        rows = self._wait(self._client.execute_iter(*args, **kwargs)).__aiter__()
+        while True:
+            try:
+                yield self._wait(rows.__anext__())
+            except StopAsyncIteration:
+                return
+
+
+class AsyncMainService(AsyncClickhouseProtocol):
+    """
+    runs MainService in worker threads. Async drivers are bridged back to the event loop
+    """
+
+    def __init__(self, client: Any, executor: Executor = None, pool_settings: PoolSettings = None) -> None:
+        self._bridge = None
+        if inspect.iscoroutinefunction(getattr(client, 'execute', None)):
+            self._bridge = client = _AsyncClientBridge(client)
+
+        self._main = MainService(client, pool_settings)
+        self._executor = executor
+
+    async def _run(self, func: Callable, *args, executor: Executor = None) -> Any:
+        loop = asyncio.get_running_loop()
+        if self._bridge:
+            self._bridge.loop = loop
+
+        return await loop.run_in_executor(executor or self._executor, partial(func, *args))
+
+    async def _iterate(self, func: Callable[..., Iterator[Any]], *args) -> AsyncIterator[Any]:
+        # generator holds a client until it is closed: all chunks are read in the same thread
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            records = await self._run(func, *args, executor=executor)
+            try:
+                while True:
+                    chunk = await self._run(lambda: list(islice(records, _ITER_CHUNK_SIZE)), executor=executor)
+                    if not chunk:
+                        return
+
+                    for rec in chunk:
+                        yield rec
+            finally:
+                await self._run(records.close, executor=executor)
+
+    async def __aenter__(self) -> 'AsyncMainService':
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    async def ping(self) -> bool:
+        return await self._run(self._main.ping)
+
+    async def close(self) -> None:
+        await self._run(self._main.close)
+
+    @property
+    def active_db(self) -> str:
+        return self._main.active_db
+
+    @property
+    def on_cluster(self) -> str:
+        return self._main.on_cluster
+
+    @property
+    def settings(self) -> dict:
+        return self._main.settings
+
+    def set_settings(self, settings: dict):
+        self._main.set_settings(settings)
+
+    def skip_settings(self):
+        self._main.skip_settings()
+
+    def set_on_cluster(self, name: str):
+        self._main.set_on_cluster(name)
+
+    def skip_on_cluster(self):
+        self._main.skip_on_cluster()
+
+    @property
+    def ddl_tasks(self) -> List[str]:
+        return self._main.ddl_tasks
+
+    def set_async_ddl(self):
+        self._main.set_async_ddl()
+
+    def skip_async_ddl(self):
+        self._main.skip_async_ddl()
+
+    @property
+    def metadata_cache_stats(self) -> CacheStats:
+        return self._main.metadata_cache_stats
+
+    def set_metadata_cache(self, ttl: float = 60, max_size: int = 1024):
+        self._main.set_metadata_cache(ttl, max_size)
+
+    def skip_metadata_cache(self):
+        self._main.skip_metadata_cache()
+
+    @property
+    def query_stats(self) -> List[QueryStats]:
+        return self._main.query_stats
+
+    def set_query_stats(self, max_samples: int = 10_000):
+        self._main.set_query_stats(max_samples)
+
+    def skip_query_stats(self):
+        self._main.skip_query_stats()
+
+    def add_query_hook(self, hook: Callable[[QueryEvent], None]):
+        self._main.add_query_hook(hook)
+
+    def remove_query_hook(self, hook: Callable[[QueryEvent], None]):
+        self._main.remove_query_hook(hook)
+
+    def create_plan(self, snapshot: MetadataSnapshot = None) -> 'AsyncPlanService':
+        return AsyncPlanService(self._main.create_plan(snapshot), self._bridge, self._executor)
+
+    async def get_metadata_snapshot(self, databases: List[str] = None) -> MetadataSnapshot:
+        return await self._run(self._main.get_metadata_snapshot, databases)
+
+    async def get_remote_metadata_snapshot(self, settings: RemoteSettings,
+                                           tables: List[str] = None) -> MetadataSnapshot:
+        return await self._run(self._main.get_remote_metadata_snapshot, settings, tables)
+
+    async def create_db(self, name: str, engine: str = '') -> Db:
+        return await self._run(self._main.create_db, name, engine)
+
+    async def exec(self, sql: str, params: dict = None) -> List:
+        return await self._run(self._main.exec, sql, params)
+
+    async def move_partition(self, from_table: Table, to_table: Table, partition: str) -> None:
+        await self._run(self._main.move_partition, from_table, to_table, partition)
+
+    async def replace_partition(self, from_table: Table, to_table: Table, partition: str) -> None:
+        await self._run(self._main.replace_partition, from_table, to_table, partition)
+
+    async def drop_partition(self, table: Table, partition: str) -> None:
+        await self._run(self._main.drop_partition, table, partition)
+
+    async def detach_partition(self, table: Table, partition: str) -> None:
+        await self._run(self._main.detach_partition, table, partition)
+
+    async def attach_partition(self, table: Table, partition: str) -> None:
+        await self._run(self._main.attach_partition, table, partition)
+
+    async def move_partitions(
+        self,
+        from_table: Table,
+        to_table: Table,
+        partitions: List[Union[str, Partition]],
+        settings: BulkSettings = None,
+    ) -> List[BulkResult]:
+        return await self._run(self._main.move_partitions, from_table, to_table, partitions, settings)
+
+    async def replace_partitions(
+        self,
+        from_table: Table,
+        to_table: Table,
+        partitions: List[Union[str, Partition]],
+        settings: BulkSettings = None,
+    ) -> List[BulkResult]:
+        return await self._run(self._main.replace_partitions, from_table, to_table, partitions, settings)
+
+    async def drop_partitions(
+        self,
+        table: Table,
+        partitions: List[Union[str, Partition]],
+        settings: BulkSettings = None,
+    ) -> List[BulkResult]:
+        return await self._run(self._main.drop_partitions, table, partitions, settings)
+
+    async def detach_partitions(
+        self,
+        table: Table,
+        partitions: List[Union[str, Partition]],
+        settings: BulkSettings = None,
+    ) -> List[BulkResult]:
+        return await self._run(self._main.detach_partitions, table, partitions, settings)
+
+    async def attach_partitions(
+        self,
+        table: Table,
+        partitions: List[Union[str, Partition]],
+        settings: BulkSettings = None,
+    ) -> List[BulkResult]:
+        return await self._run(self._main.attach_partitions, table, partitions, settings)
+
+    async def get_databases(self, fields: List[str] = None) -> List[Db]:
+        return await self._run(self._main.get_databases, fields)
+
+    async def iter_databases(self, fields: List[str] = None) -> AsyncIterator[Db]:
+        async for rec in self._iterate(self._main.iter_databases, fields):
+            yield rec
+
+    async def get_database_by_name(self, name: str = '', fields: List[str] = None) -> Db:
+        return await self._run(self._main.get_database_by_name, name, fields)
+
+    async def get_tables_by_db(self, db: str = '', fields: List[str] = None) -> List[Table]:
+        return await self._run(self._main.get_tables_by_db, db, fields)
+
+    async def iter_tables_by_db(self, db: str = '', fields: List[str] = None) -> AsyncIterator[Table]:
+        async for rec in self._iterate(self._main.iter_tables_by_db, db, fields):
+            yield rec
+
+    async def get_table_summaries(self, db: str = '') -> List[TableSummary]:
+        return await self._run(self._main.get_table_summaries, db)
+
+    async def get_table_by_name(self, table: str, db: str = '', fields: List[str] = None) -> Table:
+        return await self._run(self._main.get_table_by_name, table, db, fields)
+
+    async def get_table_partitions(self, table: str, db: str = '') -> List[Partition]:
+        return await self._run(self._main.get_table_partitions, table, db)
+
+    async def get_table_parts(self, table: str, db: str = '', fields: List[str] = None) -> List[Part]:
+        return await self._run(self._main.get_table_parts, table, db, fields)
+
+    async def iter_table_partitions(self, table: str, db: str = '') -> AsyncIterator[Partition]:
+        async for rec in self._iterate(self._main.iter_table_partitions, table, db):
+            yield rec
+
+    async def get_remote_table_partitions(self, settings: RemoteSettings) -> List[Partition]:
+        return await self._run(self._main.get_remote_table_partitions, settings)
+
+    async def get_processes(self, fields: List[str] = None) -> List[Process]:
+        return await self._run(self._main.get_processes, fields)
+
+    async def iter_processes(self, fields: List[str] = None) -> AsyncIterator[Process]:
+        async for rec in self._iterate(self._main.iter_processes, fields):
+            yield rec
+
+    async def get_process_by_query_id(self, query_id: str, fields: List[str] = None) -> Process:
+        return await self._run(self._main.get_process_by_query_id, query_id, fields)
+
+    async def get_process_summaries(self) -> List[ProcessSummary]:
+        return await self._run(self._main.get_process_summaries)
+
+    async def kill_query(self, query_id: str) -> None:
+        await self._run(self._main.kill_query, query_id)
+
+    async def watch_processes(self, interval: float = 1, rules: List[KillRule] = None) -> AsyncIterator[ProcessEvent]:
+        watcher = self._main.create_process_watcher(rules)
+        while True:
+            for event in await self._run(watcher.poll):
+                yield event
+
+            await asyncio.sleep(interval)
+
+    async def get_pending_mutations(self, table: str, db: str = '', partition_id: str = '') -> List[Mutation]:
+        return await self._run(self._main.get_pending_mutations, table, db, partition_id)
+
+    async def get_merges(self, table: str, db: str = '', partition_id: str = '') -> List[Merge]:
+        return await self._run(self._main.get_merges, table, db, partition_id)
+
+    async def wait_for_mutations(
+        self,
+        table: str,
+        db: str = '',
+        partition_id: str = '',
+        settings: WaitSettings = None,
+        progress: Callable[[List[Mutation]], None] = None,
+    ) -> None:
+        await self._wait_for(self._main.create_mutations_waiter(table, db, partition_id, settings, progress))
+
+    async def wait_for_merges(
+        self,
+        table: str,
+        db: str = '',
+        partition_id: str = '',
+        settings: WaitSettings = None,
+        progress: Callable[[List[Merge]], None] = None,
+    ) -> None:
+        await self._wait_for(self._main.create_merges_waiter(table, db, partition_id, settings, progress))
+
+    async def get_ddl_queue(self, log_comments: List[str] = None) -> List[DdlQueue]:
+        return await self._run(self._main.get_ddl_queue, log_comments)
+
+    async def wait_for_ddl(
+        self,
+        settings: WaitSettings = None,
+        progress: Callable[[List[DdlQueue]], None] = None,
+    ) -> None:
+        await self._wait_for(self._main.create_ddl_waiter(settings, progress))
+
+    async def _wait_for(self, waiter: Waiter) -> None:
+        while True:
+            delay = await self._run(waiter.poll)
+            if not delay:
+                return
+
+            await asyncio.sleep(delay)
+
+    async def get_disks(self, fields: List[str] = None) -> List[Disk]:
+        return await self._run(self._main.get_disks, fields)
+
+    async def get_storage_volumes(self, policy: str = '') -> List[Volume]:
+        return await self._run(self._main.get_storage_volumes, policy)
+
+    async def get_partition_disks(self, table: str, db: str = '') -> List[PartitionDisk]:
+        return await self._run(self._main.get_partition_disks, table, db)
+
+    async def get_table_columns(self, table: str, db: str = '', fields: List[str] = None) -> List[Column]:
+        return await self._run(self._main.get_table_columns, table, db, fields)
+
+    async def iter_table_columns(self, table: str, db: str = '', fields: List[str] = None) -> AsyncIterator[Column]:
+        async for rec in self._iterate(self._main.iter_table_columns, table, db, fields):
+            yield rec
+
+    async def get_column_summaries(self, table: str, db: str = '') -> List[ColumnSummary]:
+        return await self._run(self._main.get_column_summaries, table, db)
+
+    async def create_table_as(
+        self,
+        from_table: Table,
+        table: str,
+        db: str = '',
+        order_by: list = None,
+        partition_by: list = None,
+        engine: str = '',
+    ) -> Table:
+        return await self._run(self._main.create_table_as, from_table, table, db, order_by, partition_by, engine)
+
+    async def insert_from_table(self, from_table: Table, to_table: Table) -> None:
+        await self._run(self._main.insert_from_table, from_table, to_table)
+
+    async def insert_from_table_by_partitions(
+        self,
+        from_table: Table,
+        to_table: Table,
+        checkpoint: CheckpointSettings = None,
+        settings: BulkSettings = None,
+        replace: bool = False,
+    ) -> List[BulkResult]:
+        return await self._run(
+            self._main.insert_from_table_by_partitions, from_table, to_table, checkpoint, settings, replace,
+        )
+
+    async def truncate(self, table: str, db: str = '') -> None:
+        await self._run(self._main.truncate, table, db)
+
+    async def rebuild_table(
+        self,
+        table: Table,
+        load: Callable[[Table], Union[Any, Awaitable[Any]]],
+        expected_rows: int = None,
+    ) -> Table:
+        rebuild = self._main.create_rebuild(table, expected_rows)
+        shadow = await self._run(rebuild.start)
+        try:
+            result = load(shadow)
+            if inspect.isawaitable(result):
+                result = await result
+        except Exception:
+            await self._run(rebuild.abort)
+            raise
+
+        return await self._run(rebuild.finish, result)
+
+    async def rebuild_table_from_table(self, from_table: Table, table: Table, settings: BulkSettings = None) -> Table:
+        return await self._run(self._main.rebuild_table_from_table, from_table, table, settings)
+
+    async def insert_from_s3(self, table: Table, s3_settings: S3Settings, s3_select_settings: S3SelectSettings = None):
+        await self._run(self._main.insert_from_s3, table, s3_settings, s3_select_settings)
+
+    async def insert_from_s3_files(
+        self,
+        table: Table,
+        s3_settings: S3Settings,
+        urls: List[str] = None,
+        s3_select_settings: S3SelectSettings = None,
+        files_per_insert: int = 100,
+        ledger_table: str = '',
+        settings: BulkSettings = None,
+    ) -> List[BulkResult]:
+        return await self._run(
+            self._main.insert_from_s3_files,
+            table,
+            s3_settings,
+            urls,
+            s3_select_settings,
+            files_per_insert,
+            ledger_table,
+            settings,
+        )
+
+    async def insert_table_to_s3(self, table: Table, s3_settings: S3Settings):
+        await self._run(self._main.insert_table_to_s3, table, s3_settings)
+
+    async def insert_table_to_s3_by_partitions(
+        self,
+        table: Table,
+        s3_settings: S3Settings,
+        manifest_url: str = '',
+        partition_ids: List[str] = None,
+        settings: BulkSettings = None,
+    ) -> List[BulkResult]:
+        return await self._run(
+            self._main.insert_table_to_s3_by_partitions,
+            table,
+            s3_settings,
+            manifest_url,
+            partition_ids,
+            settings,
+        )
+
+    async def rename_table(self, table: Table, new_name: str, db: str = '') -> None:
+        await self._run(self._main.rename_table, table, new_name, db)
+
+    async def insert_from_remote(
+        self,
+        settings: RemoteSettings,
+        table: str,
+        db: str = '',
+        create_table: bool = False,
+    ) -> None:
+        await self._run(self._main.insert_from_remote, settings, table, db, create_table)
+
+    async def insert_from_remote_by_partitions(
+        self,
+        settings: RemoteSettings,
+        table: str,
+        db: str = '',
+        create_table: bool = False,
+        checkpoint: CheckpointSettings = None,
+        bulk_settings: BulkSettings = None,
+    ) -> List[BulkResult]:
+        return await self._run(
+            self._main.insert_from_remote_by_partitions, settings, table, db, create_table, checkpoint, bulk_settings,
+        )
+
+    async def insert_from_remote_snapshot(
+        self,
+        settings: RemoteSettings,
+        snapshot: MetadataSnapshot,
+        db: str = '',
+        create_tables: bool = True,
+        checkpoint: CheckpointSettings = None,
+        bulk_settings: BulkSettings = None,
+    ) -> List[BulkResult]:
+        return await self._run(
+            self._main.insert_from_remote_snapshot, settings, snapshot, db, create_tables, checkpoint, bulk_settings,
+        )
+
+    async def sync_table(
+        self,
+        from_table: Table,
+        to_table: Table,
+        compare_hash: bool = False,
+        settings: BulkSettings = None,
+    ) -> List[BulkResult]:
+        return await self._run(self._main.sync_table, from_table, to_table, compare_hash, settings)
+
+    async def sync_table_from_remote(
+        self,
+        remote_settings: RemoteSettings,
+        to_table: Table,
+        compare_hash: bool = False,
+        settings: BulkSettings = None,
+    ) -> List[BulkResult]:
+        return await self._run(self._main.sync_table_from_remote, remote_settings, to_table, compare_hash, settings)
+
+    async def plan_partition_moves(self, tables: List[Table], rules: List[TierRule]) -> List[PartitionMove]:
+        return await self._run(self._main.plan_partition_moves, tables, rules)
+
+    async def move_partitions_to_storage(
+        self,
+        moves: List[PartitionMove],
+        max_bytes_per_second: float = None,
+        settings: BulkSettings = None,
+    ) -> List[BulkResult]:
+        return await self._run(self._main.move_partitions_to_storage, moves, max_bytes_per_second, settings)
+
+    async def advise_codecs(
+        self,
+        table: Table,
+        sample_rows: int = 100_000,
+        codecs: List[str] = None,
+        columns: List[str] = None,
+    ) -> List[CodecAdvice]:
+        return await self._run(self._main.advise_codecs, table, sample_rows, codecs, columns)
+
+    async def plan_merges(self, table: Table, settings: MergeScheduleSettings = None) -> List[MergeCandidate]:
+        return await self._run(self._main.plan_merges, table, settings)
+
+    async def optimize_partitions(
+        self,
+        table: Table,
+        settings: MergeScheduleSettings = None,
+        bulk_settings: BulkSettings = None,
+    ) -> List[BulkResult]:
+        return await self._run(self._main.optimize_partitions, table, settings, bulk_settings)
+
+    async def get_expired_partitions(self, table: Table, policy: RetentionPolicy) -> List[Partition]:
+        return await self._run(self._main.get_expired_partitions, table, policy)
+
+    async def drop_expired_partitions(
+        self,
+        table: Table,
+        policy: RetentionPolicy,
+        settings: BulkSettings = None,
+    ) -> List[BulkResult]:
+        return await self._run(self._main.drop_expired_partitions, table, policy, settings)
+
+    async def create_distributed_table(
+        self,
+        create_table: str,
+        table: str,
+        database: str,
+        sharding_key: str = '',
+        cluster: str = "'{cluster}'",
+    ) -> Table:
+        return await self._run(
+            self._main.create_distributed_table, create_table, table, database, sharding_key, cluster,
+        )
+
+
+class AsyncPlanService(AsyncMainService, AsyncClickhousePlanProtocol):
+    def __init__(self, plan: PlanService, bridge: _AsyncClientBridge = None, executor: Executor = None) -> None:
+        self._main = plan
+        self._bridge = bridge
+        self._executor = executor
+
+    @property
+    def steps(self) -> List[PlanStep]:
+        return self._main.steps
+
+    async def execute(self, settings: BulkSettings = None) -> List[BulkResult]:
+        return await self._run(self._main.execute, settings)
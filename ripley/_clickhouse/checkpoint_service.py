@@ -0,0 +1,47 @@
+import os
+import threading
+from typing import Set
+
+from .cmd_service import CmdService
+from ..clickhouse_models.checkpoint_settings import ClickhouseCheckpointSettingsModel as CheckpointSettings
+
+
+class CheckpointService:
+    def __init__(self, cmd: CmdService) -> None:
+        self._cmd = cmd
+        self._lock = threading.Lock()
+
+    def get_completed(self, settings: CheckpointSettings) -> Set[str]:
+        if settings.file_path:
+            if not os.path.exists(settings.file_path):
+                return set()
+
+            with open(settings.file_path) as file:
+                lines = (line.rstrip('\n').split('\t', 1) for line in file if line.strip())
+                return {chunk for name, chunk in lines if name == settings.name}
+
+        self._cmd.exec(f"""
+            CREATE TABLE IF NOT EXISTS {settings.table}
+            (
+                name String,
+                chunk String,
+                created_at DateTime DEFAULT now()
+            )
+            ENGINE MergeTree() ORDER BY (name, chunk)
+        """)
+        result = self._cmd.exec(
+            f'SELECT DISTINCT chunk FROM {settings.table} WHERE name = %(name)s',
+            params={'name': settings.name},
+        )
+        return {chunk for chunk, in result}
+
+    def mark_completed(self, settings: CheckpointSettings, chunk: str) -> None:
+        if settings.file_path:
+            with self._lock, open(settings.file_path, 'a') as file:
+                file.write(f'{settings.name}\t{chunk}\n')
+            return
+
+        self._cmd.exec(
+            f'INSERT INTO {settings.table} (name, chunk) SELECT %(name)s, %(chunk)s',
+            params={'name': settings.name, 'chunk': chunk},
+        )
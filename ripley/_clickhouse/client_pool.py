@@ -0,0 +1,164 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator
+
+from .._log import log
+from ..clickhouse_models.pool_settings import ClickhousePoolSettingsModel
+
+
+def _disconnect_on_error(client: Any) -> Iterator[Any]:
+    """
+    a client which failed or was left in the middle of a stream can have unread packets: it reconnects on next query
+    """
+    try:
+        yield client
+    except BaseException:
+        client.disconnect()
+        raise
+
+
+class SingleClientPool:
+    """
+    one shared client. Commands are serialized: the client can't run queries from several threads at the same time
+    """
+
+    def __init__(self, client: Any) -> None:
+        self._client = client
+        self._lock = threading.Lock()
+        self._owner = None
+
+    @property
+    def database(self) -> str:
+        return self._client.get_connection().database
+
+    @contextmanager
+    def connection(self) -> Iterator[Any]:
+        if self._owner == threading.get_ident():
+            raise RuntimeError('clickhouse client is busy in current thread: a query is run while iter_* is streaming')
+
+        with self._lock:
+            self._owner = threading.get_ident()
+            try:
+                yield from _disconnect_on_error(self._client)
+            finally:
+                self._owner = None
+
+    def close(self) -> None:
+        self._client.disconnect()
+
+
+class ClientPool:
+    def __init__(self, factory: Callable[[], Any], settings: ClickhousePoolSettingsModel = None) -> None:
+        self._factory = factory
+        self._settings = settings or ClickhousePoolSettingsModel()
+        self._condition = threading.Condition()
+        # (client, released_at). The most recently released client is on the right
+        self._idle = deque()
+        self._size = 0
+        self._database = None
+        self._closed = False
+
+        now = time.monotonic()
+        for _ in range(self._settings.min_size):
+            self._idle.append((self._create(), now))
+            self._size += 1
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    @property
+    def database(self) -> str:
+        if self._database is None:
+            with self.connection():
+                pass
+
+        return self._database
+
+    @contextmanager
+    def connection(self) -> Iterator[Any]:
+        client = self._checkout()
+        try:
+            yield from _disconnect_on_error(client)
+        finally:
+            with self._condition:
+                if self._closed:
+                    self._size -= 1
+                else:
+                    self._idle.append((client, time.monotonic()))
+                self._condition.notify()
+
+            if self._closed:
+                client.disconnect()
+
+    def close(self) -> None:
+        """
+        disconnects idle clients. Clients which are in use are disconnected when they are released
+        """
+        with self._condition:
+            self._closed = True
+            idle = [client for client, _ in self._idle]
+            self._idle.clear()
+            self._size -= len(idle)
+
+        for client in idle:
+            client.disconnect()
+
+    def _create(self) -> Any:
+        client = self._factory()
+        if self._database is None:
+            self._database = client.get_connection().database
+
+        return client
+
+    def _checkout(self) -> Any:
+        with self._condition:
+            expired = self._pop_expired()
+            client, released_at = None, None
+            while client is None:
+                if self._idle:
+                    client, released_at = self._idle.pop()
+                elif self._size < self._settings.max_size:
+                    self._size += 1
+                    break
+                elif not self._condition.wait(self._settings.checkout_timeout):
+                    raise TimeoutError(f'no free clickhouse client in {self._settings.checkout_timeout} sec')
+
+        for idle_client in expired:
+            idle_client.disconnect()
+
+        if client is not None and time.monotonic() - released_at > self._settings.ping_after_idle:
+            if not self._is_alive(client):
+                log.warning('clickhouse client is broken and will be replaced')
+                client.disconnect()
+                client = None
+
+        if client is None:
+            try:
+                client = self._create()
+            except Exception:
+                with self._condition:
+                    self._size -= 1
+                    self._condition.notify()
+                raise
+
+        return client
+
+    @staticmethod
+    def _is_alive(client: Any) -> bool:
+        try:
+            # None: not connected yet
+            return client.get_connection().ping() is not False
+        except Exception:
+            return False
+
+    def _pop_expired(self) -> list:
+        expired = []
+        deadline = time.monotonic() - self._settings.idle_timeout
+        while self._idle and self._size > self._settings.min_size and self._idle[0][1] < deadline:
+            expired.append(self._idle.popleft()[0])
+            self._size -= 1
+
+        return expired
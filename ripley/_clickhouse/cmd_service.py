@@ -1,7 +1,15 @@
 import re
+import threading
+import time
+import uuid
 from copy import deepcopy
-from typing import Any, Type, List, Dict
+from dataclasses import MISSING, fields, is_dataclass
+from functools import lru_cache
+from typing import Any, Type, List, Dict, Iterator, Tuple, Callable, Union
 
+from .client_pool import ClientPool, SingleClientPool
+from .metadata_cache import MetadataCache
+from .query_stats import QueryStatsAggregator
 from .._log import log
 from .._sql_cmd.clickhouse import (
     AlterOnClusterCmd,
@@ -10,28 +18,111 @@ from .._sql_cmd.clickhouse import (
     CreateDbOnCluster,
     CreateDistributedTable,
     DropPartitionOnClusterCmd,
+    KillQueryCmd,
+    DropTableOnClusterCmd,
+    ExchangeTablesOnClusterCmd,
+    OptimizePartitionCmd,
 )
 from .._sql_cmd.general import AbstractSql
+from ..clickhouse_models.cache_stats import ClickhouseCacheStatsModel
+from ..clickhouse_models.query_event import ClickhouseQueryEventModel, ClickhouseQueryStatsModel
+
+QueryHook = Callable[[ClickhouseQueryEventModel], None]
+# ON CLUSTER query returns after the entry is added to distributed DDL queue
+_ASYNC_DDL_SETTINGS = {'distributed_ddl_task_timeout': 0, 'distributed_ddl_output_mode': 'none'}
+_QUOTED = r"'(?:[^'\\]|\\.)*'"
+# remote('address', db, table, 'user', 'password'...)
+_REMOTE_CREDENTIALS = re.compile(
+    rf"(\bremote(?:Secure)?\(\s*{_QUOTED}\s*,[^,]*,[^,]*,\s*){_QUOTED}(\s*,\s*){_QUOTED}",
+    re.IGNORECASE,
+)
+
+
+@lru_cache(maxsize=256)
+def _get_record_factory(model: Type, columns: Tuple[str, ...]) -> Callable[[tuple], Any]:
+    """
+    compiles row mapper once per (model, columns). Dataclass models are created by position from row tuples,
+    unknown columns are skipped, fields which are not selected get default value or None
+    """
+    if model is None:
+        return lambda rec: dict(zip(columns, rec))
+
+    if not is_dataclass(model):
+        return lambda rec: model(**dict(zip(columns, rec)))
+
+    positions = {name: ix for ix, name in enumerate(columns)}
+    namespace = {'model': model}
+    args = []
+    for field in fields(model):
+        if not field.init:
+            continue
+
+        if field.name in positions:
+            value = f'rec[{positions[field.name]}]'
+        elif field.default is not MISSING:
+            value = f'_default_{field.name}'
+            namespace[value] = field.default
+        elif field.default_factory is not MISSING:
+            value = f'_factory_{field.name}'
+            namespace[value] = field.default_factory
+            value = f'{value}()'
+        else:
+            value = 'None'
+
+        args.append(f'{field.name}={value}' if getattr(field, 'kw_only', False) else value)
+
+    exec(f'def to_record(rec):\n    return model({", ".join(args)})', namespace)
+    return namespace['to_record']
 
 
 class CmdService:
-    def __init__(self, client: Any) -> None:
-        self._client = client
+    def __init__(self, pool: Union[ClientPool, SingleClientPool]) -> None:
+        self._pool = pool
         self._settings = {}
         self._on_cluster = ''
+        self._metadata_cache = None
+        self._local = threading.local()
+        self._hooks: Tuple[QueryHook, ...] = ()
+        self._query_stats: QueryStatsAggregator = None
+        self._ddl_lock = threading.Lock()
+        # log_comment of submitted async ON CLUSTER commands. None - async DDL is disabled
+        self._ddl_tasks: List[str] = None
 
     @property
     def settings(self) -> dict:
         return self._settings
 
+    @property
+    def last_query(self) -> Any:
+        """
+        clickhouse_driver QueryInfo (progress, profile_info, elapsed) of the last query executed in current thread
+        """
+        return getattr(self._local, 'last_query', None)
+
+    @property
+    def metadata_cache(self) -> MetadataCache:
+        return self._metadata_cache
+
+    @property
+    def metadata_cache_stats(self) -> ClickhouseCacheStatsModel:
+        if self._metadata_cache:
+            return self._metadata_cache.stats
+
     @property
     def active_db(self) -> str:
-        return self._client.get_connection().database
+        return self._pool.database
 
     @property
     def on_cluster(self) -> str:
         return self._on_cluster
 
+    @property
+    def recording(self) -> bool:
+        """
+        commands which change data are recorded by a plan instead of execution
+        """
+        return False
+
     def get_db_or_default(self, db: str = '') -> str:
         return db if db else self.active_db
 
@@ -46,6 +137,30 @@ class CmdService:
         self._on_cluster = name
         log.info("ON CLUSTER %s mode enabled", self._on_cluster)
 
+    @property
+    def ddl_tasks(self) -> List[str]:
+        return list(self._ddl_tasks or [])
+
+    def set_async_ddl(self):
+        with self._ddl_lock:
+            self._ddl_tasks = self._ddl_tasks or []
+        log.info('async ON CLUSTER DDL enabled')
+
+    def skip_async_ddl(self):
+        with self._ddl_lock:
+            self._ddl_tasks = None
+        log.info('async ON CLUSTER DDL disabled')
+
+    def pop_ddl_tasks(self) -> List[str]:
+        """
+        log_comment of async ON CLUSTER commands submitted since the previous call
+        """
+        with self._ddl_lock:
+            tasks = self._ddl_tasks or []
+            if self._ddl_tasks is not None:
+                self._ddl_tasks = []
+            return tasks
+
     def set_settings(self, settings: dict):
         self._settings = settings
         log.info('query settings enabled. %s', self._settings)
@@ -54,19 +169,105 @@ class CmdService:
         self._settings = {}
         log.info('query settings disabled. %s', self._settings)
 
-    def exec(self, sql: str, params: dict = None, with_column_types: bool = False):
-        return self._client.execute(sql, params=params, with_column_types=with_column_types, settings=self._settings)
+    def set_metadata_cache(self, ttl: float = 60, max_size: int = 1024):
+        self._metadata_cache = MetadataCache(ttl, max_size)
+        log.info('metadata cache enabled. ttl: %s, max size: %s', ttl, max_size)
+
+    def skip_metadata_cache(self):
+        self._metadata_cache = None
+        log.info('metadata cache disabled')
+
+    @property
+    def query_stats(self) -> List[ClickhouseQueryStatsModel]:
+        if self._query_stats:
+            return self._query_stats.get_stats()
+
+    def add_query_hook(self, hook: QueryHook):
+        self._hooks = self._hooks + (hook,)
+
+    def remove_query_hook(self, hook: QueryHook):
+        self._hooks = tuple(item for item in self._hooks if item != hook)
+
+    def set_query_stats(self, max_samples: int = 10_000):
+        self.skip_query_stats()
+        self._query_stats = QueryStatsAggregator(max_samples)
+        self.add_query_hook(self._query_stats)
+        log.info('query stats enabled. max samples: %s', max_samples)
+
+    def skip_query_stats(self):
+        if self._query_stats:
+            self.remove_query_hook(self._query_stats)
+            self._query_stats = None
+            log.info('query stats disabled')
+
+    def ping(self) -> bool:
+        with self._pool.connection() as client:
+            return client.get_connection().ping()
+
+    def exec(self, sql: str, params: dict = None, with_column_types: bool = False, cmd: AbstractSql = None,
+             settings: dict = None):
+        hooks = self._hooks
+        query_id = str(uuid.uuid4()) if hooks else None
+        kwargs = {'query_id': query_id} if hooks else {}
+        self._local.last_query = None
+        start = time.monotonic()
+        error = None
+        try:
+            with self._pool.connection() as client:
+                result = client.execute(
+                    sql,
+                    params=params,
+                    with_column_types=with_column_types,
+                    settings=self._settings if settings is None else settings,
+                    **kwargs,
+                )
+                self._local.last_query = getattr(client, 'last_query', None)
+                return result
+        except Exception as exc:
+            error = exc
+            raise
+        finally:
+            if hooks:
+                self._notify(hooks, cmd, sql, query_id, time.monotonic() - start, error)
 
     def get_records(self, sql: str, model: Type = None, params: dict = None) -> List[Any]:
         data, columns = self.exec(sql, params, True)
-        columns = [re.sub(r'\W', '_', name) for name, type_ in columns]
-        records = []
+        to_record = _get_record_factory(model, tuple(re.sub(r'\W', '_', name) for name, type_ in columns))
+        return list(map(to_record, data))
 
-        for rec in data:
-            params = {columns[ix_]: value_ for ix_, value_ in enumerate(rec)}
-            records.append(model(**params) if model else params)
+    def iter_records(self, sql: str, model: Type = None, params: dict = None) -> Iterator[Any]:
+        """
+        streams records block by block. See: clickhouse_driver.Client.execute_iter
+        The client is held until the generator is exhausted or closed: don't run other queries while iterating,
+        a single shared client raises RuntimeError. A client of a stream which is not read to the end is disconnected
+        """
+        hooks = self._hooks
+        query_id = str(uuid.uuid4()) if hooks else None
+        kwargs = {'query_id': query_id} if hooks else {}
+        self._local.last_query = None
+        start = time.monotonic()
+        error = None
+        try:
+            with self._pool.connection() as client:
+                rows = client.execute_iter(
+                    sql,
+                    params=params,
+                    with_column_types=True,
+                    settings=self._settings,
+                    **kwargs,
+                )
+                columns = next(rows, None)
+                if columns is not None:
+                    to_record = _get_record_factory(model, tuple(re.sub(r'\W', '_', name) for name, type_ in columns))
+                    yield from map(to_record, rows)
 
-        return records
+                self._local.last_query = getattr(client, 'last_query', None)
+        except Exception as exc:
+            error = exc
+            raise
+        finally:
+            if hooks:
+                self._notify(hooks, None, sql, query_id, time.monotonic() - start, error)
 
     def get_first_record(self, sql: str, model: Type = None, params: dict = None) -> Any:
         records = self.get_records(sql, model, params)
@@ -78,11 +279,64 @@ class CmdService:
         if issubclass(
             model_class,
             (AlterOnClusterCmd, CreateTableOnClusterCmd, TruncateOnClusterCmd, CreateDbOnCluster,
-             CreateDistributedTable, DropPartitionOnClusterCmd)
+             CreateDistributedTable, DropPartitionOnClusterCmd, KillQueryCmd, DropTableOnClusterCmd,
+             ExchangeTablesOnClusterCmd, OptimizePartitionCmd)
         ):
             if self._on_cluster:
                 params['on_cluster'] = self._on_cluster
 
-        cmd = model_class(**params)
+        return self.execute_cmd(model_class(**params))
+
+    def execute_cmd(self, cmd: AbstractSql) -> Any:
         log.info('%s', cmd)
-        self.exec(cmd.to_sql())
+        try:
+            if self._ddl_tasks is None or not cmd.on_cluster:
+                return self.exec(cmd.to_sql(), cmd=cmd)
+
+            log_comment = f'ripley-ddl-{uuid.uuid4()}'
+            result = self.exec(
+                cmd.to_sql(),
+                cmd=cmd,
+                settings={**self._settings, **_ASYNC_DDL_SETTINGS, 'log_comment': log_comment},
+            )
+            with self._ddl_lock:
+                if self._ddl_tasks is not None:
+                    self._ddl_tasks.append(log_comment)
+            return result
+        finally:
+            self._invalidate_metadata_cache(cmd)
+
+    def _notify(
+        self,
+        hooks: Tuple[QueryHook, ...],
+        cmd: AbstractSql,
+        sql: str,
+        query_id: str,
+        elapsed: float,
+        error: BaseException,
+    ) -> None:
+        progress = getattr(self.last_query, 'progress', None)
+        event = ClickhouseQueryEventModel(
+            cmd=type(cmd).__name__ if cmd else 'exec',
+            sql=repr(cmd) if cmd else _REMOTE_CREDENTIALS.sub(r"\1'*'\2'*'", sql),
+            settings=self._settings,
+            query_id=query_id,
+            elapsed=elapsed,
+            read_rows=getattr(progress, 'rows', 0),
+            read_bytes=getattr(progress, 'bytes', 0),
+            written_rows=getattr(progress, 'written_rows', 0),
+            written_bytes=getattr(progress, 'written_bytes', 0),
+            error=error,
+        )
+        for hook in hooks:
+            try:
+                hook(event)
+            except Exception as exc:
+                log.warning('query hook %s failed: %s', hook, exc)
+
+    def _invalidate_metadata_cache(self, cmd: AbstractSql) -> None:
+        if not self._metadata_cache:
+            return
+
+        for db, table in cmd.affected_tables:
+            self._metadata_cache.invalidate(self.get_db_or_default(db), table)
@@ -0,0 +1,193 @@
+import math
+import re
+import time
+from typing import Dict, List
+
+from .cmd_service import CmdService
+from .system_service import SystemService
+from .table_service import TableService
+from .._log import log
+from .._sql_cmd.clickhouse import DropTableOnClusterCmd, ModifyColumnCodecCmd
+from .._sql_cmd.general import BaseInsertIntoTableFromTable
+from ..clickhouse_models.codec import ClickhouseCodecAdviceModel as CodecAdvice
+from ..clickhouse_models.codec import ClickhouseCodecCandidateModel as CodecCandidate
+from ..clickhouse_models.column import ClickhouseColumnModel as Column
+from ..clickhouse_models.table import ClickhouseTableModel as Table
+
+CODECS = (
+    'LZ4',
+    'LZ4HC(9)',
+    'ZSTD(1)',
+    'ZSTD(3)',
+    'ZSTD(9)',
+    'Delta, ZSTD(1)',
+    'DoubleDelta',
+    'Gorilla',
+    'T64, ZSTD(1)',
+)
+
+_INTEGER = r'U?Int(8|16|32|64)'
+_DATE = r'Date(32)?|DateTime(\(.*\))?|DateTime64\(.*\)'
+_FLOAT = r'Float(32|64)'
+# specialized codecs by types they support. Nullable and LowCardinality columns get general codecs only
+_CODEC_TYPES = {
+    'Delta': (_INTEGER, _DATE),
+    'DoubleDelta': (_INTEGER, _DATE),
+    'Gorilla': (_FLOAT,),
+    'T64': (_INTEGER, _DATE),
+}
+_READ_RUNS = 3
+
+
+def _get_codec(column: Column) -> str:
+    """
+    codec expression of column, CODEC(ZSTD(1)) -> ZSTD(1)
+    """
+    match = re.fullmatch(r'CODEC\((.*)\)', column.compression_codec)
+    return match.group(1) if match else 'Default'
+
+
+def _get_sample_clause(table: Table, sample_rows: int) -> str:
+    """
+    SAMPLE by sampling key. Without it: random rows of the whole table by one scan, not first rows of first parts
+    """
+    if table.sampling_key:
+        return f'SAMPLE {sample_rows}'
+    if table.total_rows and table.total_rows > sample_rows:
+        return f'WHERE rand() % {math.ceil(table.total_rows / sample_rows)} = 0'
+    return ''
+
+
+def _is_compatible(codec: str, column_type: str) -> bool:
+    name = codec.split(',')[0].split('(')[0].strip()
+    if name not in _CODEC_TYPES:
+        return True
+    return any(re.fullmatch(pattern, column_type) for pattern in _CODEC_TYPES[name])
+
+
+class CodecService:
+    def __init__(self, system: SystemService, cmd: CmdService, table: TableService) -> None:
+        self._system = system
+        self._cmd = cmd
+        self._table = table
+
+    def _create_scratch(self, table: Table, name: str) -> Table:
+        self._drop(table.database, name)
+        return self._table.create_table_as(
+            table,
+            name,
+            table.database,
+            order_by=[table.sorting_key or 'tuple()'],
+            engine='MergeTree',
+        )
+
+    def _drop(self, db: str, name: str) -> None:
+        self._cmd.run_cmd(DropTableOnClusterCmd, model_params=dict(table_name=self._cmd.get_full_table_name(name, db)))
+
+    def _get_read_elapsed(self, table: Table, column: str) -> float:
+        elapsed = []
+        for _ in range(_READ_RUNS):
+            start = time.monotonic()
+            self._cmd.exec(f'SELECT count() FROM {table.full_name} WHERE NOT ignore(`{column}`)')
+            elapsed.append(time.monotonic() - start)
+        return min(elapsed)
+
+    def _get_insert_elapsed(self, sample: Table, scratch: Table, column: str) -> float:
+        """
+        INSERT of one column of {sample} into empty {scratch}: other columns get defaults
+        """
+        self._cmd.exec(f'TRUNCATE TABLE {scratch.full_name}')
+        start = time.monotonic()
+        self._cmd.exec(f'INSERT INTO {scratch.full_name} (`{column}`) SELECT `{column}` FROM {sample.full_name}')
+        return time.monotonic() - start
+
+    def _measure(self, sample: Table, name: str, codecs: Dict[str, str],
+                 columns: List[Column]) -> Dict[str, CodecCandidate]:
+        """
+        copy of {sample} with codecs by column name. Columns out of {codecs} keep current codec
+        """
+        scratch = self._create_scratch(sample, name)
+        try:
+            for column in columns:
+                if column.name in codecs and codecs[column.name] != _get_codec(column):
+                    self._cmd.run_cmd(
+                        ModifyColumnCodecCmd,
+                        model_params=dict(
+                            table_name=scratch.full_name,
+                            column=column.name,
+                            codec=codecs[column.name],
+                        ),
+                    )
+
+            self._cmd.run_cmd(
+                BaseInsertIntoTableFromTable,
+                model_params=dict(from_table=sample.full_name, to_table=scratch.full_name),
+            )
+            self._cmd.exec(f'OPTIMIZE TABLE {scratch.full_name} FINAL')
+
+            sizes = {column.name: column for column in self._system.get_table_columns(scratch.name, scratch.database)}
+            measured = {
+                column.name: CodecCandidate(
+                    codec=codecs[column.name],
+                    data_compressed_bytes=sizes[column.name].data_compressed_bytes,
+                    data_uncompressed_bytes=sizes[column.name].data_uncompressed_bytes,
+                    read_elapsed=self._get_read_elapsed(scratch, column.name),
+                    insert_elapsed=0,
+                )
+                for column in columns if column.name in codecs
+            }
+            # after sizes and reads: scratch table is truncated before each column
+            for column_name, candidate in measured.items():
+                candidate.insert_elapsed = self._get_insert_elapsed(sample, scratch, column_name)
+            return measured
+        finally:
+            self._drop(scratch.database, scratch.name)
+
+    def advise_codecs(self, table: Table, sample_rows: int = 100_000, codecs: List[str] = None,
+                      columns: List[str] = None) -> List[CodecAdvice]:
+        table_columns = [
+            column for column in self._system.get_table_columns(table.name, table.database)
+            if column.default_kind != 'ALIAS' and (not columns or column.name in columns)
+        ]
+        candidates = {column.name: [] for column in table_columns}
+        sample = self._create_scratch(table, f'{table.name}_codec_sample')
+        try:
+            self._cmd.exec(f'INSERT INTO {sample.full_name} SELECT * FROM {table.full_name} '
+                           f'{_get_sample_clause(table, sample_rows)} LIMIT {sample_rows}')
+
+            current = {column.name: _get_codec(column) for column in table_columns}
+            for ix, codec in enumerate([None, *(codecs or CODECS)]):
+                by_column = current if codec is None else {
+                    column.name: codec for column in table_columns
+                    if codec != current[column.name] and _is_compatible(codec, column.type)
+                }
+                if not by_column:
+                    continue
+
+                log.info('codec %s of %s columns', codec or 'current', len(by_column))
+                measured = self._measure(sample, f'{table.name}_codec_{ix}', by_column, table_columns)
+                for name, candidate in measured.items():
+                    candidates[name].append(candidate)
+        finally:
+            self._drop(sample.database, sample.name)
+
+        return [self._get_advice(table, column, candidates[column.name]) for column in table_columns]
+
+    def _get_advice(self, table: Table, column: Column, candidates: List[CodecCandidate]) -> CodecAdvice:
+        candidates = sorted(candidates, key=lambda candidate: (candidate.data_compressed_bytes, candidate.read_elapsed))
+        current = _get_codec(column)
+        alter = ''
+        if candidates and candidates[0].codec != current:
+            alter = ModifyColumnCodecCmd(
+                table.full_name, column.name, candidates[0].codec, self._cmd.on_cluster,
+            ).to_sql()
+
+        return CodecAdvice(
+            database=table.database,
+            table=table.name,
+            column=column.name,
+            type=column.type,
+            current_codec=current,
+            candidates=candidates,
+            alter=alter,
+        )
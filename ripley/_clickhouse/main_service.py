@@ -1,33 +1,100 @@
-from typing import Any, List
+import threading
+from dataclasses import replace
+from typing import Any, Callable, Iterator, List, Union
 
+from .client_pool import ClientPool, SingleClientPool
+from .codec_service import CodecService
 from .cmd_service import CmdService
 from .db_service import DbService
+from .merge_service import MergeService
 from .partition_service import PartitionService
+from .process_service import ProcessService, ProcessWatcher
+from .retention_service import RetentionService
+from .plan_service import (
+    PlanCmdService,
+    RawSql,
+    SnapshotSystemService,
+    get_dependencies,
+    group_cluster_alters,
+    merge_cluster_alters,
+)
+from .sync_service import SyncService
 from .system_service import SystemService
-from .table_service import TableService
-from .._protocols.clickhouse import ClickhouseProtocol
+from .table_service import TableRebuild, TableService
+from .tier_service import TierService
+from .wait_service import Waiter, WaitService
+from .._bulk import run_bulk
+from .._protocols.clickhouse import ClickhousePlanProtocol, ClickhouseProtocol
+from .._sql_cmd.general import AbstractSql
+from ..clickhouse_models.bulk_result import ClickhouseBulkResultModel as BulkResult
+from ..clickhouse_models.bulk_settings import ClickhouseBulkSettingsModel as BulkSettings
+from ..clickhouse_models.cache_stats import ClickhouseCacheStatsModel as CacheStats
+from ..clickhouse_models.checkpoint_settings import ClickhouseCheckpointSettingsModel as CheckpointSettings
+from ..clickhouse_models.codec import ClickhouseCodecAdviceModel as CodecAdvice
 from ..clickhouse_models.column import ClickhouseColumnModel as Column
+from ..clickhouse_models.column import ClickhouseColumnSummaryModel as ColumnSummary
 from ..clickhouse_models.db import ClickhouseDbModel as Db
+from ..clickhouse_models.ddl_queue import ClickhouseDdlQueueModel as DdlQueue
 from ..clickhouse_models.disk import ClickhouseDiskModel as Disk
+from ..clickhouse_models.merge import ClickhouseMergeModel as Merge
+from ..clickhouse_models.merge_schedule import ClickhouseMergeCandidateModel as MergeCandidate
+from ..clickhouse_models.merge_schedule import ClickhouseMergeScheduleSettingsModel as MergeScheduleSettings
+from ..clickhouse_models.metadata_snapshot import ClickhouseMetadataSnapshotModel as MetadataSnapshot
+from ..clickhouse_models.mutation import ClickhouseMutationModel as Mutation
+from ..clickhouse_models.part import ClickhousePartModel as Part
 from ..clickhouse_models.partition import ClickhousePartitionModel as Partition
+from ..clickhouse_models.plan_step import ClickhousePlanStepModel as PlanStep
+from ..clickhouse_models.pool_settings import ClickhousePoolSettingsModel as PoolSettings
 from ..clickhouse_models.process import ClickhouseProcessModel as Process
+from ..clickhouse_models.process import ClickhouseProcessEventModel as ProcessEvent
+from ..clickhouse_models.process import ClickhouseProcessKillRuleModel as KillRule
+from ..clickhouse_models.process import ClickhouseProcessSummaryModel as ProcessSummary
+from ..clickhouse_models.query_event import ClickhouseQueryEventModel as QueryEvent
+from ..clickhouse_models.query_event import ClickhouseQueryStatsModel as QueryStats
 from ..clickhouse_models.remote_settings import ClickhouseRemoteSettingsModel as RemoteSettings
+from ..clickhouse_models.retention import ClickhouseRetentionPolicyModel as RetentionPolicy
 from ..clickhouse_models.s3_settings import ClickhouseS3SettingsModel as S3Settings
 from ..clickhouse_models.s3_settings import S3SelectSettingsModel as S3SelectSettings
+from ..clickhouse_models.storage import ClickhousePartitionDiskModel as PartitionDisk
+from ..clickhouse_models.storage import ClickhousePartitionMoveModel as PartitionMove
+from ..clickhouse_models.storage import ClickhouseTierRuleModel as TierRule
+from ..clickhouse_models.storage import ClickhouseVolumeModel as Volume
 from ..clickhouse_models.table import ClickhouseTableModel as Table
+from ..clickhouse_models.table import ClickhouseTableSummaryModel as TableSummary
+from ..clickhouse_models.wait_settings import ClickhouseWaitSettingsModel as WaitSettings
 
 
 class MainService(ClickhouseProtocol):
-    def __init__(self, client: Any) -> None:
+    def __init__(self, client: Any, pool_settings: PoolSettings = None) -> None:
         self._client = client
-        self._cmd = CmdService(client)
-        self._system = SystemService(self._cmd)
-        self._partition = PartitionService(client, self._system, self._cmd)
-        self._table = TableService(client, self._system, self._cmd)
-        self._db = DbService(client, self._system, self._cmd)
+        self._pool = ClientPool(client, pool_settings) if callable(client) else SingleClientPool(client)
+        self._init_services(CmdService(self._pool))
+
+    def _init_services(self, cmd: CmdService, system: SystemService = None) -> None:
+        self._cmd = cmd
+        self._system = system or SystemService(self._cmd)
+        self._partition = PartitionService(self._client, self._system, self._cmd)
+        self._table = TableService(self._client, self._system, self._cmd)
+        self._db = DbService(self._client, self._system, self._cmd)
+        self._process = ProcessService(self._system, self._cmd)
+        self._sync = SyncService(self._system, self._cmd)
+        self._tier = TierService(self._system, self._cmd)
+        self._codec = CodecService(self._system, self._cmd, self._table)
+        self._merge = MergeService(self._system, self._cmd)
+        self._retention = RetentionService(self._system, self._cmd)
+        self._wait = WaitService(self._system)
+
+    def __enter__(self) -> 'MainService':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
 
     def ping(self) -> bool:
-        return self._client.get_connection().ping()
+        return self._cmd.ping()
+
+    def close(self) -> None:
+        self._pool.close()
 
     @property
     def active_db(self) -> str:
@@ -53,6 +120,51 @@ class MainService(ClickhouseProtocol):
     def skip_on_cluster(self):
         self._cmd.skip_on_cluster()
 
+    @property
+    def ddl_tasks(self) -> List[str]:
+        return self._cmd.ddl_tasks
+
+    def set_async_ddl(self):
+        self._cmd.set_async_ddl()
+
+    def skip_async_ddl(self):
+        self._cmd.skip_async_ddl()
+
+    @property
+    def metadata_cache_stats(self) -> CacheStats:
+        return self._cmd.metadata_cache_stats
+
+    def set_metadata_cache(self, ttl: float = 60, max_size: int = 1024):
+        self._cmd.set_metadata_cache(ttl, max_size)
+
+    def skip_metadata_cache(self):
+        self._cmd.skip_metadata_cache()
+
+    @property
+    def query_stats(self) -> List[QueryStats]:
+        return self._cmd.query_stats
+
+    def set_query_stats(self, max_samples: int = 10_000):
+        self._cmd.set_query_stats(max_samples)
+
+    def skip_query_stats(self):
+        self._cmd.skip_query_stats()
+
+    def add_query_hook(self, hook: Callable[[QueryEvent], None]):
+        self._cmd.add_query_hook(hook)
+
+    def remove_query_hook(self, hook: Callable[[QueryEvent], None]):
+        self._cmd.remove_query_hook(hook)
+
+    def create_plan(self, snapshot: MetadataSnapshot = None) -> 'PlanService':
+        return PlanService(self._cmd, snapshot)
+
+    def get_metadata_snapshot(self, databases: List[str] = None) -> MetadataSnapshot:
+        return self._system.get_metadata_snapshot(databases)
+
+    def get_remote_metadata_snapshot(self, settings: RemoteSettings, tables: List[str] = None) -> MetadataSnapshot:
+        return self._system.get_remote_metadata_snapshot(settings, tables)
+
     def create_db(self, name: str, engine: str = '') -> Db:
         return self._db.create_db(name, engine)
 
@@ -74,32 +186,144 @@ class MainService(ClickhouseProtocol):
     def attach_partition(self, table: Table, partition: str) -> None:
         self._partition.attach_partition(table, partition)
 
-    def get_databases(self) -> List[Db]:
-        return self._system.get_databases()
+    def move_partitions(self, from_table: Table, to_table: Table, partitions: List[Union[str, Partition]],
+                        settings: BulkSettings = None) -> List[BulkResult]:
+        return self._partition.move_partitions(from_table, to_table, partitions, settings)
+
+    def replace_partitions(self, from_table: Table, to_table: Table, partitions: List[Union[str, Partition]],
+                           settings: BulkSettings = None) -> List[BulkResult]:
+        return self._partition.replace_partitions(from_table, to_table, partitions, settings)
+
+    def drop_partitions(self, table: Table, partitions: List[Union[str, Partition]],
+                        settings: BulkSettings = None) -> List[BulkResult]:
+        return self._partition.drop_partitions(table, partitions, settings)
+
+    def detach_partitions(self, table: Table, partitions: List[Union[str, Partition]],
+                          settings: BulkSettings = None) -> List[BulkResult]:
+        return self._partition.detach_partitions(table, partitions, settings)
+
+    def attach_partitions(self, table: Table, partitions: List[Union[str, Partition]],
+                          settings: BulkSettings = None) -> List[BulkResult]:
+        return self._partition.attach_partitions(table, partitions, settings)
 
-    def get_database_by_name(self, name: str = '') -> Db:
-        return self._system.get_database_by_name(name)
+    def get_databases(self, fields: List[str] = None) -> List[Db]:
+        return self._system.get_databases(fields)
 
-    def get_tables_by_db(self, db: str = '') -> List[Table]:
-        return self._system.get_tables_by_db(db)
+    def iter_databases(self, fields: List[str] = None) -> Iterator[Db]:
+        return self._system.iter_databases(fields)
 
-    def get_table_by_name(self, table: str, db: str = '') -> Table:
-        return self._system.get_table_by_name(table, db)
+    def get_database_by_name(self, name: str = '', fields: List[str] = None) -> Db:
+        return self._system.get_database_by_name(name, fields)
+
+    def get_tables_by_db(self, db: str = '', fields: List[str] = None) -> List[Table]:
+        return self._system.get_tables_by_db(db, fields)
+
+    def iter_tables_by_db(self, db: str = '', fields: List[str] = None) -> Iterator[Table]:
+        return self._system.iter_tables_by_db(db, fields)
+
+    def get_table_summaries(self, db: str = '') -> List[TableSummary]:
+        return self._system.get_table_summaries(db)
+
+    def get_table_by_name(self, table: str, db: str = '', fields: List[str] = None) -> Table:
+        return self._system.get_table_by_name(table, db, fields)
 
     def get_table_partitions(self, table: str, db: str = '') -> List[Partition]:
         return self._system.get_table_partitions(table, db)
 
-    def get_processes(self) -> List[Process]:
-        return self._system.get_processes()
+    def get_table_parts(self, table: str, db: str = '', fields: List[str] = None) -> List[Part]:
+        return self._system.get_table_parts(table, db, fields)
+
+    def iter_table_partitions(self, table: str, db: str = '') -> Iterator[Partition]:
+        return self._system.iter_table_partitions(table, db)
+
+    def get_remote_table_partitions(self, settings: RemoteSettings) -> List[Partition]:
+        return self._system.get_remote_table_partitions(settings)
+
+    def get_processes(self, fields: List[str] = None) -> List[Process]:
+        return self._system.get_processes(fields)
 
-    def get_process_by_query_id(self, query_id: str) -> Process:
-        return self._system.get_process_by_query_id(query_id)
+    def iter_processes(self, fields: List[str] = None) -> Iterator[Process]:
+        return self._system.iter_processes(fields)
 
-    def get_disks(self) -> List[Disk]:
-        return self._system.get_disks()
+    def get_process_by_query_id(self, query_id: str, fields: List[str] = None) -> Process:
+        return self._system.get_process_by_query_id(query_id, fields)
 
-    def get_table_columns(self, table: str, db: str = '') -> List[Column]:
-        return self._system.get_table_columns(table, db)
+    def get_process_summaries(self) -> List[ProcessSummary]:
+        return self._system.get_process_summaries()
+
+    def kill_query(self, query_id: str) -> None:
+        self._process.kill_query(query_id)
+
+    def create_process_watcher(self, rules: List[KillRule] = None) -> ProcessWatcher:
+        return self._process.create_watcher(rules)
+
+    def watch_processes(self, interval: float = 1, rules: List[KillRule] = None) -> Iterator[ProcessEvent]:
+        return self._process.watch_processes(interval, rules)
+
+    def get_pending_mutations(self, table: str, db: str = '', partition_id: str = '') -> List[Mutation]:
+        return self._system.get_pending_mutations(table, db, partition_id)
+
+    def get_merges(self, table: str, db: str = '', partition_id: str = '') -> List[Merge]:
+        return self._system.get_merges(table, db, partition_id)
+
+    def create_mutations_waiter(self, table: str, db: str = '', partition_id: str = '', settings: WaitSettings = None,
+                                progress: Callable[[List[Mutation]], None] = None) -> Waiter:
+        return self._wait.create_mutations_waiter(table, db, partition_id, settings, progress)
+
+    def create_merges_waiter(self, table: str, db: str = '', partition_id: str = '', settings: WaitSettings = None,
+                             progress: Callable[[List[Merge]], None] = None) -> Waiter:
+        return self._wait.create_merges_waiter(table, db, partition_id, settings, progress)
+
+    def wait_for_mutations(
+        self,
+        table: str,
+        db: str = '',
+        partition_id: str = '',
+        settings: WaitSettings = None,
+        progress: Callable[[List[Mutation]], None] = None,
+    ) -> None:
+        self.create_mutations_waiter(table, db, partition_id, settings, progress).wait()
+
+    def wait_for_merges(
+        self,
+        table: str,
+        db: str = '',
+        partition_id: str = '',
+        settings: WaitSettings = None,
+        progress: Callable[[List[Merge]], None] = None,
+    ) -> None:
+        self.create_merges_waiter(table, db, partition_id, settings, progress).wait()
+
+    def get_ddl_queue(self, log_comments: List[str] = None) -> List[DdlQueue]:
+        return self._system.get_ddl_queue(self._cmd.ddl_tasks if log_comments is None else log_comments)
+
+    def create_ddl_waiter(self, settings: WaitSettings = None,
+                          progress: Callable[[List[DdlQueue]], None] = None) -> Waiter:
+        """
+        waiter of ddl_tasks. ddl_tasks are cleared: next commands are waited by the next waiter
+        """
+        return self._wait.create_ddl_waiter(self._cmd.pop_ddl_tasks(), settings, progress)
+
+    def wait_for_ddl(self, settings: WaitSettings = None, progress: Callable[[List[DdlQueue]], None] = None) -> None:
+        self.create_ddl_waiter(settings, progress).wait()
+
+    def get_disks(self, fields: List[str] = None) -> List[Disk]:
+        return self._system.get_disks(fields)
+
+    def get_storage_volumes(self, policy: str = '') -> List[Volume]:
+        return self._system.get_storage_volumes(policy)
+
+    def get_partition_disks(self, table: str, db: str = '') -> List[PartitionDisk]:
+        return self._system.get_partition_disks(table, db)
+
+    def get_table_columns(self, table: str, db: str = '', fields: List[str] = None) -> List[Column]:
+        return self._system.get_table_columns(table, db, fields)
+
+    def iter_table_columns(self, table: str, db: str = '', fields: List[str] = None) -> Iterator[Column]:
+        return self._system.iter_table_columns(table, db, fields)
+
+    def get_column_summaries(self, table: str, db: str = '') -> List[ColumnSummary]:
+        return self._system.get_column_summaries(table, db)
 
     def create_table_as(self, from_table: Table, table: str, db: str = '', order_by: list = None,
                         partition_by: list = None, engine: str = '') -> Table:
@@ -108,15 +332,40 @@ class MainService(ClickhouseProtocol):
     def insert_from_table(self, from_table: Table, to_table: Table) -> None:
         self._table.insert_from_table(from_table, to_table)
 
+    def insert_from_table_by_partitions(self, from_table: Table, to_table: Table,
+                                        checkpoint: CheckpointSettings = None, settings: BulkSettings = None,
+                                        replace: bool = False) -> List[BulkResult]:
+        return self._table.insert_from_table_by_partitions(from_table, to_table, checkpoint, settings, replace)
+
     def truncate(self, table: str, db: str = '') -> None:
         self._table.truncate(table, db)
 
+    def create_rebuild(self, table: Table, expected_rows: int = None) -> TableRebuild:
+        return self._table.create_rebuild(table, expected_rows)
+
+    def rebuild_table(self, table: Table, load: Callable[[Table], Any], expected_rows: int = None) -> Table:
+        return self._table.rebuild_table(table, load, expected_rows)
+
+    def rebuild_table_from_table(self, from_table: Table, table: Table, settings: BulkSettings = None) -> Table:
+        return self._table.rebuild_table_from_table(from_table, table, settings)
+
     def insert_from_s3(self, table: Table, s3_settings: S3Settings, s3_select_settings: S3SelectSettings = None):
         self._table.insert_from_s3(table, s3_settings, s3_select_settings)
 
+    def insert_from_s3_files(self, table: Table, s3_settings: S3Settings, urls: List[str] = None,
+                             s3_select_settings: S3SelectSettings = None, files_per_insert: int = 100,
+                             ledger_table: str = '', settings: BulkSettings = None) -> List[BulkResult]:
+        return self._table.insert_from_s3_files(table, s3_settings, urls, s3_select_settings, files_per_insert,
+                                                ledger_table, settings)
+
     def insert_table_to_s3(self, table: Table, s3_settings: S3Settings):
         self._table.insert_table_to_s3(table, s3_settings)
 
+    def insert_table_to_s3_by_partitions(self, table: Table, s3_settings: S3Settings, manifest_url: str = '',
+                                         partition_ids: List[str] = None,
+                                         settings: BulkSettings = None) -> List[BulkResult]:
+        return self._table.insert_table_to_s3_by_partitions(table, s3_settings, manifest_url, partition_ids, settings)
+
     def rename_table(self, table: Table, new_name: str, db: str = '') -> None:
         self._table.rename_table(table, new_name, db)
 
@@ -124,6 +373,168 @@ class MainService(ClickhouseProtocol):
                            create_table: bool = False) -> None:
         self._table.insert_from_remote(settings, table, db, create_table)
 
+    def insert_from_remote_by_partitions(
+        self,
+        settings: RemoteSettings,
+        table: str,
+        db: str = '',
+        create_table: bool = False,
+        checkpoint: CheckpointSettings = None,
+        bulk_settings: BulkSettings = None,
+    ) -> List[BulkResult]:
+        return self._table.insert_from_remote_by_partitions(
+            settings, table, db, create_table, checkpoint, bulk_settings,
+        )
+
+    def insert_from_remote_snapshot(
+        self,
+        settings: RemoteSettings,
+        snapshot: MetadataSnapshot,
+        db: str = '',
+        create_tables: bool = True,
+        checkpoint: CheckpointSettings = None,
+        bulk_settings: BulkSettings = None,
+    ) -> List[BulkResult]:
+        return self._table.insert_from_remote_snapshot(
+            settings, snapshot, db, create_tables, checkpoint, bulk_settings,
+        )
+
+    def sync_table(self, from_table: Table, to_table: Table, compare_hash: bool = False,
+                   settings: BulkSettings = None) -> List[BulkResult]:
+        return self._sync.sync_table(from_table, to_table, compare_hash, settings)
+
+    def sync_table_from_remote(self, remote_settings: RemoteSettings, to_table: Table, compare_hash: bool = False,
+                               settings: BulkSettings = None) -> List[BulkResult]:
+        return self._sync.sync_table_from_remote(remote_settings, to_table, compare_hash, settings)
+
+    def plan_partition_moves(self, tables: List[Table], rules: List[TierRule]) -> List[PartitionMove]:
+        return self._tier.plan_partition_moves(tables, rules)
+
+    def move_partitions_to_storage(self, moves: List[PartitionMove], max_bytes_per_second: float = None,
+                                   settings: BulkSettings = None) -> List[BulkResult]:
+        return self._tier.move_partitions_to_storage(moves, max_bytes_per_second, settings)
+
+    def advise_codecs(self, table: Table, sample_rows: int = 100_000, codecs: List[str] = None,
+                      columns: List[str] = None) -> List[CodecAdvice]:
+        return self._codec.advise_codecs(table, sample_rows, codecs, columns)
+
+    def plan_merges(self, table: Table, settings: MergeScheduleSettings = None) -> List[MergeCandidate]:
+        return self._merge.plan_merges(table, settings)
+
+    def optimize_partitions(self, table: Table, settings: MergeScheduleSettings = None,
+                            bulk_settings: BulkSettings = None) -> List[BulkResult]:
+        return self._merge.optimize_partitions(table, settings, bulk_settings)
+
+    def get_expired_partitions(self, table: Table, policy: RetentionPolicy) -> List[Partition]:
+        return self._retention.get_expired_partitions(table, policy)
+
+    def drop_expired_partitions(self, table: Table, policy: RetentionPolicy,
+                                settings: BulkSettings = None) -> List[BulkResult]:
+        return self._retention.drop_expired_partitions(table, policy, settings)
+
     def create_distributed_table(self, create_table: str, table: str, database: str, sharding_key: str = '',
                                  cluster: str = "'{cluster}'") -> Table:
         return self._table.create_distributed_table(create_table, table, database, sharding_key, cluster)
+
+
+def _not_in_plan(name: str, reason: str) -> Callable:
+    def _method(self, *args, **kwargs):
+        raise NotImplementedError(f'{name} is not supported by plan: {reason}')
+
+    _method.__name__ = name
+    return _method
+
+
+class PlanService(MainService, ClickhousePlanProtocol):
+    """
+    records commands of MainService calls. Metadata lookups are served from snapshot, see: SnapshotSystemService.
+    Methods which observe the server or run caller code are not recorded: NotImplementedError
+    """
+
+    create_plan = _not_in_plan('create_plan', 'plans can not be nested')
+    rebuild_table = _not_in_plan('rebuild_table', 'load can bypass the plan, use create_rebuild')
+    kill_query = _not_in_plan('kill_query', 'query id is unknown when the plan is executed')
+    create_process_watcher = _not_in_plan('create_process_watcher', 'processes are not recorded')
+    watch_processes = _not_in_plan('watch_processes', 'processes are not recorded')
+    create_mutations_waiter = _not_in_plan('create_mutations_waiter', 'recorded commands are not executed')
+    create_merges_waiter = _not_in_plan('create_merges_waiter', 'recorded commands are not executed')
+    create_ddl_waiter = _not_in_plan('create_ddl_waiter', 'recorded commands are not executed')
+    wait_for_mutations = _not_in_plan('wait_for_mutations', 'recorded commands are not executed')
+    wait_for_merges = _not_in_plan('wait_for_merges', 'recorded commands are not executed')
+    wait_for_ddl = _not_in_plan('wait_for_ddl', 'recorded commands are not executed')
+
+    def __init__(self, target: CmdService, snapshot: MetadataSnapshot = None) -> None:
+        self._client = None
+        self._target = target
+        self._lock = threading.Lock()
+        self._cmds: List[AbstractSql] = []
+        cmd = PlanCmdService(target, self._record)
+        self._init_services(cmd, SnapshotSystemService(cmd, snapshot))
+
+    def close(self) -> None:
+        """
+        plan has no own clients: clients of the service which created the plan stay open
+        """
+
+    def _record(self, cmd: AbstractSql) -> None:
+        with self._lock:
+            self._cmds.append(cmd)
+            self._system.apply(cmd)
+
+    @property
+    def steps(self) -> List[PlanStep]:
+        with self._lock:
+            cmds = list(self._cmds)
+
+        steps = []
+        for ix, (cmd, depends_on) in enumerate(zip(cmds, get_dependencies(cmds))):
+            steps.append(PlanStep(
+                index=ix,
+                cmd='exec' if isinstance(cmd, RawSql) else type(cmd).__name__,
+                sql=repr(cmd),
+                level=max((steps[dependency].level + 1 for dependency in depends_on), default=0),
+                depends_on=depends_on,
+                on_cluster=cmd.on_cluster,
+            ))
+
+        return steps
+
+    @staticmethod
+    def _execute_level(steps: List[PlanStep], execute: Callable[[str], None],
+                       settings: BulkSettings = None) -> List[BulkResult]:
+        # ON CLUSTER DDL goes through distributed DDL queue: one by one after local steps of the level
+        results = run_bulk([str(step.index) for step in steps if not step.on_cluster], execute, settings)
+        for step in steps:
+            if step.on_cluster:
+                results.extend(run_bulk([str(step.index)], execute, settings))
+        return results
+
+    def execute(self, settings: BulkSettings = None) -> List[BulkResult]:
+        with self._lock:
+            cmds = list(self._cmds)
+
+        steps = self.steps
+        # consecutive ON CLUSTER ALTERs of a table: one statement, result of statement is reported for each step
+        groups = {group[0]: group for group in group_cluster_alters(cmds, [step.depends_on for step in steps])}
+
+        def _execute(key: str) -> None:
+            for cmd in merge_cluster_alters([cmds[ix] for ix in groups[int(key)]]):
+                if isinstance(cmd, RawSql):
+                    self._target.exec(cmd.to_sql(), cmd.params)
+                else:
+                    self._target.execute_cmd(cmd)
+
+        results = {}
+        for level in sorted({step.level for step in steps}):
+            level_steps = [steps[ix] for ix in groups if steps[ix].level == level]
+            if any(not result.success for result in results.values()):
+                for step in level_steps:
+                    for ix in groups[step.index]:
+                        results[ix] = BulkResult(str(ix), 0, 0.0, RuntimeError('previous level failed'))
+                continue
+
+            for result in self._execute_level(level_steps, _execute, settings):
+                for ix in groups[int(result.key)]:
+                    results[ix] = replace(result, key=str(ix))
+
+        return [results[ix] for ix in range(len(steps))]
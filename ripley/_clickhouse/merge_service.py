@@ -0,0 +1,127 @@
+import threading
+from dataclasses import replace
+from typing import Dict, List
+
+from .cmd_service import CmdService
+from .system_service import SystemService
+from .._bulk import run_bulk
+from .._log import log
+from .._sql_cmd.clickhouse import OptimizePartitionCmd
+from ..clickhouse_models.bulk_result import ClickhouseBulkResultModel as BulkResult
+from ..clickhouse_models.bulk_settings import ClickhouseBulkSettingsModel as BulkSettings
+from ..clickhouse_models.merge_schedule import ClickhouseMergeCandidateModel as MergeCandidate
+from ..clickhouse_models.merge_schedule import ClickhouseMergeScheduleSettingsModel as MergeScheduleSettings
+from ..clickhouse_models.table import ClickhouseTableModel as Table
+
+
+class MergeService:
+    def __init__(self, system: SystemService, cmd: CmdService) -> None:
+        self._system = system
+        self._cmd = cmd
+        self._lock = threading.Lock()
+        self._reserved: Dict[str, int] = {}
+
+    def plan_merges(self, table: Table, settings: MergeScheduleSettings = None) -> List[MergeCandidate]:
+        settings = settings or MergeScheduleSettings()
+        candidates: Dict[str, MergeCandidate] = {}
+        for part in self._system.get_table_parts(table.name, table.database):
+            if not part.active:
+                continue
+
+            candidate = candidates.setdefault(part.partition_id, MergeCandidate(
+                database=part.database,
+                table=part.table,
+                partition=part.partition,
+                partition_id=part.partition_id,
+                parts=0,
+                rows=0,
+                bytes_on_disk=0,
+                disks=[],
+            ))
+            candidate.parts += 1
+            candidate.rows += part.rows
+            candidate.bytes_on_disk += part.bytes_on_disk
+            if part.disk_name not in candidate.disks:
+                candidate.disks.append(part.disk_name)
+
+        # most fragmented first, smaller partitions are merged faster
+        ranked = sorted(
+            (candidate for candidate in candidates.values() if candidate.parts >= settings.min_parts),
+            key=lambda candidate: (-candidate.parts, candidate.bytes_on_disk),
+        )
+        return ranked[:settings.max_partitions] if settings.max_partitions else ranked
+
+    def _get_load_error(self, settings: MergeScheduleSettings) -> str:
+        """
+        reason why the server is busy, empty if it is not
+        """
+        if settings.max_queries is None and settings.max_merges is None:
+            return ''
+
+        metrics = dict(self._cmd.exec("SELECT metric, value FROM system.metrics WHERE metric IN ('Query', 'Merge')"))
+        # Query includes the current one
+        queries = metrics.get('Query', 1) - 1
+        merges = metrics.get('Merge', 0)
+        if settings.max_queries is not None and queries > settings.max_queries:
+            return f'{queries} queries running, limit {settings.max_queries}'
+        if settings.max_merges is not None and merges > settings.max_merges:
+            return f'{merges} merges running, limit {settings.max_merges}'
+        return ''
+
+    def _reserve(self, candidate: MergeCandidate, settings: MergeScheduleSettings) -> None:
+        """
+        reserves bytes_on_disk * free_space_ratio on each disk of {candidate}, see: _release
+        """
+        required = int(candidate.bytes_on_disk * settings.free_space_ratio)
+        disks = {disk.name: disk for disk in self._system.get_disks(['name', 'free_space', 'keep_free_space'])}
+        with self._lock:
+            for name in candidate.disks:
+                available = disks[name].free_space - disks[name].keep_free_space - self._reserved.get(name, 0)
+                if available < required:
+                    raise RuntimeError(f'not enough space on disk {name}: {available} bytes free, {required} required')
+
+            for name in candidate.disks:
+                self._reserved[name] = self._reserved.get(name, 0) + required
+
+    def _release(self, candidate: MergeCandidate, settings: MergeScheduleSettings) -> None:
+        required = int(candidate.bytes_on_disk * settings.free_space_ratio)
+        with self._lock:
+            for name in candidate.disks:
+                self._reserved[name] -= required
+
+    def optimize_partitions(self, table: Table, settings: MergeScheduleSettings = None,
+                            bulk_settings: BulkSettings = None) -> List[BulkResult]:
+        settings = settings or MergeScheduleSettings()
+        candidates = {candidate.partition_id: candidate for candidate in self.plan_merges(table, settings)}
+        log.info('%s partitions of %s to optimize', len(candidates), table.full_name)
+
+        # busy server stops the schedule: remaining partitions are skipped, not retried
+        busy: List[str] = []
+
+        def _optimize(partition_id: str) -> int:
+            if busy:
+                return None
+
+            load_error = self._get_load_error(settings)
+            if load_error:
+                log.warning('server is busy: %s. optimization of %s is stopped', load_error, table.full_name)
+                busy.append(load_error)
+                return None
+
+            candidate = candidates[partition_id]
+            self._reserve(candidate, settings)
+            try:
+                self._cmd.run_cmd(
+                    OptimizePartitionCmd,
+                    model_params=dict(table_name=table.full_name, partition_id=partition_id, final=settings.final),
+                )
+            finally:
+                self._release(candidate, settings)
+
+            return candidate.bytes_on_disk
+
+        return [
+            replace(result, attempts=0, error=RuntimeError(f'skipped: server busy: {busy[0]}'))
+            if result.success and result.value is None else result
+            for result in run_bulk(list(candidates), _optimize, bulk_settings)
+        ]
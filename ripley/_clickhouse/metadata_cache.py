@@ -0,0 +1,71 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Tuple
+
+from ..clickhouse_models.cache_stats import ClickhouseCacheStatsModel
+
+
+class MetadataCache:
+    """
+    LRU cache of system.* lookups with TTL. Keys: (database, table, kind)
+    """
+
+    def __init__(self, ttl: float = 60, max_size: int = 1024) -> None:
+        self._ttl = ttl
+        self._max_size = max_size
+        self._items: 'OrderedDict[Tuple[str, str, str], Tuple[float, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._invalidations = 0
+
+    @property
+    def stats(self) -> ClickhouseCacheStatsModel:
+        return ClickhouseCacheStatsModel(
+            hits=self._hits,
+            misses=self._misses,
+            evictions=self._evictions,
+            invalidations=self._invalidations,
+            size=len(self._items),
+            max_size=self._max_size,
+            ttl=self._ttl,
+        )
+
+    def get(self, kind: str, db: str, table: str = '') -> Any:
+        key = (db, table, kind)
+        with self._lock:
+            item = self._items.get(key)
+            if item is None or item[0] < time.monotonic():
+                if item is not None:
+                    del self._items[key]
+                self._misses += 1
+                return None
+
+            self._items.move_to_end(key)
+            self._hits += 1
+            return item[1]
+
+    def set(self, kind: str, value: Any, db: str, table: str = '') -> None:
+        key = (db, table, kind)
+        with self._lock:
+            self._items[key] = (time.monotonic() + self._ttl, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self._max_size:
+                self._items.popitem(last=False)
+                self._evictions += 1
+
+    def invalidate(self, db: str, table: str = '') -> None:
+        """
+        drops all entries of the table. Empty table name drops all entries of the database
+        """
+        with self._lock:
+            keys = [key for key in self._items if key[0] == db and (not table or key[1] == table)]
+            for key in keys:
+                del self._items[key]
+            self._invalidations += len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
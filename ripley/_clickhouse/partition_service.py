@@ -1,14 +1,20 @@
-from typing import Any
+from typing import Any, Callable, List, Union
 
 from .cmd_service import CmdService
 from .system_service import SystemService
+from .._bulk import run_bulk
 from .._sql_cmd.clickhouse import (
+    AlterActionsCmd,
+    AlterOnClusterCmd,
     DetachPartitionOnClusterCmd,
     AttachPartitionOnClusterCmd,
     DropPartitionOnClusterCmd,
     MovePartitionOnClusterCmd,
     ReplacePartitionOnClusterCmd,
 )
+from ..clickhouse_models.bulk_result import ClickhouseBulkResultModel as BulkResult
+from ..clickhouse_models.bulk_settings import ClickhouseBulkSettingsModel as BulkSettings
+from ..clickhouse_models.partition import ClickhousePartitionModel as CPartition
 from ..clickhouse_models.table import ClickhouseTableModel as CTable
 
 
@@ -64,3 +70,79 @@ class PartitionService:
                 partition=partition,
             ),
         )
+
+    def move_partitions(self, from_table: CTable, to_table: CTable, partitions: List[Union[str, CPartition]],
+                        settings: BulkSettings = None) -> List[BulkResult]:
+        return self._run_bulk(
+            from_table, partitions, lambda p: MovePartitionOnClusterCmd(from_table.full_name, p, to_table.full_name),
+            lambda p: self.move_partition(from_table, to_table, p), settings,
+        )
+
+    def drop_partitions(self, table: CTable, partitions: List[Union[str, CPartition]],
+                        settings: BulkSettings = None) -> List[BulkResult]:
+        return self._run_bulk(
+            table, partitions, lambda p: DropPartitionOnClusterCmd(table.full_name, p),
+            lambda p: self.drop_partition(table, p), settings,
+        )
+
+    def replace_partitions(self, from_table: CTable, to_table: CTable, partitions: List[Union[str, CPartition]],
+                           settings: BulkSettings = None) -> List[BulkResult]:
+        return self._run_bulk(
+            to_table, partitions, lambda p: ReplacePartitionOnClusterCmd(to_table.full_name, p, from_table.full_name),
+            lambda p: self.replace_partition(from_table, to_table, p), settings,
+        )
+
+    def detach_partitions(self, table: CTable, partitions: List[Union[str, CPartition]],
+                          settings: BulkSettings = None) -> List[BulkResult]:
+        return self._run_bulk(
+            table, partitions, lambda p: DetachPartitionOnClusterCmd(table.full_name, p),
+            lambda p: self.detach_partition(table, p), settings,
+        )
+
+    def attach_partitions(self, table: CTable, partitions: List[Union[str, CPartition]],
+                          settings: BulkSettings = None) -> List[BulkResult]:
+        return self._run_bulk(
+            table, partitions, lambda p: AttachPartitionOnClusterCmd(table.full_name, p),
+            lambda p: self.attach_partition(table, p), settings,
+        )
+
+    def _run_bulk(
+        self,
+        table: CTable,
+        partitions: List[Union[str, CPartition]],
+        to_action: Callable[[str], AlterOnClusterCmd],
+        action: Callable[[str], None],
+        settings: BulkSettings = None,
+    ) -> List[BulkResult]:
+        """
+        one statement per partition or, with BulkSettings.batch_size > 1, actions of partitions combined
+        by AlterActionsCmd. Results of batches are reported per partition.
+        Partition models are taken by active parts, each partition once
+        """
+        keys = list(dict.fromkeys(
+            partition.partition if isinstance(partition, CPartition) else partition
+            for partition in partitions
+            if not isinstance(partition, CPartition) or partition.active
+        ))
+        if not settings or settings.batch_size <= 1:
+            return run_bulk(keys, action, settings)
+
+        batches = {}
+        alter = AlterActionsCmd(table.full_name, [to_action(key) for key in keys])
+        for batch in alter.split(settings.batch_size):
+            batch_keys = keys[:len(batch.actions)]
+            keys = keys[len(batch_keys):]
+            batch_key = f'{batch_keys[0]}..{batch_keys[-1]}' if len(batch_keys) > 1 else batch_keys[0]
+            batches[batch_key] = (batch_keys, batch.actions)
+
+        def _alter(batch_key: str) -> None:
+            self._cmd.run_cmd(
+                AlterActionsCmd,
+                model_params=dict(table_name=table.full_name, actions=batches[batch_key][1]),
+            )
+
+        return [
+            BulkResult(key, result.attempts, result.elapsed, result.error, result.value)
+            for result in run_bulk(list(batches), _alter, settings)
+            for key in batches[result.key][0]
+        ]
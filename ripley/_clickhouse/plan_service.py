@@ -0,0 +1,268 @@
+import re
+import threading
+from dataclasses import fields, replace
+from typing import Any, Callable, Dict, Iterator, List, Tuple, Type
+
+from .cmd_service import CmdService
+from .system_service import SystemService
+from .._sql_cmd.clickhouse import AlterActionsCmd, AlterOnClusterCmd, CreateDistributedTable
+from .._sql_cmd.general import (
+    AbstractSql,
+    BaseCreateDb,
+    BaseCreateTable,
+    BaseDropTable,
+    BaseExchangeTables,
+    BaseRenameTable,
+    BaseTruncate,
+)
+from ..clickhouse_models.column import ClickhouseColumnModel
+from ..clickhouse_models.db import ClickhouseDbModel
+from ..clickhouse_models.metadata_snapshot import ClickhouseMetadataSnapshotModel
+from ..clickhouse_models.partition import ClickhousePartitionModel
+from ..clickhouse_models.table import ClickhouseTableModel
+
+_READ_SQL = re.compile(r'^\s*(SELECT|WITH|SHOW|DESC|DESCRIBE|EXISTS|EXPLAIN)\b', re.IGNORECASE)
+
+TableKey = Tuple[str, str]
+
+
+class RawSql(AbstractSql):
+    """
+    statement of exec. Tables are unknown: plan executes it after all previous steps and before all next steps
+    """
+
+    def __init__(self, sql: str, params: Any = None) -> None:
+        self._sql = sql
+        self.params = params
+
+    def __repr__(self):
+        return self._sql
+
+    def to_sql(self) -> str:
+        return self._sql
+
+
+def _synthesize(model: Type, **values) -> Any:
+    params = {field.name: None for field in fields(model) if field.init}
+    params.update(values)
+    return model(**params)
+
+
+def _conflicts(left: List[TableKey], right: List[TableKey]) -> bool:
+    return any(
+        db == other_db and (not table or not other_table or table == other_table)
+        for db, table in left
+        for other_db, other_table in right
+    )
+
+
+def get_dependencies(cmds: List[AbstractSql]) -> List[List[int]]:
+    """
+    indexes of previous commands which must be completed before each command.
+    Read after write, write after read / write of the same table. Commands without tables depend on everything
+    """
+    dependencies = []
+    for ix, cmd in enumerate(cmds):
+        writes, reads = cmd.affected_tables, cmd.source_tables
+        dependencies.append([
+            prev_ix
+            for prev_ix, prev in enumerate(cmds[:ix])
+            if not (writes or reads)
+            or not (prev.affected_tables or prev.source_tables)
+            or _conflicts(prev.affected_tables, writes + reads)
+            or _conflicts(prev.source_tables, writes)
+        ])
+
+    return dependencies
+
+
+def _get_cluster_alter(cmd: AbstractSql) -> Tuple[str, str]:
+    """
+    (table, cluster) of ON CLUSTER ALTER which can be an action of AlterActionsCmd
+    """
+    if isinstance(cmd, AlterOnClusterCmd) and cmd.on_cluster and cmd.action:
+        return cmd._table_name, cmd.on_cluster
+    return '', ''
+
+
+def group_cluster_alters(cmds: List[AbstractSql], dependencies: List[List[int]]) -> List[List[int]]:
+    """
+    indexes of commands by statements: consecutive ON CLUSTER ALTERs of the same table are one statement
+    (one entry of distributed DDL queue) when they don't depend on other commands than the first one
+    """
+    groups = []
+    for ix, cmd in enumerate(cmds):
+        group = groups[-1] if groups else []
+        alter = _get_cluster_alter(cmd)
+        if (
+            alter[0]
+            and group and group[-1] == ix - 1
+            and _get_cluster_alter(cmds[group[0]]) == alter
+            and set(dependencies[ix]) - set(group) <= set(dependencies[group[0]])
+        ):
+            group.append(ix)
+        else:
+            groups.append([ix])
+
+    return groups
+
+
+def merge_cluster_alters(cmds: List[AbstractSql]) -> List[AbstractSql]:
+    """
+    ALTER TABLE ... ON CLUSTER statement with actions of {cmds}, see: group_cluster_alters.
+    Split by max_query_size, see: AlterActionsCmd.split
+    """
+    if len(cmds) == 1:
+        return cmds
+
+    table, cluster = _get_cluster_alter(cmds[0])
+    return AlterActionsCmd(table, cmds, cluster).split()
+
+
+class PlanCmdService(CmdService):
+    """
+    records commands instead of execution. Read-only queries are executed by the server
+    """
+
+    def __init__(self, target: CmdService, record: Callable[[AbstractSql], None]) -> None:
+        super().__init__(target._pool)
+        self._settings = target.settings
+        self._on_cluster = target.on_cluster
+        self._record = record
+
+    @property
+    def recording(self) -> bool:
+        return True
+
+    def exec(self, sql: str, params: dict = None, with_column_types: bool = False, cmd: AbstractSql = None,
+             settings: dict = None):
+        if cmd is not None or _READ_SQL.match(sql):
+            return super().exec(sql, params, with_column_types, cmd, settings)
+
+        self._record(RawSql(sql, params))
+        return ([], []) if with_column_types else []
+
+    def execute_cmd(self, cmd: AbstractSql) -> Any:
+        if cmd.readonly:
+            return super().execute_cmd(cmd)
+
+        self._record(cmd)
+        return []
+
+
+class SnapshotSystemService(SystemService):
+    """
+    serves databases, tables, columns and partitions from snapshot. Databases which are not in snapshot are
+    requested from the server. Tables created by recorded commands are synthesized from source tables
+    """
+
+    def __init__(self, cmd: CmdService, snapshot: ClickhouseMetadataSnapshotModel = None) -> None:
+        super().__init__(cmd)
+        snapshot = snapshot or ClickhouseMetadataSnapshotModel()
+        self._lock = threading.RLock()
+        self._snapshot_dbs = {db.name for db in snapshot.databases}
+        self._dbs: Dict[str, ClickhouseDbModel] = {db.name: db for db in snapshot.databases}
+        self._tables: Dict[TableKey, ClickhouseTableModel] = {}
+        self._columns: Dict[TableKey, List[ClickhouseColumnModel]] = {}
+        self._partitions: Dict[TableKey, List[ClickhousePartitionModel]] = {}
+
+        for table in snapshot.tables:
+            self._tables[(table.database, table.name)] = table
+        for column in snapshot.columns:
+            self._columns.setdefault((column.database, column.table), []).append(column)
+        for partition in snapshot.partitions:
+            self._partitions.setdefault((partition.database, partition.table), []).append(partition)
+
+    def _find(self, store: dict, db: str, key: Any, default: Any = None) -> Tuple[bool, Any]:
+        """
+        (True, value) if metadata is known by snapshot or recorded commands
+        """
+        with self._lock:
+            if key in store:
+                return True, store[key]
+
+            return db in self._snapshot_dbs, default
+
+    def apply(self, cmd: AbstractSql) -> None:
+        """
+        changes metadata by recorded command
+        """
+        with self._lock:
+            if isinstance(cmd, BaseCreateDb):
+                for name, _ in cmd.affected_tables:
+                    self._dbs.setdefault(name, _synthesize(ClickhouseDbModel, name=name))
+            elif isinstance(cmd, BaseRenameTable):
+                (db, table), (new_db, new_table) = cmd.affected_tables
+                self._create(new_db, new_table, [(db, table)])
+                self._tables[(db, table)] = None
+            elif isinstance(cmd, (BaseCreateTable, CreateDistributedTable)):
+                for db, table in cmd.affected_tables:
+                    self._create(db, table, cmd.source_tables)
+            elif isinstance(cmd, (BaseTruncate, BaseDropTable)):
+                for key in cmd.affected_tables:
+                    self._partitions[key] = []
+                    if isinstance(cmd, BaseDropTable):
+                        self._tables[key], self._columns[key] = None, []
+            elif isinstance(cmd, BaseExchangeTables):
+                self._exchange(cmd.affected_tables)
+
+    def _exchange(self, keys: List[TableKey]) -> None:
+        keys = [(self._cmd.get_db_or_default(db), table) for db, table in keys]
+        metadata = [
+            (self.get_table_by_name(table, db), self.get_table_columns(table, db), self.get_table_partitions(table, db))
+            for db, table in keys
+        ]
+        for (db, table), (model, columns, partitions) in zip(keys, reversed(metadata)):
+            self._tables[(db, table)] = model and replace(model, database=db, name=table)
+            self._columns[(db, table)] = [replace(column, database=db, table=table) for column in columns]
+            self._partitions[(db, table)] = [replace(partition, database=db, table=table) for partition in partitions]
+
+    def _create(self, db: str, table: str, sources: List[TableKey]) -> None:
+        source = self.get_table_by_name(sources[0][1], sources[0][0]) if sources else None
+        if source:
+            columns = self.get_table_columns(source.name, source.database)
+            self._tables[(db, table)] = replace(source, database=db, name=table)
+            self._columns[(db, table)] = [replace(column, database=db, table=table) for column in columns]
+        else:
+            self._tables[(db, table)] = _synthesize(ClickhouseTableModel, database=db, name=table)
+            self._columns[(db, table)] = []
+
+        self._partitions[(db, table)] = []
+
+    def get_database_by_name(self, name: str = '', fields: List[str] = None) -> ClickhouseDbModel:
+        name = self._cmd.get_db_or_default(name)
+        found, db = self._find(self._dbs, name, name)
+        return db if found else super().get_database_by_name(name, fields)
+
+    def get_table_by_name(self, table: str, db: str = '', fields: List[str] = None) -> ClickhouseTableModel:
+        db = self._cmd.get_db_or_default(db)
+        found, model = self._find(self._tables, db, (db, table))
+        return model if found else super().get_table_by_name(table, db, fields)
+
+    def get_tables_by_db(self, db: str = '', fields: List[str] = None) -> List[ClickhouseTableModel]:
+        db = self._cmd.get_db_or_default(db)
+        with self._lock:
+            if db in self._snapshot_dbs:
+                return [table for (table_db, _), table in self._tables.items() if table and table_db == db]
+
+        return super().get_tables_by_db(db, fields)
+
+    def iter_tables_by_db(self, db: str = '', fields: List[str] = None) -> Iterator[ClickhouseTableModel]:
+        return iter(self.get_tables_by_db(db, fields))
+
+    def get_table_columns(self, table: str, db: str = '', fields: List[str] = None) -> List[ClickhouseColumnModel]:
+        db = self._cmd.get_db_or_default(db)
+        found, columns = self._find(self._columns, db, (db, table), [])
+        return columns if found else super().get_table_columns(table, db, fields)
+
+    def iter_table_columns(self, table: str, db: str = '',
+                           fields: List[str] = None) -> Iterator[ClickhouseColumnModel]:
+        return iter(self.get_table_columns(table, db, fields))
+
+    def get_table_partitions(self, table: str, db: str = '') -> List[ClickhousePartitionModel]:
+        db = self._cmd.get_db_or_default(db)
+        found, partitions = self._find(self._partitions, db, (db, table), [])
+        return partitions if found else super().get_table_partitions(table, db)
+
+    def iter_table_partitions(self, table: str, db: str = '') -> Iterator[ClickhousePartitionModel]:
+        return iter(self.get_table_partitions(table, db))
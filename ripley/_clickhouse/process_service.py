@@ -0,0 +1,87 @@
+import time
+from typing import Dict, Iterator, List, Set
+
+from .cmd_service import CmdService
+from .system_service import SystemService
+from .._log import log
+from .._sql_cmd.clickhouse import KillQueryCmd
+from ..clickhouse_models.process import ClickhouseProcessEventModel as ProcessEvent
+from ..clickhouse_models.process import ClickhouseProcessKillRuleModel as KillRule
+from ..clickhouse_models.process import ClickhouseProcessSummaryModel as ProcessSummary
+
+
+def _exceeds(rule: KillRule, process: ProcessSummary) -> bool:
+    if rule.user and rule.user != process.user:
+        return False
+    if rule.query_kind and rule.query_kind != process.query_kind:
+        return False
+
+    return any([
+        rule.max_elapsed is not None and process.elapsed > rule.max_elapsed,
+        rule.max_memory_usage is not None and process.memory_usage > rule.max_memory_usage,
+        rule.max_read_rows is not None and process.read_rows > rule.max_read_rows,
+    ])
+
+
+class ProcessWatcher:
+    """
+    compares samples of system.processes. Kills queries which exceed rules once
+    """
+
+    def __init__(self, service: 'ProcessService', rules: List[KillRule] = None) -> None:
+        self._service = service
+        self._rules = rules or []
+        self._processes: Dict[str, ProcessSummary] = {}
+        self._killed: Set[str] = set()
+
+    def poll(self) -> List[ProcessEvent]:
+        processes = {process.query_id: process for process in self._service.get_process_summaries()}
+        events = []
+        for query_id, process in processes.items():
+            previous = self._processes.get(query_id)
+            if previous is None:
+                events.append(ProcessEvent('new', process))
+            elif (previous.memory_usage, previous.read_rows, previous.written_rows) != (
+                process.memory_usage, process.read_rows, process.written_rows,
+            ):
+                events.append(ProcessEvent('changed', process))
+
+            if query_id in self._killed or process.is_cancelled:
+                continue
+
+            for rule in self._rules:
+                if _exceeds(rule, process):
+                    log.warning('kill query %s of user %s by rule %s', query_id, process.user, rule)
+                    self._service.kill_query(query_id)
+                    self._killed.add(query_id)
+                    events.append(ProcessEvent('killed', process, rule))
+                    break
+
+        for query_id, process in self._processes.items():
+            if query_id not in processes:
+                self._killed.discard(query_id)
+                events.append(ProcessEvent('finished', process))
+
+        self._processes = processes
+        return events
+
+
+class ProcessService:
+    def __init__(self, system: SystemService, cmd: CmdService) -> None:
+        self._system = system
+        self._cmd = cmd
+
+    def get_process_summaries(self) -> List[ProcessSummary]:
+        return self._system.get_process_summaries()
+
+    def kill_query(self, query_id: str) -> None:
+        self._cmd.run_cmd(KillQueryCmd, model_params=dict(query_id=query_id))
+
+    def create_watcher(self, rules: List[KillRule] = None) -> ProcessWatcher:
+        return ProcessWatcher(self, rules)
+
+    def watch_processes(self, interval: float = 1, rules: List[KillRule] = None) -> Iterator[ProcessEvent]:
+        watcher = self.create_watcher(rules)
+        while True:
+            yield from watcher.poll()
+            time.sleep(interval)
@@ -0,0 +1,66 @@
+import math
+import threading
+from collections import deque
+from typing import Deque, Dict, List
+
+from ..clickhouse_models.query_event import ClickhouseQueryEventModel as QueryEvent
+from ..clickhouse_models.query_event import ClickhouseQueryStatsModel as QueryStats
+
+
+def _percentile(values: List[float], percent: float) -> float:
+    """
+    nearest-rank percentile of sorted values
+    """
+    return values[max(math.ceil(percent / 100 * len(values)) - 1, 0)]
+
+
+class QueryStatsAggregator:
+    """
+    query hook which aggregates events per command. Percentiles are calculated over last {max_samples} events
+    """
+
+    def __init__(self, max_samples: int = 10_000) -> None:
+        self._max_samples = max_samples
+        self._lock = threading.Lock()
+        self._samples: Dict[str, Deque[float]] = {}
+        self._counters: Dict[str, List] = {}
+
+    def __call__(self, event: QueryEvent) -> None:
+        with self._lock:
+            if event.cmd not in self._samples:
+                self._samples[event.cmd] = deque(maxlen=self._max_samples)
+                self._counters[event.cmd] = [0, 0, 0.0, 0, 0]
+
+            self._samples[event.cmd].append(event.elapsed)
+            counters = self._counters[event.cmd]
+            counters[0] += 1
+            counters[1] += event.error is not None
+            counters[2] += event.elapsed
+            counters[3] += event.read_rows
+            counters[4] += event.written_rows
+
+    def get_stats(self) -> List[QueryStats]:
+        """
+        sorted by total time desc
+        """
+        with self._lock:
+            samples = {cmd: sorted(values) for cmd, values in self._samples.items()}
+            counters = {cmd: list(values) for cmd, values in self._counters.items()}
+
+        stats = []
+        for cmd, values in samples.items():
+            count, errors, total, read_rows, written_rows = counters[cmd]
+            stats.append(QueryStats(
+                cmd=cmd,
+                count=count,
+                errors=errors,
+                total=total,
+                p50=_percentile(values, 50),
+                p95=_percentile(values, 95),
+                p99=_percentile(values, 99),
+                max=values[-1],
+                read_rows=read_rows,
+                written_rows=written_rows,
+            ))
+
+        return sorted(stats, key=lambda item: item.total, reverse=True)
@@ -0,0 +1,174 @@
+import calendar
+import re
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from .cmd_service import CmdService
+from .system_service import SystemService
+from .._bulk import run_bulk
+from .._log import log
+from .._sql_cmd.clickhouse import AlterActionsCmd, DropPartitionIdCmd
+from ..clickhouse_models.bulk_result import ClickhouseBulkResultModel as BulkResult
+from ..clickhouse_models.bulk_settings import ClickhouseBulkSettingsModel as BulkSettings
+from ..clickhouse_models.partition import ClickhousePartitionModel as Partition
+from ..clickhouse_models.retention import ClickhouseRetentionPolicyModel as RetentionPolicy
+from ..clickhouse_models.table import ClickhouseTableModel as Table
+
+_NO_DATE = date(1970, 1, 1)
+_DAY = re.compile(r"^(\d{4})-?(\d{2})-?(\d{2})(?!\d)")
+_MONTH = re.compile(r"^(\d{4})-?(\d{2})(?:-01)?$")
+# function of partition key -> period of partition value
+_DATE_FUNCTIONS = {
+    'toyyyymm': 'month',
+    'tostartofmonth': 'month',
+    'toyyyymmdd': 'day',
+    'todate': 'day',
+    'tostartofday': 'day',
+    'tomonday': 'week',
+}
+_KEY_FUNCTION = re.compile(r'^(\w+)\s*\((?:[^()]|\([^()]*\))*\)$')
+_IDENTIFIER = re.compile(r'^`?(\w+)`?$')
+
+
+def _split_tuple(value: str) -> List[str]:
+    """
+    top level elements of tuple: (toYYYYMM(day), key) -> ['toYYYYMM(day)', 'key'], ('2024-01-31', 1) -> ...
+    """
+    value = value.strip()
+    if not value.startswith('(') or not value.endswith(')'):
+        return [value]
+
+    elements, depth, quote, start = [], 0, False, 1
+    for i, char in enumerate(value[1:-1], 1):
+        if char == "'" and value[i - 1] != '\\':
+            quote = not quote
+        elif not quote and char in '([':
+            depth += 1
+        elif not quote and char in ')]':
+            depth -= 1
+        elif not quote and not depth and char == ',':
+            elements.append(value[start:i].strip())
+            start = i + 1
+    elements.append(value[start:-1].strip())
+    return elements
+
+
+def _get_date_period(partition_key: str, date_columns: List[str]) -> Tuple[Optional[int], str]:
+    """
+    element of partition key tuple and period of partition value:
+    Date / DateTime column, toYYYYMM, toYYYYMMDD, toMonday, ... -> day / week / month. (None, '') if key is not a date
+    """
+    for i, element in enumerate(_split_tuple(partition_key or '')):
+        function = _KEY_FUNCTION.match(element)
+        if function:
+            period = _DATE_FUNCTIONS.get(function.group(1).lower())
+            if period:
+                return i, period
+            continue
+
+        column = _IDENTIFIER.match(element)
+        if column and column.group(1) in date_columns:
+            return i, 'day'
+    return None, ''
+
+
+def _get_partition_date(partition: str, index: int, period: str) -> Optional[date]:
+    """
+    newest date of partition value: last day of month / week
+    """
+    values = _split_tuple(partition)
+    if index >= len(values):
+        return None
+
+    value = values[index].strip("'")
+    match = (_MONTH if period == 'month' else _DAY).match(value)
+    if not match:
+        return None
+
+    year, month, *day = (int(value) for value in match.groups())
+    try:
+        if period == 'month':
+            return date(year, month, calendar.monthrange(year, month)[1])
+        return date(year, month, day[0]) + timedelta(days=6 if period == 'week' else 0)
+    except ValueError:
+        return None
+
+
+def _get_cutoff(policy: RetentionPolicy, today: date) -> date:
+    if (policy.keep_days is None) == (policy.keep_months is None):
+        raise ValueError('one of keep_days, keep_months is required')
+    if policy.keep_days is not None:
+        return today - timedelta(days=policy.keep_days)
+
+    year, month = divmod(today.year * 12 + today.month - 1 - policy.keep_months, 12)
+    return date(year, month + 1, min(today.day, calendar.monthrange(year, month + 1)[1]))
+
+
+class RetentionService:
+    def __init__(self, system: SystemService, cmd: CmdService) -> None:
+        self._system = system
+        self._cmd = cmd
+
+    def _get_newest_by_parts(self, table: Table) -> Dict[str, date]:
+        newest = {}
+        for part in self._system.get_table_parts(table.name, table.database,
+                                                 ['partition_id', 'active', 'max_date', 'max_time']):
+            if part.active:
+                part_date = max(part.max_date or _NO_DATE, part.max_time.date() if part.max_time else _NO_DATE)
+                newest[part.partition_id] = max(part_date, newest.get(part.partition_id, _NO_DATE))
+
+        return {partition_id: value for partition_id, value in newest.items() if value > _NO_DATE}
+
+    def _get_date_columns(self, table: Table) -> List[str]:
+        columns = self._system.get_table_columns(table.name, table.database, ['name', 'type'])
+        return [column.name for column in columns
+                if re.sub(r'^(?:LowCardinality|Nullable)\(', '', column.type).startswith('Date')]
+
+    def _get_newest_by_partition_key(self, table: Table, partitions: Dict[str, Partition]) -> Dict[str, date]:
+        index, period = _get_date_period(table.partition_key, self._get_date_columns(table))
+        if index is None:
+            log.warning('partition key of %s is not a date: %s, partitions are kept', table.full_name,
+                        table.partition_key)
+            return {}
+
+        return {partition_id: _get_partition_date(partition.partition, index, period)
+                for partition_id, partition in partitions.items()}
+
+    def get_expired_partitions(self, table: Table, policy: RetentionPolicy) -> List[Partition]:
+        cutoff = _get_cutoff(policy, date.today())
+        partitions = {}
+        for partition in self._system.get_table_partitions(table.name, table.database):
+            if partition.active:
+                partitions.setdefault(partition.partition_id, partition)
+
+        if policy.by == 'partition':
+            newest = self._get_newest_by_partition_key(table, partitions)
+        elif policy.by == 'max_time':
+            newest = self._get_newest_by_parts(table)
+        else:
+            raise ValueError(f'unknown retention by: {policy.by}')
+
+        expired = [partition for partition_id, partition in partitions.items()
+                   if newest.get(partition_id) and newest[partition_id] < cutoff]
+        log.info('%s of %s partitions of %s are older than %s', len(expired), len(partitions), table.full_name, cutoff)
+        return expired
+
+    def drop_expired_partitions(self, table: Table, policy: RetentionPolicy,
+                                settings: BulkSettings = None) -> List[BulkResult]:
+        partition_ids = [partition.partition_id for partition in self.get_expired_partitions(table, policy)]
+        alter = AlterActionsCmd(
+            table.full_name,
+            [DropPartitionIdCmd(table.full_name, partition_id) for partition_id in partition_ids],
+        )
+        batches = {}
+        for batch in alter.split(policy.batch_size):
+            ids = partition_ids[:len(batch.actions)]
+            partition_ids = partition_ids[len(ids):]
+            batches[f'{ids[0]}..{ids[-1]}' if len(ids) > 1 else ids[0]] = (ids, batch.actions)
+
+        def _drop(key: str) -> List[str]:
+            ids, actions = batches[key]
+            self._cmd.run_cmd(AlterActionsCmd, model_params=dict(table_name=table.full_name, actions=actions))
+            return ids
+
+        return run_bulk(list(batches), _drop, settings)
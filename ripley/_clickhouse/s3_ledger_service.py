@@ -0,0 +1,47 @@
+from typing import Dict, List, Tuple
+
+from .cmd_service import CmdService
+
+
+class S3LedgerService:
+    """
+    table of loaded S3 objects: url, size, etag, batch, batch_rows. See: ClickhouseProtocol.insert_from_s3_files
+    """
+    def __init__(self, cmd: CmdService) -> None:
+        self._cmd = cmd
+
+    def get_loaded(self, table: str, urls: List[str]) -> Dict[str, List[Tuple[int, str]]]:
+        """
+        versions of loaded objects: url -> [(size, etag), ...]
+        """
+        self._cmd.exec(f"""
+            CREATE TABLE IF NOT EXISTS {table}
+            (
+                url String,
+                size UInt64,
+                etag String,
+                batch String,
+                batch_rows UInt64,
+                loaded_at DateTime DEFAULT now()
+            )
+            ENGINE MergeTree() ORDER BY url
+        """)
+        # ledger of previous versions
+        self._cmd.exec(f'ALTER TABLE {table} ADD COLUMN IF NOT EXISTS etag String AFTER size')
+        if not urls:
+            return {}
+
+        loaded = {}
+        result = self._cmd.exec(
+            f'SELECT url, size, etag FROM {table} WHERE url IN %(urls)s',
+            params={'urls': tuple(urls)},
+        )
+        for url, size, etag in result:
+            loaded.setdefault(url, []).append((size, etag))
+        return loaded
+
+    def mark_loaded(self, table: str, files: List[Tuple[str, int, str]], batch: str, batch_rows: int) -> None:
+        self._cmd.exec(
+            f'INSERT INTO {table} (url, size, etag, batch, batch_rows) VALUES',
+            params=[(url, size, etag, batch, batch_rows) for url, size, etag in files],
+        )
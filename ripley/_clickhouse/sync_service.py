@@ -0,0 +1,123 @@
+from typing import Dict, List
+
+from .cmd_service import CmdService
+from .system_service import SystemService
+from .._bulk import run_bulk
+from .._log import log
+from .._sql_cmd.clickhouse import DropPartitionIdCmd, InsertFromRemotePartitionCmd, Remote, ReplacePartitionIdCmd
+from ..clickhouse_models.bulk_result import ClickhouseBulkResultModel as BulkResult
+from ..clickhouse_models.bulk_settings import ClickhouseBulkSettingsModel as BulkSettings
+from ..clickhouse_models.partition import ClickhousePartitionModel as Partition
+from ..clickhouse_models.remote_settings import ClickhouseRemoteSettingsModel as RemoteSettings
+from ..clickhouse_models.table import ClickhouseTableModel as Table
+
+
+def _get_active(partitions: List[Partition]) -> Dict[str, Partition]:
+    return {partition.partition_id: partition for partition in partitions if partition.active}
+
+
+class SyncService:
+    def __init__(self, system: SystemService, cmd: CmdService) -> None:
+        self._system = system
+        self._cmd = cmd
+
+    def _drop_partition(self, table: Table, partition_id: str) -> None:
+        self._cmd.run_cmd(
+            DropPartitionIdCmd,
+            model_params=dict(table_name=table.full_name, partition_id=partition_id),
+        )
+
+    def _get_hashes(self, table: str, partition_ids: List[str]) -> Dict[str, int]:
+        """
+        order independent hash of rows per partition. Sum of row hashes: duplicated rows are not compensated
+        """
+        if not partition_ids:
+            return {}
+
+        return dict(self._cmd.exec(f"""
+            SELECT _partition_id, sum(cityHash64(*))
+              FROM {table}
+             WHERE _partition_id IN %(partition_ids)s
+             GROUP BY _partition_id
+        """, params={'partition_ids': tuple(partition_ids)}))
+
+    def _get_changes(
+        self,
+        source: Dict[str, Partition],
+        target: Dict[str, Partition],
+        source_table: str,
+        target_table: str,
+        compare_hash: bool,
+    ) -> Dict[str, str]:
+        """
+        partition_id: 'copy' or 'drop'
+        """
+        changes = {partition_id: 'drop' for partition_id in target if partition_id not in source}
+        equal = []
+        for partition_id, partition in source.items():
+            other = target.get(partition_id)
+            if other and (partition.rows, partition.data_uncompressed_bytes) == (
+                other.rows, other.data_uncompressed_bytes,
+            ):
+                equal.append(partition_id)
+            else:
+                changes[partition_id] = 'copy'
+
+        if compare_hash and equal:
+            source_hashes = self._get_hashes(source_table, equal)
+            target_hashes = self._get_hashes(target_table, equal)
+            for partition_id in equal:
+                if source_hashes.get(partition_id) != target_hashes.get(partition_id):
+                    changes[partition_id] = 'copy'
+
+        log.info('%s of %s partitions changed', len(changes), len(set(source) | set(target)))
+        return changes
+
+    def sync_table(self, from_table: Table, to_table: Table, compare_hash: bool = False,
+                   settings: BulkSettings = None) -> List[BulkResult]:
+        log.info('sync %s -> %s', from_table.full_name, to_table.full_name)
+        source = _get_active(self._system.get_table_partitions(from_table.name, from_table.database))
+        target = _get_active(self._system.get_table_partitions(to_table.name, to_table.database))
+        changes = self._get_changes(source, target, from_table.full_name, to_table.full_name, compare_hash)
+
+        def _sync(partition_id: str) -> str:
+            if changes[partition_id] == 'drop':
+                self._drop_partition(to_table, partition_id)
+            else:
+                self._cmd.run_cmd(
+                    ReplacePartitionIdCmd,
+                    model_params=dict(
+                        table_name=to_table.full_name,
+                        partition_id=partition_id,
+                        from_table_name=from_table.full_name,
+                    ),
+                )
+
+            return changes[partition_id]
+
+        return run_bulk(list(changes), _sync, settings)
+
+    def sync_table_from_remote(self, remote_settings: RemoteSettings, to_table: Table, compare_hash: bool = False,
+                               settings: BulkSettings = None) -> List[BulkResult]:
+        remote = Remote.from_settings(remote_settings)
+        log.info('sync %s -> %s', remote, to_table.full_name)
+        source = _get_active(self._system.get_remote_table_partitions(remote_settings))
+        target = _get_active(self._system.get_table_partitions(to_table.name, to_table.database))
+        changes = self._get_changes(source, target, remote.to_sql(), to_table.full_name, compare_hash)
+
+        def _sync(partition_id: str) -> str:
+            if partition_id in target:
+                self._drop_partition(to_table, partition_id)
+            if changes[partition_id] == 'copy':
+                self._cmd.run_cmd(
+                    InsertFromRemotePartitionCmd,
+                    model_params=dict(
+                        table_name=to_table.full_name,
+                        from_remote=remote,
+                        partition_id=partition_id,
+                    ),
+                )
+
+            return changes[partition_id]
+
+        return run_bulk(list(changes), _sync, settings)
@@ -1,55 +1,76 @@
-from typing import List
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import fields as get_fields
+from typing import Any, Callable, Iterator, List, Tuple, Type
 
 from .cmd_service import CmdService
-from ..clickhouse_models.column import ClickhouseColumnModel
+from .._sql_cmd.clickhouse import Remote
+from ..clickhouse_models.column import ClickhouseColumnModel, ClickhouseColumnSummaryModel
 from ..clickhouse_models.db import ClickhouseDbModel
+from ..clickhouse_models.ddl_queue import ClickhouseDdlQueueModel
 from ..clickhouse_models.disk import ClickhouseDiskModel
+from ..clickhouse_models.merge import ClickhouseMergeModel
+from ..clickhouse_models.metadata_snapshot import ClickhouseMetadataSnapshotModel
+from ..clickhouse_models.mutation import ClickhouseMutationModel
+from ..clickhouse_models.part import ClickhousePartModel
 from ..clickhouse_models.partition import ClickhousePartitionModel
-from ..clickhouse_models.process import ClickhouseProcessModel
-from ..clickhouse_models.table import ClickhouseTableModel
+from ..clickhouse_models.process import ClickhouseProcessModel, ClickhouseProcessSummaryModel
+from ..clickhouse_models.remote_settings import ClickhouseRemoteSettingsModel as RemoteSettings
+from ..clickhouse_models.storage import ClickhousePartitionDiskModel, ClickhouseVolumeModel
+from ..clickhouse_models.table import ClickhouseTableModel, ClickhouseTableSummaryModel
+
+
+def _select_fields(model: Type, fields: List[str] = None) -> str:
+    """
+    projection by model fields. COLUMNS matcher skips fields which are not available in the server version
+    """
+    names = fields or [field.name for field in get_fields(model)]
+    return f"COLUMNS('^({'|'.join(names)})$')"
 
 
 class SystemService:
     def __init__(self, cmd: CmdService):
         self._cmd = cmd
 
-    def get_databases(self) -> List[ClickhouseDbModel]:
-        return self._cmd.get_records("""
-            SELECT *
-              FROM system.databases
-             WHERE lower(name) != 'information_schema' AND name != 'system'
-             ORDER BY name
-        """, model=ClickhouseDbModel)
+    def _get_cached(self, kind: str, loader: Callable[[], Any], db: str, table: str = '') -> Any:
+        cache = self._cmd.metadata_cache
+        if not cache:
+            return loader()
 
-    def get_database_by_name(self, name: str = '') -> ClickhouseDbModel:
-        return self._cmd.get_first_record("""
-            SELECT *
-              FROM system.databases
-             WHERE database = %(database)s
-               AND lower(name) != 'information_schema' AND name != 'system'
-             LIMIT 1
-        """, params={'database': self._cmd.get_db_or_default(name)}, model=ClickhouseDbModel)
+        value = cache.get(kind, db, table)
+        if value is None:
+            value = loader()
+            if value:
+                cache.set(kind, value, db, table)
 
-    def get_table_by_name(self, table: str, db: str = '') -> 'ClickhouseTableModel':
-        return self._cmd.get_first_record("""
-            SELECT *
-              FROM system.tables
-             WHERE database = %(database)s AND name = %(table)s
-               AND lower(name) != 'information_schema' AND name != 'system'
-             LIMIT 1
-        """, params={'database': self._cmd.get_db_or_default(db), 'table': table}, model=ClickhouseTableModel)
+        return value
 
-    def get_tables_by_db(self, db: str = '') -> List[ClickhouseTableModel]:
-        return self._cmd.get_records("""
-            SELECT *
+    @staticmethod
+    def _databases_query(fields: List[str] = None, databases: str = 'system.databases', where: str = '') -> str:
+        return f"""
+            SELECT {_select_fields(ClickhouseDbModel, fields)}
+              FROM {databases}
+             WHERE lower(name) != 'information_schema' AND name != 'system'{where}
+             ORDER BY name
+        """
+
+    def _tables_by_db_query(self, model: Type, db: str = '', fields: List[str] = None) -> Tuple[str, dict]:
+        return f"""
+            SELECT {_select_fields(model, fields)}
               FROM system.tables
              WHERE database = %(database)s
                AND lower(name) != 'information_schema' AND name != 'system'
              ORDER BY metadata_modification_time
-        """, params={'database': self._cmd.get_db_or_default(db)}, model=ClickhouseTableModel)
+        """, {'database': self._cmd.get_db_or_default(db)}
 
-    def get_table_partitions(self, table: str, db: str = '') -> List[ClickhousePartitionModel]:
-        return self._cmd.get_records("""
+    def _table_partitions_query(self, table: str, db: str = '') -> Tuple[str, dict]:
+        return self._partitions_query('database = %(database)s AND table = %(table)s'), {
+            'database': self._cmd.get_db_or_default(db),
+            'table': table,
+        }
+
+    @staticmethod
+    def _partitions_query(where: str, parts: str = 'system.parts') -> str:
+        return f"""
             SELECT partition,
                    partition_id,
                    active,
@@ -60,32 +81,258 @@ class SystemService:
                    sum(bytes_on_disk) AS bytes_on_disk,
                    sum(data_compressed_bytes) AS data_compressed_bytes,
                    sum(data_uncompressed_bytes) AS data_uncompressed_bytes
-              FROM system.parts
-             WHERE database = %(database)s AND table = %(table)s
+              FROM {parts}
+             WHERE {where}
                AND lower(name) != 'information_schema' AND name != 'system'
              GROUP BY database, table, partition_id, partition, active, visible
              ORDER BY partition
-        """, params={'database': self._cmd.get_db_or_default(db), 'table': table}, model=ClickhousePartitionModel)
+        """
 
-    def get_processes(self) -> List[ClickhouseProcessModel]:
-        return self._cmd.get_records('SELECT * FROM system.processes', model=ClickhouseProcessModel)
+    @staticmethod
+    def _processes_query(fields: List[str] = None) -> str:
+        return f'SELECT {_select_fields(ClickhouseProcessModel, fields)} FROM system.processes'
 
-    def get_process_by_query_id(self, query_id: str) -> ClickhouseProcessModel:
-        return self._cmd.get_first_record("""
-            SELECT *
+    def _table_columns_query(self, model: Type, table: str, db: str = '',
+                             fields: List[str] = None) -> Tuple[str, dict]:
+        return f"""
+            SELECT {_select_fields(model, fields)}
+              FROM system.columns
+             WHERE table = %(table)s AND database = %(database)s
+               AND lower(name) != 'information_schema' AND name != 'system'
+             ORDER BY position
+        """, {'table': table, 'database': self._cmd.get_db_or_default(db)}
+
+    def get_databases(self, fields: List[str] = None) -> List[ClickhouseDbModel]:
+        return self._cmd.get_records(self._databases_query(fields), model=ClickhouseDbModel)
+
+    def iter_databases(self, fields: List[str] = None) -> Iterator[ClickhouseDbModel]:
+        return self._cmd.iter_records(self._databases_query(fields), model=ClickhouseDbModel)
+
+    def get_database_by_name(self, name: str = '', fields: List[str] = None) -> ClickhouseDbModel:
+        name = self._cmd.get_db_or_default(name)
+
+        def _load() -> ClickhouseDbModel:
+            return self._cmd.get_first_record(f"""
+                SELECT {_select_fields(ClickhouseDbModel, fields)}
+                  FROM system.databases
+                 WHERE database = %(database)s
+                   AND lower(name) != 'information_schema' AND name != 'system'
+                 LIMIT 1
+            """, params={'database': name}, model=ClickhouseDbModel)
+
+        return _load() if fields else self._get_cached('database', _load, name)
+
+    def get_table_by_name(self, table: str, db: str = '', fields: List[str] = None) -> 'ClickhouseTableModel':
+        db = self._cmd.get_db_or_default(db)
+
+        def _load() -> ClickhouseTableModel:
+            return self._cmd.get_first_record(f"""
+                SELECT {_select_fields(ClickhouseTableModel, fields)}
+                  FROM system.tables
+                 WHERE database = %(database)s AND name = %(table)s
+                   AND lower(name) != 'information_schema' AND name != 'system'
+                 LIMIT 1
+            """, params={'database': db, 'table': table}, model=ClickhouseTableModel)
+
+        return _load() if fields else self._get_cached('table', _load, db, table)
+
+    def get_tables_by_db(self, db: str = '', fields: List[str] = None) -> List[ClickhouseTableModel]:
+        sql, params = self._tables_by_db_query(ClickhouseTableModel, db, fields)
+        return self._cmd.get_records(sql, params=params, model=ClickhouseTableModel)
+
+    def iter_tables_by_db(self, db: str = '', fields: List[str] = None) -> Iterator[ClickhouseTableModel]:
+        sql, params = self._tables_by_db_query(ClickhouseTableModel, db, fields)
+        return self._cmd.iter_records(sql, params=params, model=ClickhouseTableModel)
+
+    def get_table_summaries(self, db: str = '') -> List[ClickhouseTableSummaryModel]:
+        sql, params = self._tables_by_db_query(ClickhouseTableSummaryModel, db)
+        return self._cmd.get_records(sql, params=params, model=ClickhouseTableSummaryModel)
+
+    def get_table_partitions(self, table: str, db: str = '') -> List[ClickhousePartitionModel]:
+        sql, params = self._table_partitions_query(table, db)
+        return self._cmd.get_records(sql, params=params, model=ClickhousePartitionModel)
+
+    def iter_table_partitions(self, table: str, db: str = '') -> Iterator[ClickhousePartitionModel]:
+        sql, params = self._table_partitions_query(table, db)
+        return self._cmd.iter_records(sql, params=params, model=ClickhousePartitionModel)
+
+    def get_table_parts(self, table: str, db: str = '', fields: List[str] = None) -> List[ClickhousePartModel]:
+        return self._cmd.get_records(f"""
+            SELECT {_select_fields(ClickhousePartModel, fields)}
+              FROM system.parts
+             WHERE database = %(database)s AND table = %(table)s
+             ORDER BY partition_id, min_block_number
+        """, params={'database': self._cmd.get_db_or_default(db), 'table': table}, model=ClickhousePartModel)
+
+    def get_remote_table_partitions(self, settings: RemoteSettings) -> List[ClickhousePartitionModel]:
+        parts = Remote.from_settings(settings, 'system', 'parts').to_sql()
+        return self._cmd.get_records(
+            self._partitions_query('database = %(database)s AND table = %(table)s', parts),
+            params={'database': settings.db, 'table': settings.table},
+            model=ClickhousePartitionModel,
+        )
+
+    def get_processes(self, fields: List[str] = None) -> List[ClickhouseProcessModel]:
+        return self._cmd.get_records(self._processes_query(fields), model=ClickhouseProcessModel)
+
+    def iter_processes(self, fields: List[str] = None) -> Iterator[ClickhouseProcessModel]:
+        return self._cmd.iter_records(self._processes_query(fields), model=ClickhouseProcessModel)
+
+    def get_process_summaries(self) -> List[ClickhouseProcessSummaryModel]:
+        return self._cmd.get_records(f"""
+            SELECT {_select_fields(ClickhouseProcessSummaryModel)}
+              FROM system.processes
+             WHERE query_id != queryID()
+        """, model=ClickhouseProcessSummaryModel)
+
+    def get_process_by_query_id(self, query_id: str, fields: List[str] = None) -> ClickhouseProcessModel:
+        return self._cmd.get_first_record(f"""
+            SELECT {_select_fields(ClickhouseProcessModel, fields)}
               FROM system.processes
              WHERE query_id = %(query_id)s
              LIMIT 1
         """, params={'query_id': query_id}, model=ClickhouseProcessModel)
 
-    def get_disks(self) -> List[ClickhouseDiskModel]:
-        return self._cmd.get_records('SELECT * FROM system.disks', model=ClickhouseDiskModel)
+    def get_ddl_queue(self, log_comments: List[str]) -> List[ClickhouseDdlQueueModel]:
+        if not log_comments:
+            return []
+
+        fields = [field.name for field in get_fields(ClickhouseDdlQueueModel) if field.name != 'log_comment']
+        return self._cmd.get_records(f"""
+            SELECT {_select_fields(ClickhouseDdlQueueModel, fields)}, settings['log_comment'] AS log_comment
+              FROM system.distributed_ddl_queue
+             WHERE settings['log_comment'] IN %(log_comments)s
+             ORDER BY entry, host, port
+        """, params={'log_comments': tuple(log_comments)}, model=ClickhouseDdlQueueModel)
+
+    def get_pending_mutations(self, table: str, db: str = '',
+                              partition_id: str = '') -> List[ClickhouseMutationModel]:
+        return self._cmd.get_records(f"""
+            SELECT {_select_fields(ClickhouseMutationModel)}
+              FROM system.mutations
+             WHERE database = %(database)s AND table = %(table)s AND is_done = 0
+               AND (%(partition_id)s = ''
+                    OR arrayExists(name -> startsWith(name, concat(%(partition_id)s, '_')), parts_to_do_names))
+             ORDER BY create_time
+        """, params={
+            'database': self._cmd.get_db_or_default(db),
+            'table': table,
+            'partition_id': partition_id,
+        }, model=ClickhouseMutationModel)
+
+    def get_merges(self, table: str, db: str = '', partition_id: str = '') -> List[ClickhouseMergeModel]:
+        return self._cmd.get_records(f"""
+            SELECT {_select_fields(ClickhouseMergeModel)}
+              FROM system.merges
+             WHERE database = %(database)s AND table = %(table)s
+               AND (%(partition_id)s = '' OR partition_id = %(partition_id)s)
+             ORDER BY elapsed DESC
+        """, params={
+            'database': self._cmd.get_db_or_default(db),
+            'table': table,
+            'partition_id': partition_id,
+        }, model=ClickhouseMergeModel)
+
+    def get_disks(self, fields: List[str] = None) -> List[ClickhouseDiskModel]:
+        return self._cmd.get_records(
+            f'SELECT {_select_fields(ClickhouseDiskModel, fields)} FROM system.disks',
+            model=ClickhouseDiskModel,
+        )
 
-    def get_table_columns(self, table: str, db: str = '') -> List[ClickhouseColumnModel]:
+    def get_storage_volumes(self, policy: str = '') -> List[ClickhouseVolumeModel]:
+        return self._cmd.get_records(f"""
+            SELECT {_select_fields(ClickhouseVolumeModel)}
+              FROM system.storage_policies
+             WHERE %(policy)s = '' OR policy_name = %(policy)s
+             ORDER BY policy_name, volume_priority
+        """, params={'policy': policy}, model=ClickhouseVolumeModel)
+
+    def get_partition_disks(self, table: str, db: str = '') -> List[ClickhousePartitionDiskModel]:
         return self._cmd.get_records("""
-            SELECT *
-              FROM system.columns
-             WHERE table = %(table)s AND database = %(database)s
-               AND lower(name) != 'information_schema' AND name != 'system'
-             ORDER BY position
-        """, params={'table': table, 'database': self._cmd.get_db_or_default(db)}, model=ClickhouseColumnModel)
+            SELECT database,
+                   table,
+                   partition,
+                   partition_id,
+                   disk_name,
+                   sum(bytes_on_disk) AS bytes_on_disk,
+                   max(max_date) AS max_date,
+                   max(max_time) AS max_time
+              FROM system.parts
+             WHERE active AND database = %(database)s AND table = %(table)s
+             GROUP BY database, table, partition, partition_id, disk_name
+             ORDER BY partition_id, disk_name
+        """, params={'database': self._cmd.get_db_or_default(db), 'table': table}, model=ClickhousePartitionDiskModel)
+
+    def get_table_columns(self, table: str, db: str = '', fields: List[str] = None) -> List[ClickhouseColumnModel]:
+        db = self._cmd.get_db_or_default(db)
+
+        def _load() -> List[ClickhouseColumnModel]:
+            sql, params = self._table_columns_query(ClickhouseColumnModel, table, db, fields)
+            return self._cmd.get_records(sql, params=params, model=ClickhouseColumnModel)
+
+        return _load() if fields else self._get_cached('columns', _load, db, table)
+
+    def iter_table_columns(self, table: str, db: str = '',
+                           fields: List[str] = None) -> Iterator[ClickhouseColumnModel]:
+        sql, params = self._table_columns_query(ClickhouseColumnModel, table, db, fields)
+        return self._cmd.iter_records(sql, params=params, model=ClickhouseColumnModel)
+
+    def get_column_summaries(self, table: str, db: str = '') -> List[ClickhouseColumnSummaryModel]:
+        sql, params = self._table_columns_query(ClickhouseColumnSummaryModel, table, db)
+        return self._cmd.get_records(sql, params=params, model=ClickhouseColumnSummaryModel)
+
+    def get_metadata_snapshot(self, databases: List[str] = None) -> ClickhouseMetadataSnapshotModel:
+        return self._get_metadata_snapshot(lambda name: f'system.{name}', databases)
+
+    def get_remote_metadata_snapshot(self, settings: RemoteSettings,
+                                     tables: List[str] = None) -> ClickhouseMetadataSnapshotModel:
+        return self._get_metadata_snapshot(
+            lambda name: Remote.from_settings(settings, 'system', name).to_sql(),
+            [settings.db],
+            tables,
+        )
+
+    def _get_metadata_snapshot(self, system: Callable[[str], str], databases: List[str] = None,
+                               tables: List[str] = None) -> ClickhouseMetadataSnapshotModel:
+        """
+        {system} - source of system table by name: system.tables, remote(...).
+        Queries are run at the same time: one round trip with known {databases}, two without
+        """
+        where = ' AND name IN %(databases)s' if databases else ''
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            dbs = executor.submit(
+                self._cmd.get_records,
+                self._databases_query(databases=system('databases'), where=where),
+                params={'databases': tuple(databases or [])},
+                model=ClickhouseDbModel,
+            )
+            if not databases:
+                databases = [db.name for db in dbs.result()]
+                if not databases:
+                    return ClickhouseMetadataSnapshotModel()
+
+            params = {'databases': tuple(databases), 'tables': tuple(tables or [])}
+            where = 'database IN %(databases)s'
+            table_models = executor.submit(self._cmd.get_records, f"""
+                SELECT {_select_fields(ClickhouseTableModel)}
+                  FROM {system('tables')}
+                 WHERE {where}{' AND name IN %(tables)s' if tables else ''}
+                 ORDER BY database, name
+            """, params=params, model=ClickhouseTableModel)
+            where = f"{where}{' AND table IN %(tables)s' if tables else ''}"
+            columns = executor.submit(self._cmd.get_records, f"""
+                SELECT {_select_fields(ClickhouseColumnModel)}
+                  FROM {system('columns')}
+                 WHERE {where}
+                 ORDER BY database, table, position
+            """, params=params, model=ClickhouseColumnModel)
+            partitions = executor.submit(
+                self._cmd.get_records,
+                self._partitions_query(where, system('parts')),
+                params=params,
+                model=ClickhousePartitionModel,
+            )
+
+            return ClickhouseMetadataSnapshotModel(
+                dbs.result(), table_models.result(), columns.result(), partitions.result(),
+            )
@@ -1,30 +1,164 @@
-from typing import Any
+import hashlib
+import re
+import uuid
+from dataclasses import replace
+from typing import Any, Callable, Dict, List, Tuple
+from urllib.parse import urlparse
 
+from .checkpoint_service import CheckpointService
 from .cmd_service import CmdService
+from .s3_ledger_service import S3LedgerService
 from .system_service import SystemService
+from .._bulk import run_bulk
 from .._log import log
 from .._sql_cmd.clickhouse import (
     RenameTableOnCluster,
     TruncateOnClusterCmd,
     CreateTableAsOnClusterCmd,
+    CreateTableLikeOnClusterCmd,
     InsertFromS3Cmd,
+    InsertFromS3FilesCmd,
+    S3ListCmd,
     InsertIntoS3Cmd,
     Remote,
     InsertFromRemote,
+    InsertFromRemotePartitionCmd,
+    DropPartitionIdCmd,
+    DropTableOnClusterCmd,
+    ExchangeTablesOnClusterCmd,
     CreateDistributedTable,
+    InsertFromTablePartitionCmd,
+    S3ObjectSizeCmd,
+    InsertS3ManifestCmd,
 )
 from .._sql_cmd.general import BaseInsertIntoTableFromTable
+from ..clickhouse_models.bulk_result import ClickhouseBulkResultModel as BulkResult
+from ..clickhouse_models.bulk_settings import ClickhouseBulkSettingsModel as BulkSettings
+from ..clickhouse_models.checkpoint_settings import ClickhouseCheckpointSettingsModel as CheckpointSettings
+from ..clickhouse_models.metadata_snapshot import ClickhouseMetadataSnapshotModel as MetadataSnapshot
+from ..clickhouse_models.partition import ClickhousePartitionModel as Partition
 from ..clickhouse_models.remote_settings import ClickhouseRemoteSettingsModel as RemoteSettings
+from ..clickhouse_models.s3_manifest import ClickhouseS3ManifestModel as S3Manifest
 from ..clickhouse_models.s3_settings import ClickhouseS3SettingsModel as S3Settings
 from ..clickhouse_models.s3_settings import S3SelectSettingsModel as S3SelectSettings
 from ..clickhouse_models.table import ClickhouseTableModel
 
+_PARTITION_ID_PLACEHOLDER = '{partition_id}'
+_LEDGER_LOOKUP_SIZE = 1000
+_SHADOW_SUFFIX = '_shadow'
+_VIEW_ENGINES = ('View', 'MaterializedView', 'LiveView', 'WindowView')
+_IDENTIFIER = r'(?:`(?:[^`\\]|\\.)*`|[^\s.(`]+)'
+_DDL_NAME = re.compile(
+    rf'^(\s*CREATE\s+(?:TEMPORARY\s+)?(?:TABLE|VIEW|MATERIALIZED\s+VIEW|LIVE\s+VIEW|WINDOW\s+VIEW|DICTIONARY))'
+    rf'(?:\s+IF\s+NOT\s+EXISTS)?\s+{_IDENTIFIER}(?:\.{_IDENTIFIER})?',
+    re.IGNORECASE,
+)
+
+
+def _rename_ddl(sql: str, full_name: str, if_not_exists: bool = False) -> str:
+    """
+    create_table_query with another name: CREATE TABLE db.table ... -> CREATE TABLE {full_name} ...
+    """
+    if_not_exists = ' IF NOT EXISTS' if if_not_exists else ''
+    return _DDL_NAME.sub(lambda match: f'{match.group(1)}{if_not_exists} {full_name}', sql, 1)
+
+
+def _rename_db(sql: str, from_db: str, to_db: str) -> str:
+    """
+    references to tables of {from_db} in DDL: SELECT ... FROM from_db.table -> SELECT ... FROM to_db.table.
+    String literals are kept
+    """
+    if from_db == to_db:
+        return sql
+
+    reference = rf"'(?:[^'\\]|\\.)*'|(?<![\w.`]){re.escape(from_db)}\.|`{re.escape(from_db)}`\."
+    return re.sub(reference, lambda match: match.group() if match.group().startswith("'") else f'{to_db}.', sql)
+
+
+def _get_s3_file_url(pattern: str, path: str) -> str:
+    """
+    url of S3 object matched by glob {pattern}. {path} is _path virtual column: bucket/key or key
+    """
+    if not re.search(r'[*?{]', pattern):
+        return pattern
+
+    prefix = re.split(r'[*?{]', pattern, 1)[0]
+    prefix = prefix[:prefix.rfind('/') + 1]
+    prefix_path = urlparse(prefix).path.lstrip('/')
+    for candidate in (path, path.split('/', 1)[-1]):
+        if candidate.startswith(prefix_path):
+            return prefix + candidate[len(prefix_path):]
+
+    return prefix + path.rsplit('/', 1)[-1]
+
+
+class TableRebuild:
+    """
+    steps of shadow table rebuild: start -> caller loads shadow table -> finish or abort
+    """
+
+    def __init__(self, service: 'TableService', table: ClickhouseTableModel, expected_rows: int = None) -> None:
+        self._service = service
+        self._cmd = service._cmd
+        self._table = table
+        self._expected_rows = expected_rows
+        # unique name: shadow never matches a table of user or of concurrent rebuild
+        self._shadow = f'{table.name}{_SHADOW_SUFFIX}_{uuid.uuid4().hex[:8]}'
+        self._shadow_name = self._cmd.get_full_table_name(self._shadow, table.database)
+
+    def _drop_shadow(self) -> None:
+        self._cmd.run_cmd(DropTableOnClusterCmd, model_params=dict(table_name=self._shadow_name))
+
+    def start(self) -> ClickhouseTableModel:
+        """
+        empty copy of table: CREATE TABLE {table}_shadow_{uuid} AS table
+        """
+        self._cmd.run_cmd(
+            CreateTableLikeOnClusterCmd,
+            model_params=dict(table_name=self._shadow_name, from_table=self._table.full_name),
+        )
+        return self._service._system.get_table_by_name(self._shadow, self._table.database)
+
+    def abort(self) -> None:
+        log.warning('rebuild of %s is aborted', self._table.full_name)
+        self._drop_shadow()
+
+    def _validate(self, load_result: Any) -> None:
+        if isinstance(load_result, list):
+            failed = [result.key for result in load_result if isinstance(result, BulkResult) and not result.success]
+            if failed:
+                raise RuntimeError(f'{self._shadow_name}: load failed for {", ".join(failed)}')
+
+        if self._expected_rows is not None and not self._cmd.recording:
+            rows = self._cmd.exec(f'SELECT count() FROM {self._shadow_name}')[0][0]
+            if rows != self._expected_rows:
+                raise RuntimeError(f'{self._shadow_name}: {rows} rows are loaded, expected {self._expected_rows}')
+
+    def finish(self, load_result: Any = None) -> ClickhouseTableModel:
+        """
+        validates shadow table, swaps it with table and drops previous data. Aborts on validation error
+        """
+        try:
+            self._validate(load_result)
+        except Exception:
+            self.abort()
+            raise
+
+        self._cmd.run_cmd(
+            ExchangeTablesOnClusterCmd,
+            model_params=dict(table=self._table.full_name, other_table=self._shadow_name),
+        )
+        self._drop_shadow()
+        return self._service._system.get_table_by_name(self._table.name, self._table.database)
+
 
 class TableService:
     def __init__(self, client: Any, system: SystemService, cmd: CmdService) -> None:
         self._client = client
         self._cmd = cmd
         self._system = system
+        self._checkpoint = CheckpointService(cmd)
+        self._ledger = S3LedgerService(cmd)
 
     def create_table_as(
         self,
@@ -60,6 +194,79 @@ class TableService:
             model_params=dict(from_table=from_table.full_name, to_table=to_table.full_name),
         )
 
+    def insert_from_table_by_partitions(
+        self,
+        from_table: ClickhouseTableModel,
+        to_table: ClickhouseTableModel,
+        checkpoint: CheckpointSettings = None,
+        settings: BulkSettings = None,
+        replace: bool = False,
+    ) -> List[BulkResult]:
+        """
+        appends partitions of {from_table}. {replace} - partition of {to_table} is dropped before copy
+        """
+        if replace and from_table.partition_key != to_table.partition_key:
+            raise ValueError(
+                f'partition key of {to_table.full_name} ({to_table.partition_key}) differs from '
+                f'{from_table.full_name} ({from_table.partition_key}): partitions can\'t be replaced'
+            )
+
+        partition_ids = []
+        for partition in self._system.get_table_partitions(from_table.name, from_table.database):
+            if partition.active and partition.partition_id not in partition_ids:
+                partition_ids.append(partition.partition_id)
+
+        if checkpoint:
+            completed = self._checkpoint.get_completed(checkpoint)
+            log.info('%s of %s partitions are already copied', len(completed), len(partition_ids))
+            partition_ids = [partition_id for partition_id in partition_ids if partition_id not in completed]
+
+        def _insert(partition_id: str):
+            if replace:
+                # copy is repeatable: rows of previous failed attempt are removed
+                self._cmd.run_cmd(
+                    DropPartitionIdCmd,
+                    model_params=dict(table_name=to_table.full_name, partition_id=partition_id),
+                )
+            self._cmd.run_cmd(
+                InsertFromTablePartitionCmd,
+                model_params=dict(
+                    from_table=from_table.full_name,
+                    to_table=to_table.full_name,
+                    partition_id=partition_id,
+                ),
+            )
+            if checkpoint:
+                self._checkpoint.mark_completed(checkpoint, partition_id)
+
+        return run_bulk(partition_ids, _insert, settings)
+
+    def create_rebuild(self, table: ClickhouseTableModel, expected_rows: int = None) -> TableRebuild:
+        return TableRebuild(self, table, expected_rows)
+
+    def rebuild_table(self, table: ClickhouseTableModel, load: Callable[[ClickhouseTableModel], Any],
+                      expected_rows: int = None) -> ClickhouseTableModel:
+        rebuild = self.create_rebuild(table, expected_rows)
+        shadow = rebuild.start()
+        try:
+            result = load(shadow)
+        except Exception:
+            rebuild.abort()
+            raise
+
+        return rebuild.finish(result)
+
+    def rebuild_table_from_table(self, from_table: ClickhouseTableModel, table: ClickhouseTableModel,
+                           settings: BulkSettings = None) -> ClickhouseTableModel:
+        rows = self._cmd.exec(f'SELECT count() FROM {from_table.full_name}')[0][0]
+        return self.rebuild_table(
+            table,
+            lambda shadow: self.insert_from_table_by_partitions(
+                from_table, shadow, settings=settings, replace=from_table.partition_key == shadow.partition_key,
+            ),
+            rows,
+        )
+
     def truncate(self, table: str, db: str = '') -> None:
         table_name = self._cmd.get_full_table_name(table, db)
         self._cmd.run_cmd(
@@ -73,8 +280,92 @@ class TableService:
         s3_settings: S3Settings,
         s3_select_settings: S3SelectSettings = None,
     ):
+        fields, field_types = self._get_s3_fields(table, s3_select_settings)
+        self._cmd.run_cmd(
+            InsertFromS3Cmd,
+            model_params=dict(
+                table_name=table.full_name,
+                s3_settings=s3_settings,
+                field_types=field_types,
+                fields=fields(s3_settings.url),
+            ),
+        )
+
+    def insert_from_s3_files(
+        self,
+        table: ClickhouseTableModel,
+        s3_settings: S3Settings,
+        urls: List[str] = None,
+        s3_select_settings: S3SelectSettings = None,
+        files_per_insert: int = 100,
+        ledger_table: str = '',
+        settings: BulkSettings = None,
+    ) -> List[BulkResult]:
+        urls = urls or [s3_settings.url]
+        # file can be matched by several globs
+        files: Dict[str, Tuple[str, int, str]] = {}
+        for ix in range(0, len(urls), files_per_insert):
+            result = self._cmd.run_cmd(
+                S3ListCmd,
+                model_params=dict(s3_settings=s3_settings, urls=urls[ix:ix + files_per_insert]),
+            )
+            for pattern, path, size, etag in result:
+                url = _get_s3_file_url(pattern, path)
+                files.setdefault(url, (url, size, etag))
+
+        files = list(files.values())
+        if ledger_table:
+            loaded = {}
+            for ix in range(0, len(files), _LEDGER_LOOKUP_SIZE):
+                loaded_urls = [url for url, size, etag in files[ix:ix + _LEDGER_LOOKUP_SIZE]]
+                loaded.update(self._ledger.get_loaded(ledger_table, loaded_urls))
+
+            # object is rewritten when etag is changed, even with the same size
+            pending = [(url, size, etag) for url, size, etag in files if (size, etag) not in loaded.get(url, [])]
+            log.info('%s of %s files are already loaded', len(files) - len(pending), len(files))
+            files = pending
+
+        fields, field_types = self._get_s3_fields(table, s3_select_settings)
+        batches = [files[ix:ix + files_per_insert] for ix in range(0, len(files), files_per_insert)]
+
+        def _insert(batch_ix: str) -> int:
+            batch = batches[int(batch_ix)]
+            # retry after failed ledger write repeats INSERT of the same objects: deduplicated by the server
+            token = hashlib.sha256('\n'.join(f'{url} {size} {etag}' for url, size, etag in batch).encode()).hexdigest()
+            self._cmd.run_cmd(
+                InsertFromS3FilesCmd,
+                model_params=dict(
+                    table_name=table.full_name,
+                    s3_settings=s3_settings,
+                    field_types=field_types,
+                    selects=[(url, fields(url)) for url, size, etag in batch],
+                    deduplication_token=token if ledger_table else '',
+                ),
+            )
+            last_query = self._cmd.last_query
+            rows = last_query.progress.written_rows if last_query else 0
+            if ledger_table:
+                self._ledger.mark_loaded(ledger_table, batch, batch[0][0], rows)
+
+            return rows
+
+        # batch is reported by its first file
+        return [
+            BulkResult(batches[int(result.key)][0][0], result.attempts, result.elapsed, result.error, result.value)
+            for result in run_bulk([str(ix) for ix in range(len(batches))], _insert, settings)
+        ]
+
+    def _get_s3_fields(
+        self,
+        table: ClickhouseTableModel,
+        s3_select_settings: S3SelectSettings = None,
+    ) -> Tuple[Callable[[str], List[str]], List[str]]:
+        """
+        builds column mapping once. Returns fields factory by file url and field types
+        """
         fields = []
         field_types = []
+        url_column = ''
         convertors = s3_select_settings.field_convertors if s3_select_settings else []
 
         for column in self._system.get_table_columns(table.name, table.database):
@@ -84,7 +375,8 @@ class TableService:
 
             if s3_select_settings:
                 if column.name == s3_select_settings.s3_file_name_column:
-                    fields.append(f"'{s3_settings.url}' AS {column.name}")
+                    url_column = column.name
+                    fields.append(None)
                     continue
 
                 if s3_select_settings.field_name_transformer:
@@ -105,15 +397,10 @@ class TableService:
             fields.append(f'{real_name} AS {column.name}')
             field_types.append(f"'{s3_name} {s3_type},'")
 
-        self._cmd.run_cmd(
-            InsertFromS3Cmd,
-            model_params=dict(
-                table_name=table.full_name,
-                s3_settings=s3_settings,
-                field_types=field_types,
-                fields=fields,
-            ),
-        )
+        def _get_fields(url: str) -> List[str]:
+            return [f"'{url}' AS {url_column}" if field is None else field for field in fields]
+
+        return _get_fields, field_types
 
     def insert_table_to_s3(self, table: ClickhouseTableModel, s3_settings: S3Settings):
         self._cmd.run_cmd(
@@ -121,6 +408,52 @@ class TableService:
             model_params=dict(table_name=table.full_name, s3_settings=s3_settings),
         )
 
+    def insert_table_to_s3_by_partitions(
+        self,
+        table: ClickhouseTableModel,
+        s3_settings: S3Settings,
+        manifest_url: str = '',
+        partition_ids: List[str] = None,
+        settings: BulkSettings = None,
+    ) -> List[BulkResult]:
+        if _PARTITION_ID_PLACEHOLDER not in s3_settings.url:
+            raise ValueError(f's3_settings.url must contain {_PARTITION_ID_PLACEHOLDER}: {s3_settings.url}')
+
+        rows: Dict[str, int] = {}
+        for partition in self._system.get_table_partitions(table.name, table.database):
+            if partition.active:
+                rows[partition.partition_id] = rows.get(partition.partition_id, 0) + partition.rows
+
+        if partition_ids is None:
+            partition_ids = list(rows)
+
+        def _export(partition_id: str) -> S3Manifest:
+            chunk_settings = replace(s3_settings, url=s3_settings.url.replace(_PARTITION_ID_PLACEHOLDER, partition_id))
+            self._cmd.run_cmd(
+                InsertIntoS3Cmd,
+                model_params=dict(table_name=table.full_name, s3_settings=chunk_settings, partition_id=partition_id),
+            )
+            # recorded export is not written yet
+            size = None if self._cmd.recording else self._cmd.run_cmd(
+                S3ObjectSizeCmd, model_params=dict(s3_settings=chunk_settings),
+            )
+            return S3Manifest(
+                url=chunk_settings.url,
+                partition_id=partition_id,
+                rows=rows.get(partition_id, 0),
+                bytes=size[0][0] if size else 0,
+            )
+
+        results = run_bulk(partition_ids, _export, settings)
+        items = [result.value for result in results if result.success]
+        if manifest_url and items:
+            self._cmd.run_cmd(
+                InsertS3ManifestCmd,
+                model_params=dict(s3_settings=replace(s3_settings, url=manifest_url), items=items),
+            )
+
+        return results
+
     def rename_table(self, table: ClickhouseTableModel, new_name: str, db: str = '') -> ClickhouseTableModel:
         full_name = self._cmd.get_full_table_name(new_name, db)
         self._cmd.run_cmd(
@@ -130,52 +463,132 @@ class TableService:
 
         return self._system.get_table_by_name(new_name, db)
 
-    def insert_from_remote(self, settings: RemoteSettings, table: str, db: str = '',
-                           create_table: bool = False) -> None:
-        remote = Remote(
-            remote_address=settings.address,
-            remote_db=settings.db,
-            remote_user=settings.user,
-            remote_password=settings.password,
-            remote_table=settings.table,
-            secure=settings.secure,
-            sharding_key=settings.sharding_key,
+    def _create_table_from_remote(self, settings: RemoteSettings, table: str, db: str = '') -> None:
+        log.info(
+            'create table "%s" from remote table "%s", host: %s',
+            self._cmd.get_full_table_name(table, db),
+            self._cmd.get_full_table_name(settings.table, settings.db),
+            settings.address,
         )
+        remote_system = Remote.from_settings(settings, 'system', 'tables')
 
-        if create_table:
-            log.info(
-                'create table "%s" from remote table "%s", host: %s',
-                self._cmd.get_full_table_name(table, db),
-                self._cmd.get_full_table_name(settings.table, settings.db),
-                settings.address,
-            )
-            remote_system = Remote(
-                remote_address=settings.address,
-                remote_db='system',
-                remote_user=settings.user,
-                remote_password=settings.password,
-                remote_table='tables',
-            )
+        result = self._cmd.exec(f"""
+            SELECT create_table_query
+              FROM {remote_system.to_sql()}
+             WHERE name = %(table)s AND database = %(database)s
+             LIMIT 1
+        """, params={'table': settings.table, 'database': settings.db})
+
+        sql = _rename_ddl(result[0][0], self._cmd.get_full_table_name(table, db))
+        log.info(sql)
+        self._cmd.exec(sql)
 
-            result = self._cmd.exec(f"""
-                SELECT create_table_query
-                  FROM {remote_system.to_sql()}
-                 WHERE name = %(table)s AND database = %(database)s
-                 LIMIT 1
-            """, params={'table': settings.table, 'database': settings.db})
+    def insert_from_remote(self, settings: RemoteSettings, table: str, db: str = '',
+                           create_table: bool = False) -> None:
+        remote = Remote.from_settings(settings)
 
-            sql: str = result[0][0]
-            parts = sql.split(' ')
-            parts[2] = self._cmd.get_full_table_name(table, db)
-            sql = ' '.join(parts)
-            log.info(sql)
-            self._cmd.exec(sql)
+        if create_table:
+            self._create_table_from_remote(settings, table, db)
 
         self._cmd.run_cmd(
             InsertFromRemote,
             model_params=dict(table_name=self._cmd.get_full_table_name(table, db), from_remote=remote),
         )
 
+    def insert_from_remote_by_partitions(
+        self,
+        settings: RemoteSettings,
+        table: str,
+        db: str = '',
+        create_table: bool = False,
+        checkpoint: CheckpointSettings = None,
+        bulk_settings: BulkSettings = None,
+    ) -> List[BulkResult]:
+        remote = Remote.from_settings(settings)
+        table_name = self._cmd.get_full_table_name(table, db)
+        if create_table:
+            self._create_table_from_remote(settings, table, db)
+
+        chunks = {
+            partition.partition_id: (remote, table_name, partition)
+            for partition in self._system.get_remote_table_partitions(settings)
+            if partition.active
+        }
+        return self._insert_remote_chunks(chunks, checkpoint, bulk_settings)
+
+    def insert_from_remote_snapshot(
+        self,
+        settings: RemoteSettings,
+        snapshot: MetadataSnapshot,
+        db: str = '',
+        create_tables: bool = True,
+        checkpoint: CheckpointSettings = None,
+        bulk_settings: BulkSettings = None,
+    ) -> List[BulkResult]:
+        tables = [table for table in snapshot.tables if table.database == settings.db]
+        names = {table.name for table in tables}
+        if create_tables:
+            # views select from tables: tables are created first, views select from tables of {db}
+            for table in sorted(tables, key=lambda t: t.engine in _VIEW_ENGINES):
+                sql = _rename_ddl(table.create_table_query, self._cmd.get_full_table_name(table.name, db), True)
+                if table.engine in _VIEW_ENGINES:
+                    sql = _rename_db(sql, settings.db, self._cmd.get_db_or_default(db))
+                log.info(sql)
+                self._cmd.exec(sql)
+
+        chunks = {
+            f'{partition.table}/{partition.partition_id}': (
+                Remote.from_settings(settings, settings.db, partition.table),
+                self._cmd.get_full_table_name(partition.table, db),
+                partition,
+            )
+            for partition in snapshot.partitions
+            if partition.active and partition.database == settings.db
+            and partition.table in names
+        }
+        return self._insert_remote_chunks(chunks, checkpoint, bulk_settings)
+
+    def _insert_remote_chunks(
+        self,
+        chunks: Dict[str, Tuple[Remote, str, Partition]],
+        checkpoint: CheckpointSettings = None,
+        bulk_settings: BulkSettings = None,
+    ) -> List[BulkResult]:
+        """
+        copies remote partitions. {chunks} - key: (remote table, target table, remote partition)
+        """
+        keys = list(chunks)
+        if checkpoint:
+            completed = self._checkpoint.get_completed(checkpoint)
+            log.info('%s of %s partitions are already copied', len(completed), len(keys))
+            keys = [key for key in keys if key not in completed]
+
+        def _insert(key: str) -> int:
+            remote, table_name, partition = chunks[key]
+            # copy is repeatable: rows of previous failed attempt are removed
+            self._cmd.run_cmd(
+                DropPartitionIdCmd,
+                model_params=dict(table_name=table_name, partition_id=partition.partition_id),
+            )
+            self._cmd.run_cmd(
+                InsertFromRemotePartitionCmd,
+                model_params=dict(table_name=table_name, from_remote=remote, partition_id=partition.partition_id),
+            )
+            # recorded copy is not executed yet: nothing to verify
+            if not self._cmd.recording:
+                rows = self._cmd.exec(
+                    f'SELECT count() FROM {table_name} WHERE _partition_id = %(partition_id)s',
+                    params={'partition_id': partition.partition_id},
+                )[0][0]
+                if rows != partition.rows:
+                    raise RuntimeError(f'{key}: {rows} rows are copied, remote table has {partition.rows} rows')
+
+            if checkpoint:
+                self._checkpoint.mark_completed(checkpoint, key)
+            return partition.rows
+
+        return run_bulk(keys, _insert, bulk_settings)
+
     def create_distributed_table(self, create_table: str, table: str, database: str, sharding_key: str = '',
                                  cluster: str = "'{cluster}'",) -> ClickhouseTableModel:
         self._cmd.run_cmd(
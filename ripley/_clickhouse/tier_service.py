@@ -0,0 +1,193 @@
+import threading
+import time
+from datetime import date
+from typing import Dict, List, Optional, Set, Tuple
+
+from .cmd_service import CmdService
+from .system_service import SystemService
+from .._bulk import run_bulk
+from .._log import log
+from .._sql_cmd.clickhouse import MovePartitionToStorageCmd
+from ..clickhouse_models.bulk_result import ClickhouseBulkResultModel as BulkResult
+from ..clickhouse_models.bulk_settings import ClickhouseBulkSettingsModel as BulkSettings
+from ..clickhouse_models.storage import ClickhousePartitionDiskModel as PartitionDisk
+from ..clickhouse_models.storage import ClickhousePartitionMoveModel as PartitionMove
+from ..clickhouse_models.storage import ClickhouseTierRuleModel as TierRule
+from ..clickhouse_models.storage import ClickhouseVolumeModel as Volume
+from ..clickhouse_models.table import ClickhouseTableModel as Table
+
+_NO_DATE = date(1970, 1, 1)
+
+
+def _get_age(partition: PartitionDisk, today: date) -> Optional[int]:
+    """
+    days since the newest row. None if partition key has no date
+    """
+    newest = max(partition.max_date or _NO_DATE, partition.max_time.date() if partition.max_time else _NO_DATE)
+    return None if newest <= _NO_DATE else (today - newest).days
+
+
+class _Throttle:
+    """
+    byte budget of {bytes_per_second}: operation of {size} bytes starts when the budget covers its bytes
+    and bytes of operations started before. Started bytes never exceed bytes_per_second * elapsed seconds
+    """
+
+    def __init__(self, bytes_per_second: float = None) -> None:
+        self._rate = bytes_per_second
+        self._lock = threading.Lock()
+        self._paid = time.monotonic()
+
+    def wait(self, size: int) -> None:
+        if not self._rate:
+            return
+
+        with self._lock:
+            now = time.monotonic()
+            # unused budget of idle time is not accumulated
+            self._paid = max(now, self._paid) + size / self._rate
+            delay = self._paid - now
+
+        time.sleep(delay)
+
+
+def _get_target(table: Table, rule: TierRule, volumes: List[Volume]) -> Tuple[str, str, Set[str]]:
+    """
+    (DISK / VOLUME, name, disks of target)
+    """
+    policy = [volume for volume in volumes if volume.policy_name == table.storage_policy]
+    if rule.volume:
+        for volume in policy:
+            if volume.volume_name == rule.volume:
+                return 'VOLUME', rule.volume, set(volume.disks)
+        raise ValueError(f'volume {rule.volume} is not in storage policy {table.storage_policy} of {table.full_name}')
+
+    if rule.disk and any(rule.disk in volume.disks for volume in policy):
+        return 'DISK', rule.disk, {rule.disk}
+    raise ValueError(f'disk {rule.disk!r} is not in storage policy {table.storage_policy} of {table.full_name}')
+
+
+def _get_reason(rule: TierRule) -> str:
+    return 'min_age_days' if rule.max_disk_usage is None else 'max_disk_usage'
+
+
+def _get_candidates(
+    placements: Dict[str, List[PartitionDisk]],
+    targets: Dict[str, Tuple[str, str, Set[str]]],
+    rule: TierRule,
+    today: date,
+) -> List[Tuple[Optional[int], Tuple[str, str, Set[str]], PartitionDisk]]:
+    """
+    (age, target, partition) out of target of {rule}. Oldest first, partitions without date are the last
+    """
+    candidates = []
+    for table, partitions in placements.items():
+        for partition in partitions:
+            age = _get_age(partition, today)
+            if partition.disk_name in targets[table][2]:
+                continue
+            if rule.min_age_days is not None and (age is None or age < rule.min_age_days):
+                continue
+            candidates.append((age, targets[table], partition))
+
+    return sorted(candidates, key=lambda candidate: (candidate[0] is None, -(candidate[0] or 0)))
+
+
+def _get_key(partition: PartitionDisk) -> str:
+    return f'{partition.database}.{partition.table}/{partition.partition_id}'
+
+
+def plan_moves(
+    placements: Dict[str, List[PartitionDisk]],
+    targets: Dict[str, List[Tuple[str, str, Set[str]]]],
+    rules: List[TierRule],
+    used: Dict[str, int],
+    total: Dict[str, int],
+    today: date,
+) -> List[PartitionMove]:
+    """
+    {placements}, {targets} by table full name, {targets} in order of {rules}.
+    {used}, {total} - bytes by disk, updated by planned moves. Partition is moved by the first matching rule.
+    MOVE PARTITION moves parts from all disks out of target: bytes of the partition are summed across disks.
+    Bytes moved to VOLUME are spread across its disks
+    """
+    partitions: Dict[str, List[PartitionDisk]] = {}
+    for table_partitions in placements.values():
+        for partition in table_partitions:
+            partitions.setdefault(_get_key(partition), []).append(partition)
+
+    moves: Dict[str, PartitionMove] = {}
+    for ix, rule in enumerate(rules):
+        rule_targets = {table: table_targets[ix] for table, table_targets in targets.items()}
+        for age, (to_type, to_name, to_disks), partition in _get_candidates(placements, rule_targets, rule, today):
+            disk = partition.disk_name
+            key = _get_key(partition)
+            if key in moves:
+                continue
+            if rule.max_disk_usage is not None and used.get(disk, 0) <= rule.max_disk_usage * total.get(disk, 0):
+                continue
+
+            moved = [placement for placement in partitions[key] if placement.disk_name not in to_disks]
+            size = sum(placement.bytes_on_disk for placement in moved)
+            for placement in moved:
+                used[placement.disk_name] = used.get(placement.disk_name, 0) - placement.bytes_on_disk
+            for to_disk in to_disks:
+                used[to_disk] = used.get(to_disk, 0) + size // len(to_disks)
+
+            moves[key] = PartitionMove(
+                database=partition.database,
+                table=partition.table,
+                partition=partition.partition,
+                partition_id=partition.partition_id,
+                disk_name=disk,
+                to_type=to_type,
+                to_name=to_name,
+                bytes_on_disk=size,
+                reason=_get_reason(rule),
+            )
+
+    return list(moves.values())
+
+
+class TierService:
+    def __init__(self, system: SystemService, cmd: CmdService) -> None:
+        self._system = system
+        self._cmd = cmd
+
+    def plan_partition_moves(self, tables: List[Table], rules: List[TierRule]) -> List[PartitionMove]:
+        volumes = self._system.get_storage_volumes()
+        disks = self._system.get_disks(['name', 'free_space', 'total_space'])
+        placements = {table.full_name: self._system.get_partition_disks(table.name, table.database) for table in tables}
+        targets = {table.full_name: [_get_target(table, rule, volumes) for rule in rules] for table in tables}
+
+        moves = plan_moves(
+            placements,
+            targets,
+            rules,
+            used={disk.name: disk.total_space - disk.free_space for disk in disks},
+            total={disk.name: disk.total_space for disk in disks},
+            today=date.today(),
+        )
+        log.info('%s partitions to move, %s bytes', len(moves), sum(move.bytes_on_disk for move in moves))
+        return moves
+
+    def move_partitions_to_storage(self, moves: List[PartitionMove], max_bytes_per_second: float = None,
+                                   settings: BulkSettings = None) -> List[BulkResult]:
+        throttle = _Throttle(max_bytes_per_second)
+        moves_by_key = {move.key: move for move in moves}
+
+        def _move(key: str) -> int:
+            move = moves_by_key[key]
+            throttle.wait(move.bytes_on_disk)
+            self._cmd.run_cmd(
+                MovePartitionToStorageCmd,
+                model_params=dict(
+                    table_name=f'{move.database}.{move.table}',
+                    partition_id=move.partition_id,
+                    to_type=move.to_type,
+                    to_name=move.to_name,
+                ),
+            )
+            return move.bytes_on_disk
+
+        return run_bulk(list(moves_by_key), _move, settings)
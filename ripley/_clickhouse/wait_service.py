@@ -0,0 +1,128 @@
+import time
+from dataclasses import fields
+from typing import Any, Callable, List, Set
+
+from .system_service import SystemService
+from .._log import log
+from ..clickhouse_models.ddl_queue import ClickhouseDdlQueueModel as DdlQueue
+from ..clickhouse_models.merge import ClickhouseMergeModel as Merge
+from ..clickhouse_models.mutation import ClickhouseMutationModel as Mutation
+from ..clickhouse_models.wait_settings import ClickhouseWaitSettingsModel as WaitSettings
+
+
+def _check_mutations(mutations: List[Mutation]) -> None:
+    for mutation in mutations:
+        if mutation.latest_fail_reason:
+            raise RuntimeError(
+                f'mutation {mutation.mutation_id} of {mutation.database}.{mutation.table} failed on part '
+                f'{mutation.latest_failed_part}: {mutation.latest_fail_reason}'
+            )
+
+
+def _check_ddl(tasks: List[DdlQueue]) -> None:
+    for task in tasks:
+        if task.exception_code:
+            raise RuntimeError(f'{task.entry} failed on {task.host}:{task.port}: {task.exception_text}')
+
+
+def _get_unseen_ddl(log_comment: str) -> DdlQueue:
+    """
+    status of command which is not in distributed_ddl_queue yet
+    """
+    params = {field.name: None for field in fields(DdlQueue) if field.init}
+    params.update(status='Unknown', log_comment=log_comment)
+    return DdlQueue(**params)
+
+
+class Waiter:
+    """
+    polls {load} with exponential backoff until it returns nothing. Sleeping is done by caller: see poll
+    """
+
+    def __init__(
+        self,
+        name: str,
+        load: Callable[[], List[Any]],
+        settings: WaitSettings = None,
+        progress: Callable[[List[Any]], None] = None,
+        check: Callable[[List[Any]], None] = None,
+    ) -> None:
+        self._name = name
+        self._load = load
+        self._settings = settings or WaitSettings()
+        self._progress = progress
+        self._check = check
+        self._delay = self._settings.initial_delay
+        self._deadline = None if self._settings.timeout is None else time.monotonic() + self._settings.timeout
+
+    def poll(self) -> float:
+        """
+        0 when work is finished, otherwise seconds before the next poll. TimeoutError after settings.timeout
+        """
+        pending = self._load()
+        if self._check:
+            self._check(pending)
+        if self._progress:
+            self._progress(pending)
+        if not pending:
+            return 0
+
+        delay = self._delay
+        self._delay = min(self._delay * self._settings.multiplier, self._settings.max_delay)
+        if self._deadline is not None:
+            remaining = self._deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError(f'{self._name}: {len(pending)} not finished in {self._settings.timeout} sec')
+            delay = min(delay, remaining)
+
+        log.debug('%s: %s pending, next poll in %s sec', self._name, len(pending), delay)
+        return delay
+
+    def wait(self) -> None:
+        while True:
+            delay = self.poll()
+            if not delay:
+                return
+
+            time.sleep(delay)
+
+
+class WaitService:
+    def __init__(self, system: SystemService) -> None:
+        self._system = system
+
+    def create_mutations_waiter(self, table: str, db: str = '', partition_id: str = '', settings: WaitSettings = None,
+                                progress: Callable[[List[Mutation]], None] = None) -> Waiter:
+        return Waiter(
+            f'mutations of {db}.{table}' if db else f'mutations of {table}',
+            lambda: self._system.get_pending_mutations(table, db, partition_id),
+            settings,
+            progress,
+            _check_mutations,
+        )
+
+    def create_merges_waiter(self, table: str, db: str = '', partition_id: str = '', settings: WaitSettings = None,
+                             progress: Callable[[List[Merge]], None] = None) -> Waiter:
+        return Waiter(
+            f'merges of {db}.{table}' if db else f'merges of {table}',
+            lambda: self._system.get_merges(table, db, partition_id),
+            settings,
+            progress,
+        )
+
+    def create_ddl_waiter(self, log_comments: List[str], settings: WaitSettings = None,
+                          progress: Callable[[List[DdlQueue]], None] = None) -> Waiter:
+        finished: Set[str] = set()
+
+        def _load() -> List[DdlQueue]:
+            pending = [log_comment for log_comment in log_comments if log_comment not in finished]
+            tasks = self._system.get_ddl_queue(pending)
+            _check_ddl(tasks)
+
+            unfinished = [task for task in tasks if task.status not in ('Finished', 'Removing')]
+            seen = {task.log_comment for task in tasks}
+            finished.update(seen - {task.log_comment for task in unfinished})
+            # command is finished when it is in the queue and finished on all hosts
+            return unfinished + [_get_unseen_ddl(log_comment) for log_comment in pending if log_comment not in seen]
+
+        return Waiter(f'{len(log_comments)} ON CLUSTER DDL', _load, settings, progress)
@@ -0,0 +1,730 @@
+import abc
+from typing import Any, Awaitable, Callable, Protocol, List, AsyncIterator, Union
+
+from ..clickhouse_models.bulk_result import ClickhouseBulkResultModel as BulkResult
+from ..clickhouse_models.bulk_settings import ClickhouseBulkSettingsModel as BulkSettings
+from ..clickhouse_models.cache_stats import ClickhouseCacheStatsModel as CacheStats
+from ..clickhouse_models.checkpoint_settings import ClickhouseCheckpointSettingsModel as CheckpointSettings
+from ..clickhouse_models.codec import ClickhouseCodecAdviceModel as CodecAdvice
+from ..clickhouse_models.column import ClickhouseColumnModel as Column
+from ..clickhouse_models.column import ClickhouseColumnSummaryModel as ColumnSummary
+from ..clickhouse_models.db import ClickhouseDbModel as Db
+from ..clickhouse_models.ddl_queue import ClickhouseDdlQueueModel as DdlQueue
+from ..clickhouse_models.disk import ClickhouseDiskModel as Disk
+from ..clickhouse_models.merge import ClickhouseMergeModel as Merge
+from ..clickhouse_models.merge_schedule import ClickhouseMergeCandidateModel as MergeCandidate
+from ..clickhouse_models.merge_schedule import ClickhouseMergeScheduleSettingsModel as MergeScheduleSettings
+from ..clickhouse_models.metadata_snapshot import ClickhouseMetadataSnapshotModel as MetadataSnapshot
+from ..clickhouse_models.mutation import ClickhouseMutationModel as Mutation
+from ..clickhouse_models.part import ClickhousePartModel as Part
+from ..clickhouse_models.partition import ClickhousePartitionModel as Partition
+from ..clickhouse_models.plan_step import ClickhousePlanStepModel as PlanStep
+from ..clickhouse_models.process import ClickhouseProcessModel as Process
+from ..clickhouse_models.process import ClickhouseProcessEventModel as ProcessEvent
+from ..clickhouse_models.process import ClickhouseProcessKillRuleModel as KillRule
+from ..clickhouse_models.process import ClickhouseProcessSummaryModel as ProcessSummary
+from ..clickhouse_models.query_event import ClickhouseQueryEventModel as QueryEvent
+from ..clickhouse_models.query_event import ClickhouseQueryStatsModel as QueryStats
+from ..clickhouse_models.remote_settings import ClickhouseRemoteSettingsModel as RemoteSettings
+from ..clickhouse_models.retention import ClickhouseRetentionPolicyModel as RetentionPolicy
+from ..clickhouse_models.storage import ClickhousePartitionDiskModel as PartitionDisk
+from ..clickhouse_models.storage import ClickhousePartitionMoveModel as PartitionMove
+from ..clickhouse_models.storage import ClickhouseTierRuleModel as TierRule
+from ..clickhouse_models.storage import ClickhouseVolumeModel as Volume
+from ..clickhouse_models.s3_settings import ClickhouseS3SettingsModel as S3Settings
+from ..clickhouse_models.s3_settings import S3SelectSettingsModel as S3SelectSettings
+from ..clickhouse_models.table import ClickhouseTableModel as Table
+from ..clickhouse_models.table import ClickhouseTableSummaryModel as TableSummary
+from ..clickhouse_models.wait_settings import ClickhouseWaitSettingsModel as WaitSettings
+
+
+class AsyncClickhouseProtocol(Protocol, metaclass=abc.ABCMeta):
+    """
+    asyncio version of ClickhouseProtocol. Methods with I/O are coroutines, iter_* are async generators
+    """
+
+    @abc.abstractmethod
+    async def ping(self) -> bool:
+        """
+        see: ClickhouseProtocol.ping
+        """
+
+    @abc.abstractmethod
+    async def close(self) -> None:
+        """
+        see: ClickhouseProtocol.close. Services are closed on exit of `async with from_clickhouse_async(...)`
+        """
+
+    @property
+    def active_db(self) -> str:
+        """
+        see: ClickhouseProtocol.active_db
+        """
+
+    @property
+    def on_cluster(self) -> str:
+        """
+        see: ClickhouseProtocol.on_cluster
+        """
+
+    @property
+    def settings(self) -> dict:
+        """
+        see: ClickhouseProtocol.settings
+        """
+
+    @abc.abstractmethod
+    def set_settings(self, settings: dict):
+        """
+        see: ClickhouseProtocol.set_settings
+        """
+
+    @abc.abstractmethod
+    def skip_settings(self):
+        """
+        see: ClickhouseProtocol.skip_settings
+        """
+
+    @abc.abstractmethod
+    def set_on_cluster(self, name: str):
+        """
+        see: ClickhouseProtocol.set_on_cluster
+        """
+
+    @abc.abstractmethod
+    def skip_on_cluster(self):
+        """
+        see: ClickhouseProtocol.skip_on_cluster
+        """
+
+    @property
+    def ddl_tasks(self) -> List[str]:
+        """
+        see: ClickhouseProtocol.ddl_tasks
+        """
+
+    @abc.abstractmethod
+    def set_async_ddl(self):
+        """
+        see: ClickhouseProtocol.set_async_ddl
+        """
+
+    @abc.abstractmethod
+    def skip_async_ddl(self):
+        """
+        see: ClickhouseProtocol.skip_async_ddl
+        """
+
+    @property
+    def metadata_cache_stats(self) -> CacheStats:
+        """
+        see: ClickhouseProtocol.metadata_cache_stats
+        """
+
+    @abc.abstractmethod
+    def set_metadata_cache(self, ttl: float = 60, max_size: int = 1024):
+        """
+        see: ClickhouseProtocol.set_metadata_cache
+        """
+
+    @abc.abstractmethod
+    def skip_metadata_cache(self):
+        """
+        see: ClickhouseProtocol.skip_metadata_cache
+        """
+
+    @property
+    def query_stats(self) -> List[QueryStats]:
+        """
+        see: ClickhouseProtocol.query_stats
+        """
+
+    @abc.abstractmethod
+    def set_query_stats(self, max_samples: int = 10_000):
+        """
+        see: ClickhouseProtocol.set_query_stats
+        """
+
+    @abc.abstractmethod
+    def skip_query_stats(self):
+        """
+        see: ClickhouseProtocol.skip_query_stats
+        """
+
+    @abc.abstractmethod
+    def add_query_hook(self, hook: Callable[[QueryEvent], None]):
+        """
+        see: ClickhouseProtocol.add_query_hook
+        """
+
+    @abc.abstractmethod
+    def remove_query_hook(self, hook: Callable[[QueryEvent], None]):
+        """
+        see: ClickhouseProtocol.remove_query_hook
+        """
+
+    @abc.abstractmethod
+    def create_plan(self, snapshot: MetadataSnapshot = None) -> 'AsyncClickhousePlanProtocol':
+        """
+        see: ClickhouseProtocol.create_plan
+        """
+
+    @abc.abstractmethod
+    async def get_metadata_snapshot(self, databases: List[str] = None) -> MetadataSnapshot:
+        """
+        see: ClickhouseProtocol.get_metadata_snapshot
+        """
+
+    @abc.abstractmethod
+    async def get_remote_metadata_snapshot(self, settings: RemoteSettings,
+                                           tables: List[str] = None) -> MetadataSnapshot:
+        """
+        see: ClickhouseProtocol.get_remote_metadata_snapshot
+        """
+
+    @abc.abstractmethod
+    async def create_db(self, name: str, engine: str = '') -> Db:
+        """
+        see: ClickhouseProtocol.create_db
+        """
+
+    @abc.abstractmethod
+    async def exec(self, sql: str, params: dict = None) -> List:
+        """
+        see: ClickhouseProtocol.exec
+        """
+
+    @abc.abstractmethod
+    async def move_partition(self, from_table: Table, to_table: Table, partition: str) -> None:
+        """
+        see: ClickhouseProtocol.move_partition
+        """
+
+    @abc.abstractmethod
+    async def replace_partition(self, from_table: Table, to_table: Table, partition: str) -> None:
+        """
+        see: ClickhouseProtocol.replace_partition
+        """
+
+    @abc.abstractmethod
+    async def drop_partition(self, table: Table, partition: str) -> None:
+        """
+        see: ClickhouseProtocol.drop_partition
+        """
+
+    @abc.abstractmethod
+    async def detach_partition(self, table: Table, partition: str) -> None:
+        """
+        see: ClickhouseProtocol.detach_partition
+        """
+
+    @abc.abstractmethod
+    async def attach_partition(self, table: Table, partition: str) -> None:
+        """
+        see: ClickhouseProtocol.attach_partition
+        """
+
+    @abc.abstractmethod
+    async def move_partitions(
+        self,
+        from_table: Table,
+        to_table: Table,
+        partitions: List[Union[str, Partition]],
+        settings: BulkSettings = None,
+    ) -> List[BulkResult]:
+        """
+        see: ClickhouseProtocol.move_partitions
+        """
+
+    @abc.abstractmethod
+    async def replace_partitions(
+        self,
+        from_table: Table,
+        to_table: Table,
+        partitions: List[Union[str, Partition]],
+        settings: BulkSettings = None,
+    ) -> List[BulkResult]:
+        """
+        see: ClickhouseProtocol.replace_partitions
+        """
+
+    @abc.abstractmethod
+    async def drop_partitions(
+        self,
+        table: Table,
+        partitions: List[Union[str, Partition]],
+        settings: BulkSettings = None,
+    ) -> List[BulkResult]:
+        """
+        see: ClickhouseProtocol.drop_partitions
+        """
+
+    @abc.abstractmethod
+    async def detach_partitions(
+        self,
+        table: Table,
+        partitions: List[Union[str, Partition]],
+        settings: BulkSettings = None,
+    ) -> List[BulkResult]:
+        """
+        see: ClickhouseProtocol.detach_partitions
+        """
+
+    @abc.abstractmethod
+    async def attach_partitions(
+        self,
+        table: Table,
+        partitions: List[Union[str, Partition]],
+        settings: BulkSettings = None,
+    ) -> List[BulkResult]:
+        """
+        see: ClickhouseProtocol.attach_partitions
+        """
+
+    @abc.abstractmethod
+    async def get_databases(self, fields: List[str] = None) -> List[Db]:
+        """
+        see: ClickhouseProtocol.get_databases
+        """
+
+    @abc.abstractmethod
+    def iter_databases(self, fields: List[str] = None) -> AsyncIterator[Db]:
+        """
+        see: ClickhouseProtocol.iter_databases
+        """
+
+    @abc.abstractmethod
+    async def get_database_by_name(self, name: str = '', fields: List[str] = None) -> Db:
+        """
+        see: ClickhouseProtocol.get_database_by_name
+        """
+
+    @abc.abstractmethod
+    async def get_tables_by_db(self, db: str = '', fields: List[str] = None) -> List[Table]:
+        """
+        see: ClickhouseProtocol.get_tables_by_db
+        """
+
+    @abc.abstractmethod
+    def iter_tables_by_db(self, db: str = '', fields: List[str] = None) -> AsyncIterator[Table]:
+        """
+        see: ClickhouseProtocol.iter_tables_by_db
+        """
+
+    @abc.abstractmethod
+    async def get_table_summaries(self, db: str = '') -> List[TableSummary]:
+        """
+        see: ClickhouseProtocol.get_table_summaries
+        """
+
+    @abc.abstractmethod
+    async def get_table_by_name(self, table: str, db: str = '', fields: List[str] = None) -> Table:
+        """
+        see: ClickhouseProtocol.get_table_by_name
+        """
+
+    @abc.abstractmethod
+    async def get_table_partitions(self, table: str, db: str = '') -> List[Partition]:
+        """
+        see: ClickhouseProtocol.get_table_partitions
+        """
+
+    @abc.abstractmethod
+    async def get_table_parts(self, table: str, db: str = '', fields: List[str] = None) -> List[Part]:
+        """
+        see: ClickhouseProtocol.get_table_parts
+        """
+
+    @abc.abstractmethod
+    def iter_table_partitions(self, table: str, db: str = '') -> AsyncIterator[Partition]:
+        """
+        see: ClickhouseProtocol.iter_table_partitions
+        """
+
+    @abc.abstractmethod
+    async def get_remote_table_partitions(self, settings: RemoteSettings) -> List[Partition]:
+        """
+        see: ClickhouseProtocol.get_remote_table_partitions
+        """
+
+    @abc.abstractmethod
+    async def get_processes(self, fields: List[str] = None) -> List[Process]:
+        """
+        see: ClickhouseProtocol.get_processes
+        """
+
+    @abc.abstractmethod
+    def iter_processes(self, fields: List[str] = None) -> AsyncIterator[Process]:
+        """
+        see: ClickhouseProtocol.iter_processes
+        """
+
+    @abc.abstractmethod
+    async def get_process_by_query_id(self, query_id: str, fields: List[str] = None) -> Process:
+        """
+        see: ClickhouseProtocol.get_process_by_query_id
+        """
+
+    @abc.abstractmethod
+    async def get_process_summaries(self) -> List[ProcessSummary]:
+        """
+        see: ClickhouseProtocol.get_process_summaries
+        """
+
+    @abc.abstractmethod
+    async def kill_query(self, query_id: str) -> None:
+        """
+        see: ClickhouseProtocol.kill_query
+        """
+
+    @abc.abstractmethod
+    def watch_processes(self, interval: float = 1, rules: List[KillRule] = None) -> AsyncIterator[ProcessEvent]:
+        """
+        see: ClickhouseProtocol.watch_processes
+        """
+
+    @abc.abstractmethod
+    async def get_pending_mutations(self, table: str, db: str = '', partition_id: str = '') -> List[Mutation]:
+        """
+        see: ClickhouseProtocol.get_pending_mutations
+        """
+
+    @abc.abstractmethod
+    async def get_merges(self, table: str, db: str = '', partition_id: str = '') -> List[Merge]:
+        """
+        see: ClickhouseProtocol.get_merges
+        """
+
+    @abc.abstractmethod
+    async def wait_for_mutations(
+        self,
+        table: str,
+        db: str = '',
+        partition_id: str = '',
+        settings: WaitSettings = None,
+        progress: Callable[[List[Mutation]], None] = None,
+    ) -> None:
+        """
+        see: ClickhouseProtocol.wait_for_mutations. Event loop is not blocked between polls
+        """
+
+    @abc.abstractmethod
+    async def wait_for_merges(
+        self,
+        table: str,
+        db: str = '',
+        partition_id: str = '',
+        settings: WaitSettings = None,
+        progress: Callable[[List[Merge]], None] = None,
+    ) -> None:
+        """
+        see: ClickhouseProtocol.wait_for_merges. Event loop is not blocked between polls
+        """
+
+    @abc.abstractmethod
+    async def get_ddl_queue(self, log_comments: List[str] = None) -> List[DdlQueue]:
+        """
+        see: ClickhouseProtocol.get_ddl_queue
+        """
+
+    @abc.abstractmethod
+    async def wait_for_ddl(
+        self,
+        settings: WaitSettings = None,
+        progress: Callable[[List[DdlQueue]], None] = None,
+    ) -> None:
+        """
+        see: ClickhouseProtocol.wait_for_ddl. Event loop is not blocked between polls
+        """
+
+    @abc.abstractmethod
+    async def get_disks(self, fields: List[str] = None) -> List[Disk]:
+        """
+        see: ClickhouseProtocol.get_disks
+        """
+
+    @abc.abstractmethod
+    async def get_storage_volumes(self, policy: str = '') -> List[Volume]:
+        """
+        see: ClickhouseProtocol.get_storage_volumes
+        """
+
+    @abc.abstractmethod
+    async def get_partition_disks(self, table: str, db: str = '') -> List[PartitionDisk]:
+        """
+        see: ClickhouseProtocol.get_partition_disks
+        """
+
+    @abc.abstractmethod
+    async def get_table_columns(self, table: str, db: str = '', fields: List[str] = None) -> List[Column]:
+        """
+        see: ClickhouseProtocol.get_table_columns
+        """
+
+    @abc.abstractmethod
+    def iter_table_columns(self, table: str, db: str = '', fields: List[str] = None) -> AsyncIterator[Column]:
+        """
+        see: ClickhouseProtocol.iter_table_columns
+        """
+
+    @abc.abstractmethod
+    async def get_column_summaries(self, table: str, db: str = '') -> List[ColumnSummary]:
+        """
+        see: ClickhouseProtocol.get_column_summaries
+        """
+
+    @abc.abstractmethod
+    async def create_table_as(
+        self,
+        from_table: Table,
+        table: str,
+        db: str = '',
+        order_by: list = None,
+        partition_by: list = None,
+        engine: str = '',
+    ) -> Table:
+        """
+        see: ClickhouseProtocol.create_table_as
+        """
+
+    @abc.abstractmethod
+    async def insert_from_table(self, from_table: Table, to_table: Table) -> None:
+        """
+        see: ClickhouseProtocol.insert_from_table
+        """
+
+    @abc.abstractmethod
+    async def insert_from_table_by_partitions(
+        self,
+        from_table: Table,
+        to_table: Table,
+        checkpoint: CheckpointSettings = None,
+        settings: BulkSettings = None,
+        replace: bool = False,
+    ) -> List[BulkResult]:
+        """
+        see: ClickhouseProtocol.insert_from_table_by_partitions
+        """
+
+    @abc.abstractmethod
+    async def truncate(self, table: str, db: str = '') -> None:
+        """
+        see: ClickhouseProtocol.truncate
+        """
+
+    @abc.abstractmethod
+    async def rebuild_table(
+        self,
+        table: Table,
+        load: Callable[[Table], Union[Any, Awaitable[Any]]],
+        expected_rows: int = None,
+    ) -> Table:
+        """
+        see: ClickhouseProtocol.rebuild_table. {load} can be a coroutine function
+        """
+
+    @abc.abstractmethod
+    async def rebuild_table_from_table(self, from_table: Table, table: Table, settings: BulkSettings = None) -> Table:
+        """
+        see: ClickhouseProtocol.rebuild_table_from_table
+        """
+
+    @abc.abstractmethod
+    async def insert_from_s3(self, table: Table, s3_settings: S3Settings, s3_select_settings: S3SelectSettings = None):
+        """
+        see: ClickhouseProtocol.insert_from_s3
+        """
+
+    @abc.abstractmethod
+    async def insert_from_s3_files(
+        self,
+        table: Table,
+        s3_settings: S3Settings,
+        urls: List[str] = None,
+        s3_select_settings: S3SelectSettings = None,
+        files_per_insert: int = 100,
+        ledger_table: str = '',
+        settings: BulkSettings = None,
+    ) -> List[BulkResult]:
+        """
+        see: ClickhouseProtocol.insert_from_s3_files
+        """
+
+    @abc.abstractmethod
+    async def insert_table_to_s3(self, table: Table, s3_settings: S3Settings):
+        """
+        see: ClickhouseProtocol.insert_table_to_s3
+        """
+
+    @abc.abstractmethod
+    async def insert_table_to_s3_by_partitions(
+        self,
+        table: Table,
+        s3_settings: S3Settings,
+        manifest_url: str = '',
+        partition_ids: List[str] = None,
+        settings: BulkSettings = None,
+    ) -> List[BulkResult]:
+        """
+        see: ClickhouseProtocol.insert_table_to_s3_by_partitions
+        """
+
+    @abc.abstractmethod
+    async def rename_table(self, table: Table, new_name: str, db: str = '') -> None:
+        """
+        see: ClickhouseProtocol.rename_table
+        """
+
+    @abc.abstractmethod
+    async def insert_from_remote(
+        self,
+        settings: RemoteSettings,
+        table: str,
+        db: str = '',
+        create_table: bool = False,
+    ) -> None:
+        """
+        see: ClickhouseProtocol.insert_from_remote
+        """
+
+    @abc.abstractmethod
+    async def insert_from_remote_by_partitions(
+        self,
+        settings: RemoteSettings,
+        table: str,
+        db: str = '',
+        create_table: bool = False,
+        checkpoint: CheckpointSettings = None,
+        bulk_settings: BulkSettings = None,
+    ) -> List[BulkResult]:
+        """
+        see: ClickhouseProtocol.insert_from_remote_by_partitions
+        """
+
+    @abc.abstractmethod
+    async def insert_from_remote_snapshot(
+        self,
+        settings: RemoteSettings,
+        snapshot: MetadataSnapshot,
+        db: str = '',
+        create_tables: bool = True,
+        checkpoint: CheckpointSettings = None,
+        bulk_settings: BulkSettings = None,
+    ) -> List[BulkResult]:
+        """
+        see: ClickhouseProtocol.insert_from_remote_snapshot
+        """
+
+    @abc.abstractmethod
+    async def sync_table(
+        self,
+        from_table: Table,
+        to_table: Table,
+        compare_hash: bool = False,
+        settings: BulkSettings = None,
+    ) -> List[BulkResult]:
+        """
+        see: ClickhouseProtocol.sync_table
+        """
+
+    @abc.abstractmethod
+    async def sync_table_from_remote(
+        self,
+        remote_settings: RemoteSettings,
+        to_table: Table,
+        compare_hash: bool = False,
+        settings: BulkSettings = None,
+    ) -> List[BulkResult]:
+        """
+        see: ClickhouseProtocol.sync_table_from_remote
+        """
+
+    @abc.abstractmethod
+    async def plan_partition_moves(self, tables: List[Table], rules: List[TierRule]) -> List[PartitionMove]:
+        """
+        see: ClickhouseProtocol.plan_partition_moves
+        """
+
+    @abc.abstractmethod
+    async def move_partitions_to_storage(
+        self,
+        moves: List[PartitionMove],
+        max_bytes_per_second: float = None,
+        settings: BulkSettings = None,
+    ) -> List[BulkResult]:
+        """
+        see: ClickhouseProtocol.move_partitions_to_storage
+        """
+
+    @abc.abstractmethod
+    async def advise_codecs(
+        self,
+        table: Table,
+        sample_rows: int = 100_000,
+        codecs: List[str] = None,
+        columns: List[str] = None,
+    ) -> List[CodecAdvice]:
+        """
+        see: ClickhouseProtocol.advise_codecs
+        """
+
+    @abc.abstractmethod
+    async def plan_merges(self, table: Table, settings: MergeScheduleSettings = None) -> List[MergeCandidate]:
+        """
+        see: ClickhouseProtocol.plan_merges
+        """
+
+    @abc.abstractmethod
+    async def optimize_partitions(
+        self,
+        table: Table,
+        settings: MergeScheduleSettings = None,
+        bulk_settings: BulkSettings = None,
+    ) -> List[BulkResult]:
+        """
+        see: ClickhouseProtocol.optimize_partitions
+        """
+
+    @abc.abstractmethod
+    async def get_expired_partitions(self, table: Table, policy: RetentionPolicy) -> List[Partition]:
+        """
+        see: ClickhouseProtocol.get_expired_partitions
+        """
+
+    @abc.abstractmethod
+    async def drop_expired_partitions(
+        self,
+        table: Table,
+        policy: RetentionPolicy,
+        settings: BulkSettings = None,
+    ) -> List[BulkResult]:
+        """
+        see: ClickhouseProtocol.drop_expired_partitions
+        """
+
+    @abc.abstractmethod
+    async def create_distributed_table(
+        self,
+        create_table: str,
+        table: str,
+        database: str,
+        sharding_key: str = '',
+        cluster: str = "'{cluster}'",
+    ) -> Table:
+        """
+        see: ClickhouseProtocol.create_distributed_table
+        """
+
+
+class AsyncClickhousePlanProtocol(AsyncClickhouseProtocol, metaclass=abc.ABCMeta):
+    @property
+    def steps(self) -> List[PlanStep]:
+        """
+        see: ClickhousePlanProtocol.steps
+        """
+
+    @abc.abstractmethod
+    async def execute(self, settings: BulkSettings = None) -> List[BulkResult]:
+        """
+        see: ClickhousePlanProtocol.execute
+        """
@@ -1,15 +1,41 @@
 import abc
-from typing import Protocol, List
+from typing import Any, Callable, Protocol, List, Iterator, Union
 
+from ..clickhouse_models.bulk_result import ClickhouseBulkResultModel as BulkResult
+from ..clickhouse_models.bulk_settings import ClickhouseBulkSettingsModel as BulkSettings
+from ..clickhouse_models.cache_stats import ClickhouseCacheStatsModel as CacheStats
+from ..clickhouse_models.checkpoint_settings import ClickhouseCheckpointSettingsModel as CheckpointSettings
+from ..clickhouse_models.codec import ClickhouseCodecAdviceModel as CodecAdvice
 from ..clickhouse_models.column import ClickhouseColumnModel as Column
+from ..clickhouse_models.column import ClickhouseColumnSummaryModel as ColumnSummary
 from ..clickhouse_models.db import ClickhouseDbModel as Db
+from ..clickhouse_models.ddl_queue import ClickhouseDdlQueueModel as DdlQueue
 from ..clickhouse_models.disk import ClickhouseDiskModel as Disk
+from ..clickhouse_models.merge import ClickhouseMergeModel as Merge
+from ..clickhouse_models.merge_schedule import ClickhouseMergeCandidateModel as MergeCandidate
+from ..clickhouse_models.merge_schedule import ClickhouseMergeScheduleSettingsModel as MergeScheduleSettings
+from ..clickhouse_models.metadata_snapshot import ClickhouseMetadataSnapshotModel as MetadataSnapshot
+from ..clickhouse_models.mutation import ClickhouseMutationModel as Mutation
+from ..clickhouse_models.part import ClickhousePartModel as Part
 from ..clickhouse_models.partition import ClickhousePartitionModel as Partition
+from ..clickhouse_models.plan_step import ClickhousePlanStepModel as PlanStep
 from ..clickhouse_models.process import ClickhouseProcessModel as Process
+from ..clickhouse_models.process import ClickhouseProcessEventModel as ProcessEvent
+from ..clickhouse_models.process import ClickhouseProcessKillRuleModel as KillRule
+from ..clickhouse_models.process import ClickhouseProcessSummaryModel as ProcessSummary
+from ..clickhouse_models.query_event import ClickhouseQueryEventModel as QueryEvent
+from ..clickhouse_models.query_event import ClickhouseQueryStatsModel as QueryStats
 from ..clickhouse_models.s3_settings import ClickhouseS3SettingsModel as S3Settings
 from ..clickhouse_models.s3_settings import S3SelectSettingsModel as S3SelectSettings
 from ..clickhouse_models.remote_settings import ClickhouseRemoteSettingsModel as RemoteSettings
+from ..clickhouse_models.retention import ClickhouseRetentionPolicyModel as RetentionPolicy
+from ..clickhouse_models.storage import ClickhousePartitionDiskModel as PartitionDisk
+from ..clickhouse_models.storage import ClickhousePartitionMoveModel as PartitionMove
+from ..clickhouse_models.storage import ClickhouseTierRuleModel as TierRule
+from ..clickhouse_models.storage import ClickhouseVolumeModel as Volume
 from ..clickhouse_models.table import ClickhouseTableModel as Table
+from ..clickhouse_models.table import ClickhouseTableSummaryModel as TableSummary
+from ..clickhouse_models.wait_settings import ClickhouseWaitSettingsModel as WaitSettings
 
 
 class ClickhouseProtocol(Protocol, metaclass=abc.ABCMeta):
@@ -55,6 +81,104 @@ class ClickhouseProtocol(Protocol, metaclass=abc.ABCMeta):
         disable ON CLUSTER mode
         """
 
+    @property
+    def ddl_tasks(self) -> List[str]:
+        """
+        log_comment of async ON CLUSTER commands which are not waited yet, see: set_async_ddl
+        """
+
+    @abc.abstractmethod
+    def set_async_ddl(self):
+        """
+        ON CLUSTER commands return after the entry is added to distributed DDL queue
+        (distributed_ddl_task_timeout = 0) instead of waiting for all hosts. Each command is tagged by
+        unique log_comment, see: ddl_tasks, wait_for_ddl. Commands which depend on previous DDL must be
+        executed after wait_for_ddl
+        """
+
+    @abc.abstractmethod
+    def skip_async_ddl(self):
+        """
+        disable async ON CLUSTER commands. ddl_tasks are not waited
+        """
+
+    @property
+    def metadata_cache_stats(self) -> CacheStats:
+        """
+        hits / misses of metadata cache. None if cache is disabled
+        """
+
+    @abc.abstractmethod
+    def set_metadata_cache(self, ttl: float = 60, max_size: int = 1024):
+        """
+        enable cache for get_database_by_name, get_table_by_name, get_table_columns.
+        Entries expire after {ttl} seconds, least recently used entries are evicted above {max_size}.
+        Commands of ripley (CREATE, ALTER, RENAME, TRUNCATE, INSERT) invalidate entries of affected tables.
+        Queries via exec are not tracked
+        """
+
+    @abc.abstractmethod
+    def skip_metadata_cache(self):
+        """
+        disable metadata cache
+        """
+
+    @property
+    def query_stats(self) -> List[QueryStats]:
+        """
+        wall time p50 / p95 / p99 per command, sorted by total time. None if query stats are disabled
+        """
+
+    @abc.abstractmethod
+    def set_query_stats(self, max_samples: int = 10_000):
+        """
+        enable query stats. Percentiles are calculated over last {max_samples} queries of each command
+        """
+
+    @abc.abstractmethod
+    def skip_query_stats(self):
+        """
+        disable query stats
+        """
+
+    @abc.abstractmethod
+    def add_query_hook(self, hook: Callable[[QueryEvent], None]):
+        """
+        {hook} is called after each query: command, masked SQL, settings, elapsed time, query_id,
+        read / written rows and bytes, error. Hooks are called in the thread of query, errors of hooks are logged
+        """
+
+    @abc.abstractmethod
+    def remove_query_hook(self, hook: Callable[[QueryEvent], None]):
+        """
+        see: add_query_hook
+        """
+
+    @abc.abstractmethod
+    def create_plan(self, snapshot: MetadataSnapshot = None) -> 'ClickhousePlanProtocol':
+        """
+        plan mode: calls of returned object record commands instead of execution, see: ClickhousePlanProtocol.
+        Metadata lookups are served from {snapshot} (see: get_metadata_snapshot), databases which are not in
+        {snapshot} are requested from the server. Created / renamed tables are synthesized from source tables.
+        Read-only queries (SELECT, S3 listing) are executed. Nested plans, rebuild_table, kill_query, process
+        watchers and waiters are not supported by plan: NotImplementedError
+        """
+
+    @abc.abstractmethod
+    def get_metadata_snapshot(self, databases: List[str] = None) -> MetadataSnapshot:
+        """
+        databases, tables, columns and partitions of {databases} in 4 queries which are run at the same time
+        (see: PoolSettings): one round trip with {databases}, two without. Default: all databases
+        """
+
+    @abc.abstractmethod
+    def get_remote_metadata_snapshot(self, settings: RemoteSettings, tables: List[str] = None) -> MetadataSnapshot:
+        """
+        get_metadata_snapshot of remote database {settings.db}: 4 queries to remote(system...) at the same time
+        regardless of number of tables.
+        {tables} - only these tables. Default: all tables. see: insert_from_remote_snapshot
+        """
+
     @abc.abstractmethod
     def create_db(self, name: str, engine: str = '') -> Db:
         """
@@ -65,6 +189,12 @@ class ClickhouseProtocol(Protocol, metaclass=abc.ABCMeta):
     def ping(self) -> bool:
         pass
 
+    @abc.abstractmethod
+    def close(self) -> None:
+        """
+        disconnects the client or clients of the pool. Services are closed on exit of `with from_clickhouse(...)`
+        """
+
     @abc.abstractmethod
     def exec(self, sql: str, params: dict = None) -> List:
         pass
@@ -100,30 +230,110 @@ class ClickhouseProtocol(Protocol, metaclass=abc.ABCMeta):
         """
 
     @abc.abstractmethod
-    def get_databases(self) -> List[Db]:
+    def move_partitions(
+        self,
+        from_table: Table,
+        to_table: Table,
+        partitions: List[Union[str, Partition]],
+        settings: BulkSettings = None,
+    ) -> List[BulkResult]:
+        """
+        move_partition for each partition in worker pool with retries. Errors are not raised: see BulkResult.error
+        """
+
+    @abc.abstractmethod
+    def replace_partitions(
+        self,
+        from_table: Table,
+        to_table: Table,
+        partitions: List[Union[str, Partition]],
+        settings: BulkSettings = None,
+    ) -> List[BulkResult]:
+        """
+        replace_partition for each partition in worker pool with retries. Errors are not raised: see BulkResult.error
+        """
+
+    @abc.abstractmethod
+    def drop_partitions(
+        self,
+        table: Table,
+        partitions: List[Union[str, Partition]],
+        settings: BulkSettings = None,
+    ) -> List[BulkResult]:
+        """
+        drop_partition for each partition in worker pool with retries. Errors are not raised: see BulkResult.error
+        """
+
+    @abc.abstractmethod
+    def detach_partitions(
+        self,
+        table: Table,
+        partitions: List[Union[str, Partition]],
+        settings: BulkSettings = None,
+    ) -> List[BulkResult]:
+        """
+        detach_partition for each partition in worker pool with retries. Errors are not raised: see BulkResult.error
+        """
+
+    @abc.abstractmethod
+    def attach_partitions(
+        self,
+        table: Table,
+        partitions: List[Union[str, Partition]],
+        settings: BulkSettings = None,
+    ) -> List[BulkResult]:
+        """
+        attach_partition for each partition in worker pool with retries. Errors are not raised: see BulkResult.error
+        """
+
+    @abc.abstractmethod
+    def get_databases(self, fields: List[str] = None) -> List[Db]:
         """
         system.databases
+        {fields} - projection. Fields which are not selected are None
         see: https://clickhouse.com/docs/en/operations/system-tables/databases
         """
 
     @abc.abstractmethod
-    def get_database_by_name(self, name: str = '') -> Db:
+    def iter_databases(self, fields: List[str] = None) -> Iterator[Db]:
+        """
+        streaming version of get_databases
+        """
+
+    @abc.abstractmethod
+    def get_database_by_name(self, name: str = '', fields: List[str] = None) -> Db:
         """
         system.databases
+        {fields} - projection. Fields which are not selected are None
         see: https://clickhouse.com/docs/en/operations/system-tables/databases
         """
 
     @abc.abstractmethod
-    def get_tables_by_db(self, db: str = '') -> List[Table]:
+    def get_tables_by_db(self, db: str = '', fields: List[str] = None) -> List[Table]:
         """
         system.tables
+        {fields} - projection. Fields which are not selected are None
         see: https://clickhouse.com/docs/en/operations/system-tables/tables
         """
 
     @abc.abstractmethod
-    def get_table_by_name(self, table: str, db: str = '') -> Table:
+    def iter_tables_by_db(self, db: str = '', fields: List[str] = None) -> Iterator[Table]:
+        """
+        streaming version of get_tables_by_db
+        """
+
+    @abc.abstractmethod
+    def get_table_summaries(self, db: str = '') -> List[TableSummary]:
+        """
+        system.tables without DDL, paths and dependencies
+        see: https://clickhouse.com/docs/en/operations/system-tables/tables
+        """
+
+    @abc.abstractmethod
+    def get_table_by_name(self, table: str, db: str = '', fields: List[str] = None) -> Table:
         """
         system.tables
+        {fields} - projection. Fields which are not selected are None
         see: https://clickhouse.com/docs/en/operations/system-tables/tables
         """
 
@@ -135,30 +345,169 @@ class ClickhouseProtocol(Protocol, metaclass=abc.ABCMeta):
         """
 
     @abc.abstractmethod
-    def get_processes(self) -> List[Process]:
+    def get_table_parts(self, table: str, db: str = '', fields: List[str] = None) -> List[Part]:
+        """
+        system.parts of {table} per part, active and inactive
+        {fields} - projection. Fields which are not selected are None
+        """
+
+    @abc.abstractmethod
+    def iter_table_partitions(self, table: str, db: str = '') -> Iterator[Partition]:
+        """
+        streaming version of get_table_partitions
+        """
+
+    @abc.abstractmethod
+    def get_remote_table_partitions(self, settings: RemoteSettings) -> List[Partition]:
+        """
+        get_table_partitions of remote table {settings.db}.{settings.table}: remote(..., system, parts, ...)
+        """
+
+    @abc.abstractmethod
+    def get_processes(self, fields: List[str] = None) -> List[Process]:
         """
         system.processes
+        {fields} - projection. Fields which are not selected are None
         see: https://clickhouse.com/docs/en/operations/system-tables/processes
         """
 
     @abc.abstractmethod
-    def get_process_by_query_id(self, query_id: str) -> Process:
+    def iter_processes(self, fields: List[str] = None) -> Iterator[Process]:
+        """
+        streaming version of get_processes
+        """
+
+    @abc.abstractmethod
+    def get_process_by_query_id(self, query_id: str, fields: List[str] = None) -> Process:
         """
         system.processes
+        {fields} - projection. Fields which are not selected are None
         see: https://clickhouse.com/docs/en/operations/system-tables/processes
         """
 
     @abc.abstractmethod
-    def get_disks(self) -> List[Disk]:
+    def get_process_summaries(self) -> List[ProcessSummary]:
+        """
+        system.processes without settings, profile events and client info. Query of ripley is skipped
+        """
+
+    @abc.abstractmethod
+    def kill_query(self, query_id: str) -> None:
+        """
+        KILL QUERY WHERE query_id = '{query_id}' ASYNC
+        """
+
+    @abc.abstractmethod
+    def watch_processes(self, interval: float = 1, rules: List[KillRule] = None) -> Iterator[ProcessEvent]:
+        """
+        samples get_process_summaries every {interval} seconds and yields changes: new and finished queries,
+        changed memory_usage / read_rows / written_rows. Queries which exceed any of {rules} are killed once:
+        'killed' event. Infinite: stop iteration to stop watching
+        """
+
+    @abc.abstractmethod
+    def get_pending_mutations(self, table: str, db: str = '', partition_id: str = '') -> List[Mutation]:
+        """
+        system.mutations which are not done. {partition_id} - mutations with remaining parts of the partition
+        see: https://clickhouse.com/docs/en/operations/system-tables/mutations
+        """
+
+    @abc.abstractmethod
+    def get_merges(self, table: str, db: str = '', partition_id: str = '') -> List[Merge]:
+        """
+        system.merges of {table}. Empty {partition_id} - all partitions
+        see: https://clickhouse.com/docs/en/operations/system-tables/merges
+        """
+
+    @abc.abstractmethod
+    def wait_for_mutations(
+        self,
+        table: str,
+        db: str = '',
+        partition_id: str = '',
+        settings: WaitSettings = None,
+        progress: Callable[[List[Mutation]], None] = None,
+    ) -> None:
+        """
+        blocks until get_pending_mutations is empty. Polls with exponential backoff, see: WaitSettings.
+        {progress} receives pending mutations after each poll.
+        RuntimeError if any mutation reports latest_fail_reason, TimeoutError after WaitSettings.timeout
+        """
+
+    @abc.abstractmethod
+    def wait_for_merges(
+        self,
+        table: str,
+        db: str = '',
+        partition_id: str = '',
+        settings: WaitSettings = None,
+        progress: Callable[[List[Merge]], None] = None,
+    ) -> None:
+        """
+        blocks until get_merges is empty. Polls with exponential backoff, see: WaitSettings.
+        {progress} receives running merges after each poll. TimeoutError after WaitSettings.timeout
+        """
+
+    @abc.abstractmethod
+    def get_ddl_queue(self, log_comments: List[str] = None) -> List[DdlQueue]:
+        """
+        system.distributed_ddl_queue: status per host of ON CLUSTER commands tagged by {log_comments}.
+        None - ddl_tasks
+        see: https://clickhouse.com/docs/en/operations/system-tables/distributed_ddl_queue
+        """
+
+    @abc.abstractmethod
+    def wait_for_ddl(
+        self,
+        settings: WaitSettings = None,
+        progress: Callable[[List[DdlQueue]], None] = None,
+    ) -> None:
+        """
+        blocks until all ddl_tasks are in distributed_ddl_queue and finished on all hosts, ddl_tasks are cleared.
+        Polls with exponential backoff, see: WaitSettings. {progress} receives unfinished host statuses after each
+        poll, status of a task which is not in the queue yet is Unknown.
+        RuntimeError if any host reports exception_code, TimeoutError after WaitSettings.timeout
+        """
+
+    @abc.abstractmethod
+    def get_disks(self, fields: List[str] = None) -> List[Disk]:
         """
         system.disks
+        {fields} - projection. Fields which are not selected are None
         see: https://clickhouse.com/docs/en/operations/system-tables/disks
         """
 
     @abc.abstractmethod
-    def get_table_columns(self, table: str, db: str = '') -> List[Column]:
+    def get_storage_volumes(self, policy: str = '') -> List[Volume]:
+        """
+        system.storage_policies: volumes of all policies or of {policy}, ordered by volume_priority
+        see: https://clickhouse.com/docs/en/operations/system-tables/storage_policies
+        """
+
+    @abc.abstractmethod
+    def get_partition_disks(self, table: str, db: str = '') -> List[PartitionDisk]:
+        """
+        system.parts: size and newest date of active parts of each partition per disk
+        """
+
+    @abc.abstractmethod
+    def get_table_columns(self, table: str, db: str = '', fields: List[str] = None) -> List[Column]:
         """
         system.columns
+        {fields} - projection. Fields which are not selected are None
+        https://clickhouse.com/docs/en/operations/system-tables/columns
+        """
+
+    @abc.abstractmethod
+    def iter_table_columns(self, table: str, db: str = '', fields: List[str] = None) -> Iterator[Column]:
+        """
+        streaming version of get_table_columns
+        """
+
+    @abc.abstractmethod
+    def get_column_summaries(self, table: str, db: str = '') -> List[ColumnSummary]:
+        """
+        system.columns: name, type, codec and sizes
         https://clickhouse.com/docs/en/operations/system-tables/columns
         """
 
@@ -188,10 +537,47 @@ class ClickhouseProtocol(Protocol, metaclass=abc.ABCMeta):
         INSERT INTO db1.table1 SELECT * FROM db2.table2
         """
 
+    @abc.abstractmethod
+    def insert_from_table_by_partitions(
+        self,
+        from_table: Table,
+        to_table: Table,
+        checkpoint: CheckpointSettings = None,
+        settings: BulkSettings = None,
+        replace: bool = False,
+    ) -> List[BulkResult]:
+        """
+        INSERT INTO db1.table1 SELECT * FROM db2.table2 WHERE _partition_id = '{partition_id}'
+        for each active partition of {from_table}. Partitions are copied in worker pool, see: BulkSettings.
+        Completed partitions are stored in {checkpoint}: rerun copies only remaining partitions.
+        Rows are appended: failed partitions can be copied partially, drop them in {to_table} before rerun.
+        {replace} - each partition of {to_table} is dropped before copy (DROP PARTITION ID): retries and reruns
+        don't duplicate rows, existing rows of copied partitions are removed. Partition keys of both tables
+        must be the same: ValueError
+        """
+
     @abc.abstractmethod
     def truncate(self, table: str, db: str = '') -> None:
         pass
 
+    @abc.abstractmethod
+    def rebuild_table(self, table: Table, load: Callable[[Table], Any], expected_rows: int = None) -> Table:
+        """
+        reloads {table} without empty / partial reads:
+            CREATE TABLE {table}_shadow_{uuid} AS {table}
+            {load}({table}_shadow_{uuid}) - e.g. insert_from_s3, insert_from_table_by_partitions
+            EXCHANGE TABLES {table} AND {table}_shadow_{uuid}
+            DROP TABLE {table}_shadow_{uuid}
+        Shadow table is dropped without exchange when {load} raises, returns failed BulkResult or
+        count() != {expected_rows}: RuntimeError. ON CLUSTER mode is supported, see: set_on_cluster
+        """
+
+    @abc.abstractmethod
+    def rebuild_table_from_table(self, from_table: Table, table: Table, settings: BulkSettings = None) -> Table:
+        """
+        rebuild_table loaded by insert_from_table_by_partitions. Expected rows - count() of {from_table}
+        """
+
     @abc.abstractmethod
     def insert_from_s3(self, table: Table, s3_settings: S3Settings, s3_select_settings: S3SelectSettings = None):
         """
@@ -200,6 +586,28 @@ class ClickhouseProtocol(Protocol, metaclass=abc.ABCMeta):
         see: https://clickhouse.com/docs/en/integrations/s3#inserting-data-from-s3
         """
 
+    @abc.abstractmethod
+    def insert_from_s3_files(
+        self,
+        table: Table,
+        s3_settings: S3Settings,
+        urls: List[str] = None,
+        s3_select_settings: S3SelectSettings = None,
+        files_per_insert: int = 100,
+        ledger_table: str = '',
+        settings: BulkSettings = None,
+    ) -> List[BulkResult]:
+        """
+        INSERT INTO db1.table1 SELECT ... FROM s3({url1}) UNION ALL SELECT ... FROM s3({url2}) ...
+        for groups of {files_per_insert} files in worker pool, see: BulkSettings. Column mapping is built once.
+        {urls} - urls or globs. Default: {s3_settings.url}. Globs are expanded to files before INSERT.
+        {ledger_table} - db.table of loaded files: url, size, etag, batch, batch_rows. Created if not exists.
+            Rerun skips files which are loaded with the same size and etag. INSERT of group has
+            insert_deduplication_token of its files: retry after a failed ledger write doesn't duplicate rows
+            of replicated tables and of tables with non_replicated_deduplication_window setting.
+        BulkResult.key is the first url of group, BulkResult.value - written rows
+        """
+
     @abc.abstractmethod
     def insert_table_to_s3(self, table: Table, s3_settings: S3Settings):
         """
@@ -208,6 +616,25 @@ class ClickhouseProtocol(Protocol, metaclass=abc.ABCMeta):
         see: https://clickhouse.com/docs/en/integrations/s3#exporting-data
         """
 
+    @abc.abstractmethod
+    def insert_table_to_s3_by_partitions(
+        self,
+        table: Table,
+        s3_settings: S3Settings,
+        manifest_url: str = '',
+        partition_ids: List[str] = None,
+        settings: BulkSettings = None,
+    ) -> List[BulkResult]:
+        """
+        INSERT INTO FUNCTION s3(...) SELECT * FROM {db}.{table} WHERE _partition_id = '{partition_id}'
+        for each active partition in worker pool, see: BulkSettings. {s3_settings.url} is a template which must
+        contain {partition_id}: one object per partition. BulkResult.value of exported partition is S3Manifest.
+        {manifest_url} - optional JSONEachRow manifest of exported objects: url, partition_id, rows, bytes.
+        {partition_ids} - partitions to export. Default: all. Re-export of failed partitions:
+            [result.key for result in results if not result.success]
+        Existing objects are not overwritten by default, see: s3_truncate_on_insert setting
+        """
+
     @abc.abstractmethod
     def rename_table(self, table: Table, new_name: str, db: str = '') -> None:
         """
@@ -227,6 +654,159 @@ class ClickhouseProtocol(Protocol, metaclass=abc.ABCMeta):
         https://clickhouse.com/docs/en/integrations/s3#s3-table-functions
         """
 
+    @abc.abstractmethod
+    def insert_from_remote_by_partitions(
+        self,
+        settings: RemoteSettings,
+        table: str,
+        db: str = '',
+        create_table: bool = False,
+        checkpoint: CheckpointSettings = None,
+        bulk_settings: BulkSettings = None,
+    ) -> List[BulkResult]:
+        """
+        insert_from_remote split by active partitions of remote table, see: get_remote_table_partitions.
+        Partitions are copied in worker pool, see: BulkSettings. For each partition:
+            ALTER TABLE {db}.{table} DROP PARTITION ID '{partition_id}'
+            INSERT INTO {db}.{table} SELECT * FROM remote(...) WHERE _partition_id = '{partition_id}'
+        Copied rows are compared with rows of remote partition: RuntimeError on mismatch, retried by BulkSettings.
+        Completed partitions are stored in {checkpoint}: rerun copies only remaining partitions.
+        BulkResult.value - copied rows
+        """
+
+    @abc.abstractmethod
+    def insert_from_remote_snapshot(
+        self,
+        settings: RemoteSettings,
+        snapshot: MetadataSnapshot,
+        db: str = '',
+        create_tables: bool = True,
+        checkpoint: CheckpointSettings = None,
+        bulk_settings: BulkSettings = None,
+    ) -> List[BulkResult]:
+        """
+        copies tables of remote database {settings.db} to {db} without remote metadata requests,
+        see: get_remote_metadata_snapshot. {create_tables} - CREATE TABLE IF NOT EXISTS by create_table_query of
+        {snapshot}, views are created after tables: references to tables of {settings.db} in view queries are
+        replaced by {db}. Partitions of all tables are copied in one worker pool like insert_from_remote_by_partitions.
+        BulkResult.key - {table}/{partition_id}
+        """
+
+    @abc.abstractmethod
+    def sync_table(
+        self,
+        from_table: Table,
+        to_table: Table,
+        compare_hash: bool = False,
+        settings: BulkSettings = None,
+    ) -> List[BulkResult]:
+        """
+        copies changed partitions only. Active partitions are compared by rows and data_uncompressed_bytes,
+        {compare_hash} - and by sum(cityHash64(*)) of partitions with equal sizes (reads both tables).
+        Changed partitions: ALTER TABLE {to_table} REPLACE PARTITION ... FROM {from_table},
+        partitions which are not in {from_table} are dropped. Partitions are synced in worker pool, see: BulkSettings.
+        BulkResult.key - partition_id, BulkResult.value - 'copy' or 'drop'
+        """
+
+    @abc.abstractmethod
+    def sync_table_from_remote(
+        self,
+        remote_settings: RemoteSettings,
+        to_table: Table,
+        compare_hash: bool = False,
+        settings: BulkSettings = None,
+    ) -> List[BulkResult]:
+        """
+        sync_table from remote table: changed partition is dropped in {to_table} and copied by
+        INSERT INTO {to_table} SELECT * FROM remote(...) WHERE _partition_id = '{partition_id}'.
+        Partition is not available in {to_table} while it is copied, failed partitions are copied partially
+        """
+
+    @abc.abstractmethod
+    def plan_partition_moves(self, tables: List[Table], rules: List[TierRule]) -> List[PartitionMove]:
+        """
+        partitions of {tables} which must be moved to volume / disk of TierRule. Nothing is moved, see:
+        move_partitions_to_storage. Partition is planned by the first matching rule, oldest partitions first.
+        max_disk_usage takes into account moves planned before: all parts of moved partition leave their disks,
+        bytes moved to a volume are spread across its disks. PartitionMove.bytes_on_disk - bytes of the partition
+        on all disks out of target. ValueError if target of a rule is not in storage_policy of a table
+        """
+
+    @abc.abstractmethod
+    def move_partitions_to_storage(
+        self,
+        moves: List[PartitionMove],
+        max_bytes_per_second: float = None,
+        settings: BulkSettings = None,
+    ) -> List[BulkResult]:
+        """
+        ALTER TABLE ... MOVE PARTITION ID ... TO DISK / VOLUME ... per move in worker pool, see: BulkSettings.
+        {max_bytes_per_second} - byte budget: a move starts when the budget since the first move covers
+        its bytes_on_disk and bytes of moves started before.
+        BulkResult.key - PartitionMove.key, BulkResult.value - bytes_on_disk
+        """
+
+    @abc.abstractmethod
+    def advise_codecs(
+        self,
+        table: Table,
+        sample_rows: int = 100_000,
+        codecs: List[str] = None,
+        columns: List[str] = None,
+    ) -> List[CodecAdvice]:
+        """
+        compresses {sample_rows} of {table} with each of {codecs} (default: CODECS of codec_service) in scratch
+        MergeTree tables built by create_table_as: {table}_codec_sample, {table}_codec_N, dropped after use.
+        Sample - SAMPLE by sampling key, WHERE rand() % N = 0 without it.
+        Compressed size, read and insert time are measured per column.
+        Specialized codecs (Delta, DoubleDelta, Gorilla, T64) are tried on compatible types only.
+        {columns} - all stored columns by default. CodecAdvice.alter is empty if current codec is the best
+        """
+
+    @abc.abstractmethod
+    def plan_merges(self, table: Table, settings: MergeScheduleSettings = None) -> List[MergeCandidate]:
+        """
+        partitions of {table} with at least MergeScheduleSettings.min_parts active parts.
+        Ranked by number of parts (desc), then by bytes_on_disk
+        """
+
+    @abc.abstractmethod
+    def optimize_partitions(
+        self,
+        table: Table,
+        settings: MergeScheduleSettings = None,
+        bulk_settings: BulkSettings = None,
+    ) -> List[BulkResult]:
+        """
+        OPTIMIZE TABLE {table} PARTITION ID ... [FINAL] for plan_merges in worker pool, see: BulkSettings.
+        Before each partition the load of the server is checked (max_queries / max_merges): the first busy check
+        stops the schedule, this and remaining partitions get BulkResult.error 'skipped: server busy' with 0 attempts.
+        RuntimeError if a disk of the partition has not enough free space. Errors are not raised,
+        see: BulkResult.error, BulkSettings.retries with retry_delay.
+        BulkResult.key - partition_id, BulkResult.value - bytes_on_disk
+        """
+
+    @abc.abstractmethod
+    def get_expired_partitions(self, table: Table, policy: RetentionPolicy) -> List[Partition]:
+        """
+        active partitions of {table} which are older than RetentionPolicy.keep_days / keep_months.
+        Partitions without date in partition key are never expired, see: RetentionPolicy.by.
+        ValueError if policy is invalid
+        """
+
+    @abc.abstractmethod
+    def drop_expired_partitions(
+        self,
+        table: Table,
+        policy: RetentionPolicy,
+        settings: BulkSettings = None,
+    ) -> List[BulkResult]:
+        """
+        drops get_expired_partitions by batches of RetentionPolicy.batch_size: one
+        ALTER TABLE ... DROP PARTITION ID 'a', DROP PARTITION ID 'b', ... per batch, batches in worker pool.
+        BulkResult.key - first..last partition_id of batch, BulkResult.value - partition_ids of batch
+        """
+
     @abc.abstractmethod
     def create_distributed_table(
         self,
@@ -242,3 +822,21 @@ class ClickhouseProtocol(Protocol, metaclass=abc.ABCMeta):
         CREATE TABLE {create_table} ON CLUSTER ripley
         ENGINE = Distributed({cluster}, {table}, {table}, {sharding_key})
         """
+
+
+class ClickhousePlanProtocol(ClickhouseProtocol, metaclass=abc.ABCMeta):
+    @property
+    def steps(self) -> List[PlanStep]:
+        """
+        recorded commands with dependency levels. A step depends on previous steps which write the tables it
+        reads or writes, or read the tables it writes. Steps without known tables (exec) depend on all previous
+        """
+
+    @abc.abstractmethod
+    def execute(self, settings: BulkSettings = None) -> List[BulkResult]:
+        """
+        executes steps level by level. Steps of the same level are executed in worker pool, see: BulkSettings.
+        ON CLUSTER steps are executed one by one after local steps of the level. Consecutive ON CLUSTER ALTERs of
+        the same table are executed by one statement (one DDL queue entry), result of it is reported for each step.
+        Next levels are skipped if a step fails. Result per step, BulkResult.key is step index
+        """
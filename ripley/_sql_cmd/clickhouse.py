@@ -1,16 +1,27 @@
-from typing import List
+from typing import List, Tuple
 
 from .._sql_cmd.general import (
     BaseAlter,
+    BaseTable,
     BaseTruncate,
     BaseCreateDb,
+    BaseDropTable,
+    BaseExchangeTables,
     BaseRenameTable,
     AbstractSql,
     BaseCreateTable,
+    BaseInsertIntoTableFromTable,
+    split_full_name,
 )
+from ..clickhouse_models.remote_settings import ClickhouseRemoteSettingsModel
+from ..clickhouse_models.s3_manifest import ClickhouseS3ManifestModel
 from ..clickhouse_models.s3_settings import ClickhouseS3SettingsModel
 
 
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace("'", "\\'")
+
+
 class CreateDbOnCluster(BaseCreateDb):
     def __init__(self, name: str, on_cluster: str = '', engine: str = ''):
         super().__init__(name)
@@ -34,7 +45,7 @@ class RenameTableOnCluster(BaseRenameTable):
         return f"{cmd} ON CLUSTER '{self._on_cluster}'" if self._on_cluster else cmd
 
 
-class AlterOnClusterCmd(BaseAlter):
+class DropTableOnClusterCmd(BaseDropTable):
     def __init__(self, table_name: str, on_cluster: str = ''):
         super().__init__(table_name)
         self._on_cluster = on_cluster
@@ -44,14 +55,43 @@ class AlterOnClusterCmd(BaseAlter):
         return f"{cmd} ON CLUSTER '{self._on_cluster}'" if self._on_cluster else cmd
 
 
+class ExchangeTablesOnClusterCmd(BaseExchangeTables):
+    def __init__(self, table: str, other_table: str, on_cluster: str = ''):
+        super().__init__(table, other_table)
+        self._on_cluster = on_cluster
+
+    def to_sql(self) -> str:
+        cmd = super().to_sql()
+        return f"{cmd} ON CLUSTER '{self._on_cluster}'" if self._on_cluster else cmd
+
+
+class AlterOnClusterCmd(BaseAlter):
+    def __init__(self, table_name: str, on_cluster: str = ''):
+        super().__init__(table_name)
+        self._on_cluster = on_cluster
+
+    @property
+    def action(self) -> str:
+        """
+        action of the statement without ALTER TABLE ... ON CLUSTER. see: AlterActionsCmd
+        """
+        return ''
+
+    def to_sql(self) -> str:
+        cmd = super().to_sql()
+        cmd = f"{cmd} ON CLUSTER '{self._on_cluster}'" if self._on_cluster else cmd
+        action = self.action
+        return f'{cmd} {action}' if action else cmd
+
+
 class DetachPartitionOnClusterCmd(AlterOnClusterCmd):
     def __init__(self, table_name, partition: str, on_cluster: str = ''):
         super().__init__(table_name, on_cluster)
         self._partition = partition
 
-    def to_sql(self) -> str:
-        cmd = super().to_sql()
-        return f"{cmd} DETACH PARTITION '{self._partition}'"
+    @property
+    def action(self) -> str:
+        return f"DETACH PARTITION '{self._partition}'"
 
 
 class AttachPartitionOnClusterCmd(AlterOnClusterCmd):
@@ -59,9 +99,9 @@ class AttachPartitionOnClusterCmd(AlterOnClusterCmd):
         super().__init__(table_name, on_cluster)
         self._partition = partition
 
-    def to_sql(self) -> str:
-        cmd = super().to_sql()
-        return f"{cmd} ATTACH PARTITION '{self._partition}'"
+    @property
+    def action(self) -> str:
+        return f"ATTACH PARTITION '{self._partition}'"
 
 
 class DropPartitionOnClusterCmd(AlterOnClusterCmd):
@@ -69,9 +109,19 @@ class DropPartitionOnClusterCmd(AlterOnClusterCmd):
         super().__init__(table_name, on_cluster)
         self._partition = partition
 
-    def to_sql(self) -> str:
-        cmd = super().to_sql()
-        return f"{cmd} DROP PARTITION '{self._partition}'"
+    @property
+    def action(self) -> str:
+        return f"DROP PARTITION '{self._partition}'"
+
+
+class DropPartitionIdCmd(AlterOnClusterCmd):
+    def __init__(self, table_name: str, partition_id: str, on_cluster: str = ''):
+        super().__init__(table_name, on_cluster)
+        self._partition_id = partition_id
+
+    @property
+    def action(self) -> str:
+        return f"DROP PARTITION ID '{self._partition_id}'"
 
 
 class MovePartitionOnClusterCmd(AlterOnClusterCmd):
@@ -80,9 +130,36 @@ class MovePartitionOnClusterCmd(AlterOnClusterCmd):
         self._to_table_name = to_table_name
         self._partition = partition
 
-    def to_sql(self) -> str:
-        cmd = super().to_sql()
-        return f"{cmd} MOVE PARTITION '{self._partition}' TO TABLE {self._to_table_name}"
+    @property
+    def action(self) -> str:
+        return f"MOVE PARTITION '{self._partition}' TO TABLE {self._to_table_name}"
+
+    @property
+    def affected_tables(self) -> List[Tuple[str, str]]:
+        return [*super().affected_tables, split_full_name(self._to_table_name)]
+
+
+class MovePartitionToStorageCmd(AlterOnClusterCmd):
+    def __init__(self, table_name: str, partition_id: str, to_type: str, to_name: str, on_cluster: str = ''):
+        super().__init__(table_name, on_cluster)
+        self._partition_id = partition_id
+        self._to_type = to_type
+        self._to_name = to_name
+
+    @property
+    def action(self) -> str:
+        return f"MOVE PARTITION ID '{self._partition_id}' TO {self._to_type} '{self._to_name}'"
+
+
+class ModifyColumnCodecCmd(AlterOnClusterCmd):
+    def __init__(self, table_name: str, column: str, codec: str, on_cluster: str = ''):
+        super().__init__(table_name, on_cluster)
+        self._column = column
+        self._codec = codec
+
+    @property
+    def action(self) -> str:
+        return f'MODIFY COLUMN `{self._column}` CODEC({self._codec})'
 
 
 class ReplacePartitionOnClusterCmd(AlterOnClusterCmd):
@@ -91,9 +168,102 @@ class ReplacePartitionOnClusterCmd(AlterOnClusterCmd):
         self._from_table_name = from_table_name
         self._partition = partition
 
+    @property
+    def action(self) -> str:
+        return f"REPLACE PARTITION '{self._partition}' FROM {self._from_table_name}"
+
+    @property
+    def source_tables(self) -> List[Tuple[str, str]]:
+        return [split_full_name(self._from_table_name)]
+
+
+class ReplacePartitionIdCmd(AlterOnClusterCmd):
+    def __init__(self, table_name: str, partition_id: str, from_table_name: str, on_cluster: str = ''):
+        super().__init__(table_name, on_cluster)
+        self._from_table_name = from_table_name
+        self._partition_id = partition_id
+
+    @property
+    def action(self) -> str:
+        return f"REPLACE PARTITION ID '{self._partition_id}' FROM {self._from_table_name}"
+
+    @property
+    def source_tables(self) -> List[Tuple[str, str]]:
+        return [split_full_name(self._from_table_name)]
+
+
+class AlterActionsCmd(AlterOnClusterCmd):
+    """
+    actions of several ALTER commands of one table by one statement: one DDL entry in ON CLUSTER queue.
+    ALTER TABLE db.table ON CLUSTER 'cluster' DROP PARTITION ID 'a', DETACH PARTITION 'b', ...
+    """
+
+    def __init__(self, table_name: str, actions: List[AlterOnClusterCmd] = None, on_cluster: str = ''):
+        super().__init__(table_name, on_cluster)
+        self._actions = []
+        for action in actions or []:
+            self.add(action)
+
+    @property
+    def actions(self) -> List[AlterOnClusterCmd]:
+        return list(self._actions)
+
+    def add(self, action: AlterOnClusterCmd) -> 'AlterActionsCmd':
+        if action._table_name != self._table_name:
+            raise ValueError(f'action of {action._table_name} can not be added to ALTER TABLE {self._table_name}')
+
+        self._actions.append(action)
+        return self
+
+    @property
+    def action(self) -> str:
+        return ', '.join(action.action for action in self._actions)
+
+    @property
+    def affected_tables(self) -> List[Tuple[str, str]]:
+        tables = super().affected_tables
+        for action in self._actions:
+            tables.extend(table for table in action.affected_tables if table not in tables)
+        return tables
+
+    @property
+    def source_tables(self) -> List[Tuple[str, str]]:
+        tables = []
+        for action in self._actions:
+            tables.extend(table for table in action.source_tables if table not in tables)
+        return tables
+
+    def split(self, max_actions: int = None, max_length: int = 256_000) -> List['AlterActionsCmd']:
+        """
+        statements of at most {max_actions} actions and {max_length} characters of actions, in order.
+        Default {max_length} is below default max_query_size of server (262144)
+        """
+        batches = []
+        length = 0
+        for action in self._actions:
+            size = len(action.action) + 2
+            if not batches or len(batches[-1]._actions) == max_actions or length + size > max_length:
+                batches.append(AlterActionsCmd(self._table_name, on_cluster=self._on_cluster))
+                length = 0
+
+            batches[-1]._actions.append(action)
+            length += size
+
+        return batches
+
+
+class OptimizePartitionCmd(BaseTable):
+    def __init__(self, table_name: str, partition_id: str, final: bool = False, on_cluster: str = ''):
+        super().__init__(table_name)
+        self._partition_id = partition_id
+        self._final = final
+        self._on_cluster = on_cluster
+
     def to_sql(self) -> str:
-        cmd = super().to_sql()
-        return f"{cmd} REPLACE PARTITION '{self._partition}' FROM {self._from_table_name}"
+        cmd = f'OPTIMIZE {super().to_sql()}'
+        on_cluster = f" ON CLUSTER '{self._on_cluster}'" if self._on_cluster else ''
+        final = ' FINAL' if self._final else ''
+        return f"{cmd}{on_cluster} PARTITION ID '{self._partition_id}'{final}"
 
 
 class TruncateOnClusterCmd(BaseTruncate):
@@ -108,9 +278,10 @@ class TruncateOnClusterCmd(BaseTruncate):
 
 
 class InsertIntoS3Cmd(AbstractSql):
-    def __init__(self, table_name: str, s3_settings: ClickhouseS3SettingsModel):
+    def __init__(self, table_name: str, s3_settings: ClickhouseS3SettingsModel, partition_id: str = ''):
         self._s3_settings = s3_settings
         self._table_name = table_name
+        self._partition_id = partition_id
 
     def __repr__(self):
         return self._get_s3_cmd()
@@ -120,44 +291,145 @@ class InsertIntoS3Cmd(AbstractSql):
         file_format = self._s3_settings.file_format
         compression = self._s3_settings.compression_method
         s3_cmd = f"""s3('{url}', '{key_id}', '{secret}', '{file_format}', '{compression}')"""
+        cmd = f'INSERT INTO FUNCTION {s3_cmd} SELECT * FROM {self._table_name}'
+        if self._partition_id:
+            cmd = f"{cmd} WHERE _partition_id = '{self._partition_id}'"
 
-        return f'INSERT INTO FUNCTION {s3_cmd} SELECT * FROM {self._table_name}'
+        return cmd
 
     def to_sql(self) -> str:
         return self._get_s3_cmd(self._s3_settings.access_key_id, self._s3_settings.secret_access_key)
 
+    @property
+    def source_tables(self) -> List[Tuple[str, str]]:
+        return [split_full_name(self._table_name)]
+
+
+class S3ObjectSizeCmd(AbstractSql):
+    def __init__(self, s3_settings: ClickhouseS3SettingsModel):
+        self._s3_settings = s3_settings
+
+    def __repr__(self):
+        return self._get_s3_cmd()
+
+    def _get_s3_cmd(self, key_id: str = '*', secret: str = '*') -> str:
+        return f"SELECT _size FROM s3('{self._s3_settings.url}', '{key_id}', '{secret}', 'One')"
+
+    def to_sql(self) -> str:
+        return self._get_s3_cmd(self._s3_settings.access_key_id, self._s3_settings.secret_access_key)
 
-class InsertFromS3Cmd(AbstractSql):
+    @property
+    def readonly(self) -> bool:
+        return True
+
+
+class InsertS3ManifestCmd(AbstractSql):
+    """
+    writes manifest as JSONEachRow: {"url": "...", "partition_id": "...", "rows": 1, "bytes": 1}
+    """
+    _structure = 'url String, partition_id String, rows UInt64, bytes UInt64'
+
+    def __init__(self, s3_settings: ClickhouseS3SettingsModel, items: List[ClickhouseS3ManifestModel]):
+        self._s3_settings = s3_settings
+        self._items = items
+
+    def __repr__(self):
+        return self._get_s3_cmd()
+
+    def _get_s3_cmd(self, key_id: str = '*', secret: str = '*') -> str:
+        url = self._s3_settings.url
+        compression = self._s3_settings.compression_method
+        s3_cmd = f"s3('{url}', '{key_id}', '{secret}', 'JSONEachRow', '{self._structure}', '{compression}')"
+        values = ', '.join(
+            f"('{_escape(i.url)}', '{_escape(i.partition_id)}', {i.rows}, {i.bytes})" for i in self._items
+        )
+
+        return f"INSERT INTO FUNCTION {s3_cmd} SELECT * FROM values('{self._structure}', {values})"
+
+    def to_sql(self) -> str:
+        return self._get_s3_cmd(self._s3_settings.access_key_id, self._s3_settings.secret_access_key)
+
+
+class S3ListCmd(AbstractSql):
+    """
+    lists S3 objects without reading them: pattern, _path, _size, _etag for each url. Url can be glob
+    """
+    def __init__(self, s3_settings: ClickhouseS3SettingsModel, urls: List[str]):
+        self._s3_settings = s3_settings
+        self._urls = urls
+
+    def __repr__(self):
+        return self._get_s3_cmd()
+
+    def _get_s3_cmd(self, key_id: str = '*', secret: str = '*') -> str:
+        return ' UNION ALL '.join(
+            f"SELECT '{url}' AS pattern, _path, _size, _etag FROM s3('{url}', '{key_id}', '{secret}', 'One')"
+            for url in self._urls
+        )
+
+    def to_sql(self) -> str:
+        return self._get_s3_cmd(self._s3_settings.access_key_id, self._s3_settings.secret_access_key)
+
+    @property
+    def readonly(self) -> bool:
+        return True
+
+
+class InsertFromS3FilesCmd(AbstractSql):
+    """
+    INSERT INTO {table} SELECT ... FROM s3({url1}) UNION ALL SELECT ... FROM s3({url2}) ...
+    {deduplication_token} - insert_deduplication_token: repeated INSERT of the same files is deduplicated
+    """
     def __init__(
         self,
         table_name: str,
         s3_settings: ClickhouseS3SettingsModel,
-        fields: List[str],
         field_types: List[str],
+        selects: List[Tuple[str, List[str]]],
+        deduplication_token: str = '',
     ):
         self._s3_settings = s3_settings
         self._table_name = table_name
-        self._fields = fields
         self._field_types = field_types
+        self._selects = selects
+        self._deduplication_token = deduplication_token
 
     def __repr__(self):
         return self._get_s3_cmd()
 
     def _get_s3_cmd(self, key_id: str = '*', secret: str = '*') -> str:
-        url = self._s3_settings.url
         file_format = self._s3_settings.file_format
         compression = self._s3_settings.compression_method
 
-        fields = ', '.join(self._fields)
         field_types = ' || '.join(self._field_types)
         field_types = field_types[:-2] + "'"
-        s3_cmd = f"s3('{url}', '{key_id}', '{secret}', '{file_format}', {field_types}, '{compression}')"
+        selects = []
+        for url, fields in self._selects:
+            s3_cmd = f"s3('{url}', '{key_id}', '{secret}', '{file_format}', {field_types}, '{compression}')"
+            selects.append(f'SELECT {", ".join(fields)} FROM {s3_cmd}')
 
-        return f'INSERT INTO {self._table_name} SELECT {fields} FROM {s3_cmd}'
+        settings = f"SETTINGS insert_deduplication_token = '{self._deduplication_token}' " \
+            if self._deduplication_token else ''
+        return f'INSERT INTO {self._table_name} {settings}{" UNION ALL ".join(selects)}'
 
     def to_sql(self) -> str:
         return self._get_s3_cmd(self._s3_settings.access_key_id, self._s3_settings.secret_access_key)
 
+    @property
+    def affected_tables(self) -> List[Tuple[str, str]]:
+        return [split_full_name(self._table_name)]
+
+
+class InsertFromS3Cmd(InsertFromS3FilesCmd):
+    def __init__(
+        self,
+        table_name: str,
+        s3_settings: ClickhouseS3SettingsModel,
+        fields: List[str],
+        field_types: List[str],
+    ):
+        super().__init__(table_name, s3_settings, field_types, [(s3_settings.url, fields)])
+
 
 class CreateTableOnClusterCmd(BaseCreateTable):
     def __init__(self, table_name: str, on_cluster: str = ''):
@@ -193,6 +465,26 @@ class CreateTableAsOnClusterCmd(CreateTableOnClusterCmd):
             {self._partition_by}
             AS {self._from_table}"""
 
+    @property
+    def source_tables(self) -> List[Tuple[str, str]]:
+        return [split_full_name(self._from_table)]
+
+
+class CreateTableLikeOnClusterCmd(CreateTableOnClusterCmd):
+    """
+    CREATE TABLE {table} AS {from_table}: columns, engine with arguments, keys, TTL and settings of {from_table}
+    """
+    def __init__(self, table_name: str, from_table: str, on_cluster: str = ''):
+        super().__init__(table_name, on_cluster)
+        self._from_table = from_table
+
+    def to_sql(self) -> str:
+        return f'{super().to_sql()} AS {self._from_table}'
+
+    @property
+    def source_tables(self) -> List[Tuple[str, str]]:
+        return [split_full_name(self._from_table)]
+
 
 class Remote(AbstractSql):
     def __init__(
@@ -213,6 +505,21 @@ class Remote(AbstractSql):
         self._secure = secure
         self._sharding_key = sharding_key
 
+    @classmethod
+    def from_settings(cls, settings: ClickhouseRemoteSettingsModel, db: str = '', table: str = '') -> 'Remote':
+        """
+        remote table of {settings} or another table of the same server: {db}.{table}
+        """
+        return cls(
+            remote_address=settings.address,
+            remote_db=db or settings.db,
+            remote_user=settings.user,
+            remote_password=settings.password,
+            remote_table=table or settings.table,
+            secure=settings.secure,
+            sharding_key='' if table else settings.sharding_key,
+        )
+
     def _get_cmd(self, user: str = '*', password: str = '*'):
         params = [
             f"'{self._remote_address}'",
@@ -248,6 +555,22 @@ class InsertFromRemote(AbstractSql):
     def to_sql(self) -> str:
         return f'INSERT INTO {self._table_name} SELECT * FROM {self._from_remote.to_sql()}'
 
+    @property
+    def affected_tables(self) -> List[Tuple[str, str]]:
+        return [split_full_name(self._table_name)]
+
+
+class InsertFromRemotePartitionCmd(InsertFromRemote):
+    def __init__(self, table_name: str, from_remote: Remote, partition_id: str) -> None:
+        super().__init__(table_name, from_remote)
+        self._partition_id = partition_id
+
+    def __repr__(self):
+        return f"{super().__repr__()} WHERE _partition_id = '{self._partition_id}'"
+
+    def to_sql(self) -> str:
+        return f"{super().to_sql()} WHERE _partition_id = '{self._partition_id}'"
+
 
 class CreateDistributedTable(AbstractSql):
     def __init__(
@@ -270,3 +593,30 @@ class CreateDistributedTable(AbstractSql):
         sharding_key = f', {self._sharding_key}' if self._sharding_key else ''
         return f"""CREATE TABLE {self._create_table} ON CLUSTER {self._on_cluster}
             ENGINE = Distributed({self._cluster}, {self._database}, {self._table}{sharding_key})"""
+
+    @property
+    def affected_tables(self) -> List[Tuple[str, str]]:
+        return [split_full_name(self._create_table)]
+
+    @property
+    def source_tables(self) -> List[Tuple[str, str]]:
+        return [(self._database, self._table)]
+
+
+class InsertFromTablePartitionCmd(BaseInsertIntoTableFromTable):
+    def __init__(self, from_table: str, to_table: str, partition_id: str):
+        super().__init__(from_table, to_table)
+        self._partition_id = partition_id
+
+    def to_sql(self) -> str:
+        return f"{super().to_sql()} WHERE _partition_id = '{self._partition_id}'"
+
+
+class KillQueryCmd(AbstractSql):
+    def __init__(self, query_id: str, on_cluster: str = ''):
+        self._query_id = query_id
+        self._on_cluster = on_cluster
+
+    def to_sql(self) -> str:
+        on_cluster = f" ON CLUSTER '{self._on_cluster}'" if self._on_cluster else ''
+        return f"KILL QUERY{on_cluster} WHERE query_id = '{_escape(self._query_id)}' ASYNC"
@@ -1,3 +1,11 @@
+from typing import List, Tuple
+
+
+def split_full_name(name: str) -> Tuple[str, str]:
+    db, _, table = name.rpartition('.')
+    return db, table
+
+
 class AbstractSql:
     def __repr__(self):
         return self.to_sql().replace('    ', '').replace('\n\n', '\n')
@@ -5,6 +13,32 @@ class AbstractSql:
     def to_sql(self) -> str:
         raise NotImplementedError()
 
+    @property
+    def affected_tables(self) -> List[Tuple[str, str]]:
+        """
+        (database, table) pairs whose metadata can be changed by the command.
+        Empty table name means the whole database
+        """
+        return []
+
+    @property
+    def source_tables(self) -> List[Tuple[str, str]]:
+        """
+        (database, table) pairs which are read by the command
+        """
+        return []
+
+    @property
+    def on_cluster(self) -> str:
+        return getattr(self, '_on_cluster', '')
+
+    @property
+    def readonly(self) -> bool:
+        """
+        command does not change data or metadata
+        """
+        return False
+
 
 class BaseTable(AbstractSql):
     def __init__(self, table_name: str):
@@ -13,6 +47,10 @@ class BaseTable(AbstractSql):
     def to_sql(self) -> str:
         return f'TABLE {self._table_name}'
 
+    @property
+    def affected_tables(self) -> List[Tuple[str, str]]:
+        return [split_full_name(self._table_name)]
+
 
 class BaseTruncate(BaseTable):
     def to_sql(self) -> str:
@@ -32,6 +70,24 @@ class BaseCreateTable(BaseTable):
         return f'CREATE {table}'
 
 
+class BaseDropTable(BaseTable):
+    def to_sql(self) -> str:
+        return f'DROP TABLE IF EXISTS {self._table_name}'
+
+
+class BaseExchangeTables(AbstractSql):
+    def __init__(self, table: str, other_table: str):
+        self._table = table
+        self._other_table = other_table
+
+    def to_sql(self) -> str:
+        return f'EXCHANGE TABLES {self._table} AND {self._other_table}'
+
+    @property
+    def affected_tables(self) -> List[Tuple[str, str]]:
+        return [split_full_name(self._table), split_full_name(self._other_table)]
+
+
 class BaseCreateDb(AbstractSql):
     def __init__(self, name: str):
         self._name = name
@@ -39,6 +95,10 @@ class BaseCreateDb(AbstractSql):
     def to_sql(self) -> str:
         return f'CREATE DATABASE IF NOT EXISTS {self._name}'
 
+    @property
+    def affected_tables(self) -> List[Tuple[str, str]]:
+        return [(self._name, '')]
+
 
 class BaseRenameTable(AbstractSql):
     def __init__(self, table: str, new_name: str):
@@ -48,6 +108,10 @@ class BaseRenameTable(AbstractSql):
     def to_sql(self) -> str:
         return f'RENAME TABLE {self._table} TO {self._new_name}'
 
+    @property
+    def affected_tables(self) -> List[Tuple[str, str]]:
+        return [split_full_name(self._table), split_full_name(self._new_name)]
+
 
 class BaseInsertIntoTableFromTable(AbstractSql):
     def __init__(self, from_table: str, to_table: str):
@@ -56,3 +120,11 @@ class BaseInsertIntoTableFromTable(AbstractSql):
 
     def to_sql(self) -> str:
         return f'INSERT INTO {self._to_table} SELECT * FROM {self._from_table}'
+
+    @property
+    def affected_tables(self) -> List[Tuple[str, str]]:
+        return [split_full_name(self._to_table)]
+
+    @property
+    def source_tables(self) -> List[Tuple[str, str]]:
+        return [split_full_name(self._from_table)]
@@ -0,0 +1,24 @@
+from dataclasses import dataclass
+from typing import Any
+
+from .._base_model import BaseModel, slotted
+
+
+@slotted
+@dataclass
+class ClickhouseBulkResultModel(BaseModel):
+    """
+    result of one item (partition, file, chunk) of bulk operation
+    """
+    key: str
+    attempts: int
+    elapsed: float
+    error: BaseException = None
+    value: Any = None
+    """
+    result of the item. Example: ClickhouseS3ManifestModel of exported partition
+    """
+
+    @property
+    def success(self) -> bool:
+        return self.error is None
@@ -0,0 +1,30 @@
+from dataclasses import dataclass
+
+from .._base_model import BaseModel
+
+
+@dataclass
+class ClickhouseBulkSettingsModel(BaseModel):
+    """
+    settings of bulk operations: move_partitions, drop_partitions, etc.
+    """
+    max_workers: int = 4
+    """
+    number of statements running at the same time
+    """
+
+    retries: int = 0
+    """
+    additional attempts per item after an error
+    """
+
+    retry_delay: float = 1
+    """
+    seconds before the first retry. Doubles with every next attempt
+    """
+
+    batch_size: int = 1
+    """
+    partition operations only: partitions per ALTER TABLE statement, see: AlterActionsCmd.
+    One DDL entry in ON CLUSTER queue per batch. Result and error of a batch are reported for each partition of it
+    """
@@ -0,0 +1,18 @@
+from dataclasses import dataclass
+
+from .._base_model import BaseModel, slotted
+
+
+@slotted
+@dataclass
+class ClickhouseCacheStatsModel(BaseModel):
+    """
+    metadata cache counters. see: ClickhouseProtocol.set_metadata_cache
+    """
+    hits: int
+    misses: int
+    evictions: int
+    invalidations: int
+    size: int
+    max_size: int
+    ttl: float
@@ -0,0 +1,25 @@
+from dataclasses import dataclass
+
+from .._base_model import BaseModel
+
+
+@dataclass
+class ClickhouseCheckpointSettingsModel(BaseModel):
+    """
+    storage of completed chunks (partitions, files) of resumable operations. Rerun skips completed chunks.
+    One of file_path / table is required
+    """
+    name: str
+    """
+    job identifier. Chunks are tracked per name
+    """
+
+    file_path: str = ''
+    """
+    local file. Line format: {name}\\t{chunk}
+    """
+
+    table: str = ''
+    """
+    clickhouse table: db.table. Created if not exists
+    """
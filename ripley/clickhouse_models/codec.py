@@ -0,0 +1,58 @@
+from dataclasses import dataclass, field
+from typing import List
+
+from .._base_model import BaseModel, slotted
+
+
+@slotted
+@dataclass
+class ClickhouseCodecCandidateModel(BaseModel):
+    """
+    column of sample table compressed by {codec}
+    """
+    codec: str
+    """
+    codec expression without CODEC(). Example: Delta, ZSTD(1)
+    """
+
+    data_compressed_bytes: int
+    data_uncompressed_bytes: int
+    read_elapsed: float
+    """
+    seconds, best of several full scans of the column
+    """
+
+    insert_elapsed: float
+    """
+    seconds, INSERT of the column of sample into empty table with {codec}: other columns get defaults
+    """
+
+    @property
+    def ratio(self) -> float:
+        return self.data_uncompressed_bytes / self.data_compressed_bytes if self.data_compressed_bytes else 0
+
+
+@dataclass
+class ClickhouseCodecAdviceModel(BaseModel):
+    database: str
+    table: str
+    column: str
+    type: str
+    current_codec: str
+    """
+    codec expression of the column, Default if not set
+    """
+
+    candidates: List[ClickhouseCodecCandidateModel] = field(default_factory=list)
+    """
+    ranked by data_compressed_bytes, then by read_elapsed
+    """
+
+    alter: str = ''
+    """
+    ALTER TABLE ... MODIFY COLUMN ... CODEC(...) of the best candidate, empty if current codec is the best
+    """
+
+    @property
+    def best(self) -> ClickhouseCodecCandidateModel:
+        return self.candidates[0]
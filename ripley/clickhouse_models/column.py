@@ -1,9 +1,10 @@
 from dataclasses import dataclass
 from typing import Union
 
-from .._base_model import BaseModel
+from .._base_model import BaseModel, slotted
 
 
+@slotted
 @dataclass
 class ClickhouseColumnModel(BaseModel):
     database: str
@@ -31,3 +32,19 @@ class ClickhouseColumnModel(BaseModel):
     numeric_precision: Union[int, None]
     serialization_hint: str = None
 
+
+@slotted
+@dataclass
+class ClickhouseColumnSummaryModel(BaseModel):
+    """
+    lightweight projection of system.columns
+    """
+    database: str
+    table: str
+    name: str
+    type: str
+    compression_codec: str
+
+    position: int
+    data_compressed_bytes: int
+    data_uncompressed_bytes: int
@@ -1,9 +1,10 @@
 from dataclasses import dataclass
 from uuid import UUID
 
-from .._base_model import BaseModel
+from .._base_model import BaseModel, slotted
 
 
+@slotted
 @dataclass
 class ClickhouseDbModel(BaseModel):
     name: str
@@ -0,0 +1,32 @@
+from dataclasses import dataclass
+from datetime import datetime
+
+from .._base_model import BaseModel, slotted
+
+
+@slotted
+@dataclass
+class ClickhouseDdlQueueModel(BaseModel):
+    """
+    status of ON CLUSTER DDL entry on one host
+    """
+    entry: str
+    cluster: str
+    query: str
+    host: str
+    status: str
+    """
+    Inactive, Active, Finished, Removing, Unknown
+    """
+
+    exception_text: str
+    log_comment: str
+    """
+    log_comment setting of the query. Async ON CLUSTER commands are tagged by it, see: set_async_ddl
+    """
+
+    port: int
+    exception_code: int
+    query_duration_ms: int
+    query_create_time: datetime
+    query_finish_time: datetime
@@ -1,8 +1,9 @@
 from dataclasses import dataclass
 
-from .._base_model import BaseModel
+from .._base_model import BaseModel, slotted
 
 
+@slotted
 @dataclass
 class ClickhouseDiskModel(BaseModel):
     name: str
@@ -0,0 +1,22 @@
+from dataclasses import dataclass
+
+from .._base_model import BaseModel, slotted
+
+
+@slotted
+@dataclass
+class ClickhouseMergeModel(BaseModel):
+    database: str
+    table: str
+    partition_id: str
+    result_part_name: str
+
+    num_parts: int
+    is_mutation: int
+    total_size_bytes_compressed: int
+    rows_read: int
+    rows_written: int
+    memory_usage: int
+
+    elapsed: float
+    progress: float
@@ -0,0 +1,58 @@
+from dataclasses import dataclass
+from typing import List
+
+from .._base_model import BaseModel, slotted
+
+
+@dataclass
+class ClickhouseMergeScheduleSettingsModel(BaseModel):
+    """
+    see: ClickhouseProtocol.optimize_partitions
+    """
+    min_parts: int = 2
+    """
+    partitions with less active parts are not optimized
+    """
+
+    max_partitions: int = None
+    """
+    top N partitions by number of parts. None - all
+    """
+
+    final: bool = False
+    """
+    OPTIMIZE ... FINAL: merges partition into one part even if it is already merged by background merges
+    """
+
+    free_space_ratio: float = 1
+    """
+    each disk of partition must have free_space - keep_free_space >= bytes_on_disk * ratio
+    (minus partitions being optimized at the moment)
+    """
+
+    max_queries: int = None
+    """
+    server is busy when more queries are running (system.metrics Query). None - no limit
+    """
+
+    max_merges: int = None
+    """
+    server is busy when more background merges are running (system.metrics Merge). None - no limit
+    """
+
+
+@slotted
+@dataclass
+class ClickhouseMergeCandidateModel(BaseModel):
+    """
+    active parts of partition
+    """
+    database: str
+    table: str
+    partition: str
+    partition_id: str
+
+    parts: int
+    rows: int
+    bytes_on_disk: int
+    disks: List[str]
@@ -0,0 +1,19 @@
+from dataclasses import dataclass, field
+from typing import List
+
+from .column import ClickhouseColumnModel
+from .db import ClickhouseDbModel
+from .partition import ClickhousePartitionModel
+from .table import ClickhouseTableModel
+from .._base_model import BaseModel
+
+
+@dataclass
+class ClickhouseMetadataSnapshotModel(BaseModel):
+    """
+    metadata of databases at a point in time. see: ClickhouseProtocol.get_metadata_snapshot, create_plan
+    """
+    databases: List[ClickhouseDbModel] = field(default_factory=list)
+    tables: List[ClickhouseTableModel] = field(default_factory=list)
+    columns: List[ClickhouseColumnModel] = field(default_factory=list)
+    partitions: List[ClickhousePartitionModel] = field(default_factory=list)
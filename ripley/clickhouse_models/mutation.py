@@ -0,0 +1,21 @@
+from dataclasses import dataclass
+from datetime import datetime
+
+from .._base_model import BaseModel, slotted
+
+
+@slotted
+@dataclass
+class ClickhouseMutationModel(BaseModel):
+    database: str
+    table: str
+    mutation_id: str
+    command: str
+    latest_failed_part: str
+    latest_fail_reason: str
+
+    parts_to_do: int
+    is_done: int
+    is_killed: int
+
+    create_time: datetime
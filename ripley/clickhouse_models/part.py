@@ -0,0 +1,30 @@
+from dataclasses import dataclass
+from datetime import date, datetime
+
+from .._base_model import BaseModel, slotted
+
+
+@slotted
+@dataclass
+class ClickhousePartModel(BaseModel):
+    database: str
+    table: str
+    partition: str
+    partition_id: str
+    name: str
+    part_type: str
+    disk_name: str
+
+    active: int
+    level: int
+    rows: int
+    marks: int
+    bytes_on_disk: int
+    data_compressed_bytes: int
+    data_uncompressed_bytes: int
+    min_block_number: int
+    max_block_number: int
+
+    modification_time: datetime
+    max_date: date
+    max_time: datetime
@@ -0,0 +1,27 @@
+from dataclasses import dataclass
+from typing import List
+
+from .._base_model import BaseModel, slotted
+
+
+@slotted
+@dataclass
+class ClickhousePlanStepModel(BaseModel):
+    """
+    recorded command of plan. see: ClickhouseProtocol.create_plan
+    """
+    index: int
+    cmd: str
+    """
+    command class name. 'exec' for raw SQL
+    """
+    sql: str
+    """
+    SQL with masked credentials
+    """
+    level: int
+    """
+    steps of the same level are independent and executed in parallel
+    """
+    depends_on: List[int]
+    on_cluster: str
@@ -0,0 +1,27 @@
+from dataclasses import dataclass
+
+from .._base_model import BaseModel
+
+
+@dataclass
+class ClickhousePoolSettingsModel(BaseModel):
+    """
+    pool of clients created by client factory. Each command checks out a client for its duration
+    """
+    min_size: int = 1
+    max_size: int = 8
+
+    idle_timeout: float = 300
+    """
+    seconds. Idle clients above {min_size} are disconnected and removed
+    """
+
+    ping_after_idle: float = 30
+    """
+    seconds. Clients idle for longer are checked via ping before checkout. Broken clients are replaced
+    """
+
+    checkout_timeout: float = None
+    """
+    seconds to wait for a free client when {max_size} clients are busy. None - wait forever
+    """
@@ -1,10 +1,10 @@
-from copy import deepcopy
 from dataclasses import dataclass
 from ipaddress import IPv6Address
 
-from .._base_model import BaseModel
+from .._base_model import BaseModel, slotted
 
 
+@slotted
 @dataclass
 class ClickhouseProcessModel(BaseModel):
     current_database: str
@@ -48,14 +48,58 @@ class ClickhouseProcessModel(BaseModel):
     address: IPv6Address
     initial_address: IPv6Address
 
-    def __init__(self, *args, **kwargs):
-        kwargs_copy = deepcopy(kwargs)
-        for key, alias in (
-            ('ProfileEvents', 'profile_events'),
-            ('Settings', 'settings'),
-        ):
-            kwargs[alias] = kwargs[key]
-            del kwargs[alias]
-
-        self.args = args
-        self.kwargs = kwargs_copy
+
+@slotted
+@dataclass
+class ClickhouseProcessSummaryModel(BaseModel):
+    """
+    projection of system.processes without settings, profile events and client info
+    """
+    query_id: str
+    user: str
+    query_kind: str
+    query: str
+    elapsed: float
+    read_rows: int
+    read_bytes: int
+    written_rows: int
+    memory_usage: int
+    peak_memory_usage: int
+    is_cancelled: int
+
+
+@dataclass
+class ClickhouseProcessKillRuleModel(BaseModel):
+    """
+    KILL QUERY when any of limits is exceeded. see: ClickhouseProtocol.watch_processes
+    """
+    user: str = ''
+    """
+    empty - any user
+    """
+
+    query_kind: str = ''
+    """
+    Select, Insert, Alter... Empty - any kind
+    """
+
+    max_elapsed: float = None
+    max_memory_usage: int = None
+    max_read_rows: int = None
+
+
+@slotted
+@dataclass
+class ClickhouseProcessEventModel(BaseModel):
+    """
+    change of system.processes. see: ClickhouseProtocol.watch_processes
+    """
+    kind: str
+    """
+    new, changed, finished or killed
+    """
+    process: ClickhouseProcessSummaryModel
+    rule: ClickhouseProcessKillRuleModel = None
+    """
+    rule of killed process
+    """
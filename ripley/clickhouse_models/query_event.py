@@ -0,0 +1,45 @@
+from dataclasses import dataclass
+
+from .._base_model import BaseModel, slotted
+
+
+@slotted
+@dataclass
+class ClickhouseQueryEventModel(BaseModel):
+    """
+    executed statement. see: ClickhouseProtocol.add_query_hook
+    """
+    cmd: str
+    """
+    command class name. 'exec' for raw SQL
+    """
+    sql: str
+    """
+    SQL with masked credentials
+    """
+    settings: dict
+    query_id: str
+    elapsed: float
+    read_rows: int = 0
+    read_bytes: int = 0
+    written_rows: int = 0
+    written_bytes: int = 0
+    error: BaseException = None
+
+
+@slotted
+@dataclass
+class ClickhouseQueryStatsModel(BaseModel):
+    """
+    wall time percentiles (seconds) per command. see: ClickhouseProtocol.set_query_stats
+    """
+    cmd: str
+    count: int
+    errors: int
+    total: float
+    p50: float
+    p95: float
+    p99: float
+    max: float
+    read_rows: int
+    written_rows: int
@@ -0,0 +1,32 @@
+from dataclasses import dataclass
+
+from .._base_model import BaseModel
+
+
+@dataclass
+class ClickhouseRetentionPolicyModel(BaseModel):
+    """
+    see: ClickhouseProtocol.drop_expired_partitions. One of keep_days / keep_months is required
+    """
+    keep_days: int = None
+    """
+    partitions which newest date is older than today - N days are expired
+    """
+
+    keep_months: int = None
+    """
+    partitions which newest date is older than today - N months are expired
+    """
+
+    by: str = 'partition'
+    """
+    partition - newest date of partition value. Date is taken from first element of partition key which is
+    Date / DateTime column, toYYYYMM, toYYYYMMDD, toMonday, toDate, toStartOfMonth, toStartOfDay.
+    Partitions of other keys (e.g. integer ids like 20230101) are kept.
+    max_time - newest max_date / max_time of active parts. Partitions without date in partition key are kept
+    """
+
+    batch_size: int = 100
+    """
+    partitions per ALTER TABLE ... DROP PARTITION ID ..., DROP PARTITION ID ...
+    """
@@ -0,0 +1,15 @@
+from dataclasses import dataclass
+
+from .._base_model import BaseModel, slotted
+
+
+@slotted
+@dataclass
+class ClickhouseS3ManifestModel(BaseModel):
+    """
+    exported S3 object. see: ClickhouseProtocol.insert_table_to_s3_by_partitions
+    """
+    url: str
+    partition_id: str
+    rows: int
+    bytes: int
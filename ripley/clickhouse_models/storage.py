@@ -0,0 +1,92 @@
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import List
+
+from .._base_model import BaseModel, slotted
+
+
+@slotted
+@dataclass
+class ClickhouseVolumeModel(BaseModel):
+    policy_name: str
+    volume_name: str
+    volume_type: str
+    disks: List[str]
+
+    volume_priority: int
+    max_data_part_size: int
+
+    move_factor: float
+
+
+@slotted
+@dataclass
+class ClickhousePartitionDiskModel(BaseModel):
+    """
+    active parts of partition on one disk
+    """
+    database: str
+    table: str
+    partition: str
+    partition_id: str
+    disk_name: str
+
+    bytes_on_disk: int
+
+    max_date: date
+    max_time: datetime
+
+
+@dataclass
+class ClickhouseTierRuleModel(BaseModel):
+    """
+    partition placement rule. One of volume / disk is required. see: ClickhouseProtocol.plan_partition_moves
+    """
+    volume: str = ''
+    """
+    target volume of table storage policy
+    """
+
+    disk: str = ''
+    """
+    target disk of table storage policy
+    """
+
+    min_age_days: int = None
+    """
+    partitions which max_date / max_time is older than N days. Partitions without date in partition key are skipped
+    """
+
+    max_disk_usage: float = None
+    """
+    0..1 - used share of each disk out of target. Oldest partitions are moved until usage is below
+    """
+
+
+@slotted
+@dataclass
+class ClickhousePartitionMoveModel(BaseModel):
+    database: str
+    table: str
+    partition: str
+    partition_id: str
+    disk_name: str
+    """
+    current disk
+    """
+
+    to_type: str
+    """
+    DISK or VOLUME
+    """
+
+    to_name: str
+    bytes_on_disk: int
+    reason: str
+    """
+    min_age_days or max_disk_usage
+    """
+
+    @property
+    def key(self) -> str:
+        return f'{self.database}.{self.table}/{self.partition_id}'
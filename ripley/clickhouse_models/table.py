@@ -3,9 +3,10 @@ from datetime import datetime
 from typing import List, Tuple
 from uuid import UUID
 
-from .._base_model import BaseModel
+from .._base_model import BaseModel, slotted
 
 
+@slotted
 @dataclass
 class ClickhouseTableModel(BaseModel):
     partition_key: str
@@ -52,3 +53,29 @@ class ClickhouseTableModel(BaseModel):
     @property
     def full_name(self) -> str:
         return f'{self.database}.{self.name}'
+
+
+@slotted
+@dataclass
+class ClickhouseTableSummaryModel(BaseModel):
+    """
+    lightweight projection of system.tables without DDL / paths / dependencies
+    """
+    database: str
+    name: str
+    engine: str
+    partition_key: str
+    sorting_key: str
+    primary_key: str
+    storage_policy: str
+
+    total_rows: int
+    total_bytes: int
+    parts: int
+    active_parts: int
+
+    metadata_modification_time: datetime
+
+    @property
+    def full_name(self) -> str:
+        return f'{self.database}.{self.name}'
@@ -0,0 +1,29 @@
+from dataclasses import dataclass
+
+from .._base_model import BaseModel
+
+
+@dataclass
+class ClickhouseWaitSettingsModel(BaseModel):
+    """
+    polling of wait_for_mutations, wait_for_merges
+    """
+    timeout: float = None
+    """
+    seconds. TimeoutError is raised when work is not finished in time. None - no limit
+    """
+
+    initial_delay: float = 0.1
+    """
+    seconds before the second poll
+    """
+
+    max_delay: float = 5
+    """
+    upper limit of delay between polls
+    """
+
+    multiplier: float = 2
+    """
+    growth of delay after each poll
+    """
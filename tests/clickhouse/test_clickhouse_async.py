@@ -0,0 +1,83 @@
+import asyncio
+import unittest
+
+from ripley import from_clickhouse_async
+from tests.clickhouse._base_test import BaseClickhouseTest, DB, _client
+
+
+class TestClickhouseAsync(BaseClickhouseTest, unittest.IsolatedAsyncioTestCase):
+    clickhouse_async = from_clickhouse_async(_client)
+
+    async def test_gather(self):
+        table_name = 'async_gather'
+        self.create_test_table(table_name, DB.RIPLEY_TESTS.value)
+
+        table, partitions, columns = await asyncio.gather(
+            self.clickhouse_async.get_table_by_name(table_name, DB.RIPLEY_TESTS.value),
+            self.clickhouse_async.get_table_partitions(table_name, DB.RIPLEY_TESTS.value),
+            self.clickhouse_async.get_table_columns(table_name, DB.RIPLEY_TESTS.value),
+        )
+
+        self.assertEqual(table, self.clickhouse.get_table_by_name(table_name, DB.RIPLEY_TESTS.value))
+        self.assertEqual(partitions, self.clickhouse.get_table_partitions(table_name, DB.RIPLEY_TESTS.value))
+        self.assertEqual(columns, self.clickhouse.get_table_columns(table_name, DB.RIPLEY_TESTS.value))
+
+    async def test_partitions_and_exec(self):
+        table_name = 'async_partitions'
+        self.create_test_table(table_name, DB.RIPLEY_TESTS.value)
+        table = await self.clickhouse_async.get_table_by_name(table_name, DB.RIPLEY_TESTS.value)
+
+        await self.clickhouse_async.drop_partition(table, '2024-01-01')
+        partitions = [p async for p in self.clickhouse_async.iter_table_partitions(table_name, DB.RIPLEY_TESTS.value)]
+
+        self.assertEqual(['2025-01-01'], [p.partition for p in partitions])
+        self.assertEqual([(334,)], await self.clickhouse_async.exec(f'SELECT count() FROM {table.full_name}'))
+
+
+class _AsyncConnection:
+    database = DB.RIPLEY_TESTS.value
+
+    async def ping(self) -> bool:
+        return False
+
+
+class _AsyncClient:
+    """
+    async driver: coroutine execute, execute_iter and connection methods
+    """
+
+    def __init__(self) -> None:
+        self.queries = []
+
+    def get_connection(self) -> _AsyncConnection:
+        return _AsyncConnection()
+
+    async def disconnect(self) -> None:
+        pass
+
+    async def execute(self, sql: str, with_column_types: bool = False, **kwargs):
+        self.queries.append(sql)
+        rows = [(1, )]
+        return (rows, [('value', 'UInt8')]) if with_column_types else rows
+
+    async def execute_iter(self, sql: str, **kwargs):
+        self.queries.append(sql)
+
+        async def _rows():
+            yield [('name', 'String')]
+            for name in ('db1', 'db2'):
+                yield (name, )
+
+        return _rows()
+
+
+class TestClickhouseAsyncDriver(unittest.IsolatedAsyncioTestCase):
+    async def test_async_driver(self):
+        client = _AsyncClient()
+        clickhouse = from_clickhouse_async(client)
+
+        self.assertEqual([(1, )], await clickhouse.exec('SELECT 1'))
+        self.assertIs(False, await clickhouse.ping())
+        self.assertEqual(['db1', 'db2'], [db.name async for db in clickhouse.iter_databases(['name'])])
+        self.assertEqual(DB.RIPLEY_TESTS.value, clickhouse.active_db)
+        self.assertEqual(2, len(client.queries))
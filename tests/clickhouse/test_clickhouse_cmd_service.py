@@ -0,0 +1,67 @@
+import pickle
+import sys
+import unittest
+from dataclasses import dataclass, field
+
+from ripley._base_model import BaseModel, slotted
+from ripley._clickhouse.cmd_service import _get_record_factory
+from ripley.clickhouse_models.partition import ClickhousePartitionModel
+
+
+@slotted
+@dataclass
+class _Model(BaseModel):
+    name: str
+    rows: int
+    comment: str = 'default'
+    tags: list = field(default_factory=list)
+
+
+class TestClickhouseRecordFactory(unittest.TestCase):
+    def test_columns_order(self):
+        to_record = _get_record_factory(_Model, ('rows', 'comment', 'name', 'tags'))
+        self.assertEqual(_Model('table', 10, 'comment', ['tag']), to_record((10, 'comment', 'table', ['tag'])))
+
+    def test_unknown_columns(self):
+        to_record = _get_record_factory(_Model, ('unknown', 'name', 'rows', 'other'))
+        self.assertEqual(_Model('table', 10), to_record((1, 'table', 10, 2)))
+
+    def test_missing_fields(self):
+        to_record = _get_record_factory(_Model, ('name', ))
+        record = to_record(('table', ))
+        # projection: required fields which are not selected are None, others get defaults
+        self.assertEqual(_Model('table', None), record)
+        self.assertEqual('default', record.comment)
+        self.assertIsNot(record.tags, to_record(('table', )).tags)
+
+    def test_dict_and_plain_class(self):
+        self.assertEqual({'a': 1, 'b': 2}, _get_record_factory(None, ('a', 'b'))((1, 2)))
+        self.assertEqual({'a': 1}, _get_record_factory(lambda **kwargs: kwargs, ('a', ))((1, )))
+
+    @unittest.skipIf(sys.version_info < (3, 10), 'kw_only requires python 3.10')
+    def test_kw_only_fields(self):
+        @dataclass(kw_only=True)
+        class KwOnlyModel(BaseModel):
+            name: str
+            rows: int = 0
+
+        to_record = _get_record_factory(KwOnlyModel, ('rows', 'name'))
+        self.assertEqual(KwOnlyModel(name='table', rows=10), to_record((10, 'table')))
+
+
+class TestSlottedModel(unittest.TestCase):
+    def test_slots(self):
+        record = _Model('table', 10)
+        self.assertFalse(hasattr(record, '__dict__'))
+        self.assertEqual(('name', 'rows', 'comment', 'tags'), _Model.__slots__)
+        with self.assertRaises(AttributeError):
+            record.unknown = 1
+
+    def test_equality(self):
+        self.assertEqual(_Model('table', 10), _Model('table', 10))
+        self.assertNotEqual(_Model('table', 10), _Model('table', 11))
+        self.assertNotEqual(_Model('table', 10), ('table', 10, 'default', []))
+
+    def test_pickle(self):
+        record = _get_record_factory(ClickhousePartitionModel, ('partition', 'rows'))(('2024-01-01', 10))
+        self.assertEqual(record, pickle.loads(pickle.dumps(record)))
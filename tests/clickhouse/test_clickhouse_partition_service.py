@@ -1,7 +1,10 @@
-from datetime import datetime
+from datetime import date, datetime
 
 from parameterized import parameterized
 
+from ripley.clickhouse_models.bulk_settings import ClickhouseBulkSettingsModel
+from ripley.clickhouse_models.merge_schedule import ClickhouseMergeScheduleSettingsModel
+from ripley.clickhouse_models.retention import ClickhouseRetentionPolicyModel
 from tests.clickhouse._base_test import BaseClickhouseTest, DB
 
 
@@ -140,3 +143,105 @@ class TestClickhousePartitionService(BaseClickhouseTest):
 
         active = select_is_active(table_name, db_name, partition)
         self.assertEqual(active, [(1,)])
+
+    def test_bulk_detach_attach_partitions(self):
+        db_name = DB.RIPLEY_TESTS.value
+        table_name = 'bulk_detach_attach_partitions'
+        self.create_test_table(table_name, db_name)
+        table = self.clickhouse.get_table_by_name(table_name, db_name)
+        partitions = self.clickhouse.get_table_partitions(table_name, db_name)
+        settings = ClickhouseBulkSettingsModel(max_workers=2)
+
+        results = self.clickhouse.detach_partitions(table, partitions, settings)
+        self.assertEqual([('2024-01-01', True), ('2025-01-01', True)], [(r.key, r.success) for r in results])
+        self.assertListEqual([], self.clickhouse.get_table_partitions(table_name, db_name))
+
+        results = self.clickhouse.attach_partitions(table, ['2024-01-01', 'unknown'], settings)
+        self.assertEqual([('2024-01-01', True), ('unknown', False)], [(r.key, r.success) for r in results])
+        self.assertEqual(
+            ['2024-01-01'],
+            [p.partition for p in self.clickhouse.get_table_partitions(table_name, db_name)],
+        )
+
+    def test_batch_partitions(self):
+        table_name = 'batch_partitions'
+        self.create_test_table(table_name, DB.RIPLEY_TESTS.value)
+        table = self.clickhouse.get_table_by_name(table_name, DB.RIPLEY_TESTS.value)
+        settings = ClickhouseBulkSettingsModel(batch_size=10)
+
+        results = self.clickhouse.detach_partitions(table, ['2024-01-01', '2025-01-01'], settings)
+        self.assertEqual([('2024-01-01', True), ('2025-01-01', True)], [(r.key, r.success) for r in results])
+        self.assertListEqual([], self.clickhouse.get_table_partitions(table_name, DB.RIPLEY_TESTS.value))
+
+        results = self.clickhouse.attach_partitions(table, ['2024-01-01', 'unknown'], settings)
+        self.assertEqual([('2024-01-01', False), ('unknown', False)], [(r.key, r.success) for r in results])
+        results = self.clickhouse.attach_partitions(table, ['2024-01-01', '2025-01-01'], settings)
+        self.assertEqual([('2024-01-01', True), ('2025-01-01', True)], [(r.key, r.success) for r in results])
+        self.assertEqual(1000, self.clickhouse.get_table_by_name(table_name, DB.RIPLEY_TESTS.value).total_rows)
+
+        # merged parts stay inactive for a while
+        self.clickhouse.exec(f"INSERT INTO {table.full_name} VALUES (1, 'new', '2025-01-01')")
+        self.clickhouse.exec(f'OPTIMIZE TABLE {table.full_name} FINAL')
+        partitions = self.clickhouse.get_table_partitions(table_name, DB.RIPLEY_TESTS.value)
+        self.assertTrue(any(not partition.active for partition in partitions))
+
+        results = self.clickhouse.detach_partitions(table, partitions + partitions, settings)
+        self.assertEqual([('2024-01-01', True), ('2025-01-01', True)], [(r.key, r.success) for r in results])
+        partitions = self.clickhouse.get_table_partitions(table_name, DB.RIPLEY_TESTS.value)
+        self.assertListEqual([], [partition for partition in partitions if partition.active])
+
+    def test_optimize_partitions(self):
+        table_name = 'optimize_partitions'
+        self.create_test_table(table_name, DB.RIPLEY_TESTS.value)
+        table = self.clickhouse.get_table_by_name(table_name, DB.RIPLEY_TESTS.value)
+        self.clickhouse.exec(f'SYSTEM STOP MERGES {table.full_name}')
+        for key in range(3):
+            self.clickhouse.exec(f"INSERT INTO {table.full_name} VALUES ({key}, 'new', '2025-01-01')")
+
+        candidates = self.clickhouse.plan_merges(table, ClickhouseMergeScheduleSettingsModel(min_parts=2))
+        self.assertEqual([('20250101', 4)], [(candidate.partition_id, candidate.parts) for candidate in candidates])
+
+        self.clickhouse.exec(f'SYSTEM START MERGES {table.full_name}')
+        settings = ClickhouseMergeScheduleSettingsModel(final=True, max_queries=100)
+        results = self.clickhouse.optimize_partitions(table, settings)
+        self.assertEqual([('20250101', True)], [(result.key, result.success) for result in results])
+        parts = self.clickhouse.get_table_parts(table_name, DB.RIPLEY_TESTS.value)
+        self.assertEqual(['20240101', '20250101'], [part.partition_id for part in parts if part.active])
+
+    @parameterized.expand([
+        ['partition'],
+        ['max_time'],
+    ])
+    def test_drop_expired_partitions(self, by: str):
+        table_name = 'drop_expired_partitions'
+        self.create_test_table(table_name, DB.RIPLEY_TESTS.value)
+        table = self.clickhouse.get_table_by_name(table_name, DB.RIPLEY_TESTS.value)
+        policy = ClickhouseRetentionPolicyModel(keep_days=(date.today() - date(2024, 6, 1)).days, by=by, batch_size=1)
+
+        expired = self.clickhouse.get_expired_partitions(table, policy)
+        self.assertEqual(['2024-01-01'], [partition.partition for partition in expired])
+
+        results = self.clickhouse.drop_expired_partitions(table, policy)
+        self.assertEqual([('20240101', True)], [(result.key, result.success) for result in results])
+        self.assertEqual(
+            ['2025-01-01'],
+            [partition.partition for partition in self.clickhouse.get_table_partitions(table_name, DB.RIPLEY_TESTS.value)],
+        )
+
+    @parameterized.expand([
+        ['partition'],
+        ['max_time'],
+    ])
+    def test_expired_partitions_of_integer_key(self, by: str):
+        # tenant ids look like YYYYMM / YYYYMMDD but are not dates
+        self.clickhouse.exec(f"""
+            CREATE TABLE {DB.RIPLEY_TESTS.value}.expired_integer_key (tenant_id UInt32, value String)
+            ENGINE MergeTree PARTITION BY tenant_id ORDER BY value
+            AS SELECT arrayJoin([199912, 20230101]), 'value'
+        """)
+        table = self.clickhouse.get_table_by_name('expired_integer_key', DB.RIPLEY_TESTS.value)
+        policy = ClickhouseRetentionPolicyModel(keep_days=1, by=by)
+
+        self.assertEqual([], self.clickhouse.get_expired_partitions(table, policy))
+        self.assertEqual([], self.clickhouse.drop_expired_partitions(table, policy))
+        self.assertEqual(2, len(self.clickhouse.get_table_partitions('expired_integer_key', DB.RIPLEY_TESTS.value)))
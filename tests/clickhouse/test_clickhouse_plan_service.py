@@ -0,0 +1,35 @@
+import unittest
+
+from ripley._clickhouse.plan_service import RawSql, get_dependencies, group_cluster_alters, merge_cluster_alters
+from ripley._sql_cmd.clickhouse import DropPartitionOnClusterCmd, TruncateOnClusterCmd
+
+
+class TestClickhousePlanGroups(unittest.TestCase):
+    def test_group_cluster_alters(self):
+        cmds = [
+            DropPartitionOnClusterCmd('db.table', 'a', 'cluster'),
+            DropPartitionOnClusterCmd('db.table', 'b', 'cluster'),
+            DropPartitionOnClusterCmd('db.table2', 'a', 'cluster'),
+            DropPartitionOnClusterCmd('db.table', 'c', 'cluster'),
+            DropPartitionOnClusterCmd('db.table', 'd'),
+            TruncateOnClusterCmd('db.table', 'cluster'),
+            RawSql('SYSTEM FLUSH LOGS'),
+            DropPartitionOnClusterCmd('db.table', 'e', 'cluster'),
+        ]
+
+        groups = group_cluster_alters(cmds, get_dependencies(cmds))
+        self.assertEqual([[0, 1], [2], [3], [4], [5], [6], [7]], groups)
+        self.assertEqual(
+            ["ALTER TABLE db.table ON CLUSTER 'cluster' DROP PARTITION 'a', DROP PARTITION 'b'"],
+            [cmd.to_sql() for cmd in merge_cluster_alters([cmds[ix] for ix in groups[0]])],
+        )
+
+    def test_dependency_of_next_alter(self):
+        # second ALTER waits for a step which the first one doesn't: statements are not merged
+        cmds = [
+            TruncateOnClusterCmd('db.table2', 'cluster'),
+            DropPartitionOnClusterCmd('db.table', 'a', 'cluster'),
+            DropPartitionOnClusterCmd('db.table', 'b', 'cluster'),
+        ]
+        dependencies = [[], [], [0, 1]]
+        self.assertEqual([[0], [1], [2]], group_cluster_alters(cmds, dependencies))
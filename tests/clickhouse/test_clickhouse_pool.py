@@ -0,0 +1,48 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+from clickhouse_driver import Client
+
+from ripley import from_clickhouse
+from ripley.clickhouse_models.pool_settings import ClickhousePoolSettingsModel
+from tests.clickhouse._base_test import BaseClickhouseTest, DB
+
+
+class TestClickhousePool(BaseClickhouseTest):
+    def test_pool(self):
+        table_name = 'pool'
+        self.create_test_table(table_name, DB.RIPLEY_TESTS.value)
+        clients: List[Client] = []
+
+        def _client_factory() -> Client:
+            clients.append(Client(host='localhost', port=9000, user='default', password='',
+                                  database=DB.RIPLEY_TESTS.value))
+            return clients[-1]
+
+        with from_clickhouse(_client_factory, ClickhousePoolSettingsModel(min_size=1, max_size=4)) as clickhouse:
+            self.assertTrue(clickhouse.ping())
+            self.assertEqual(DB.RIPLEY_TESTS.value, clickhouse.active_db)
+
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                results = list(executor.map(
+                    lambda _: clickhouse.exec(f'SELECT (SELECT count() FROM {table_name}), sleep(0.1)'),
+                    range(8),
+                ))
+
+            self.assertEqual([[(1000, 0)]] * 8, results)
+            self.assertEqual(4, len(clients))
+
+            # failed client is disconnected and reconnects on the next query
+            self.assertRaises(Exception, clickhouse.exec, 'SELECT unknown_function()')
+            self.assertEqual([(1, )], clickhouse.exec('SELECT 1'))
+
+        self.assertFalse(any(client.connection.connected for client in clients))
+
+    def test_nested_query_while_streaming(self):
+        records = self.clickhouse.iter_databases()
+        next(records)
+        with self.assertRaises(RuntimeError):
+            self.clickhouse.exec('SELECT 1')
+
+        records.close()
+        self.assertEqual([(1, )], self.clickhouse.exec('SELECT 1'))
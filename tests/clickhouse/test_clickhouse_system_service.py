@@ -1,9 +1,19 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from clickhouse_driver import Client
 from parameterized import parameterized
 
+from ripley import from_clickhouse
+from ripley.clickhouse_models.column import ClickhouseColumnSummaryModel
 from ripley.clickhouse_models.db import ClickhouseDbModel
 from ripley.clickhouse_models.disk import ClickhouseDiskModel
 from ripley.clickhouse_models.partition import ClickhousePartitionModel
-from ripley.clickhouse_models.table import ClickhouseTableModel
+from ripley.clickhouse_models.process import ClickhouseProcessKillRuleModel
+from ripley.clickhouse_models.remote_settings import ClickhouseRemoteSettingsModel
+from ripley.clickhouse_models.storage import ClickhouseTierRuleModel
+from ripley.clickhouse_models.table import ClickhouseTableModel, ClickhouseTableSummaryModel
+from ripley.clickhouse_models.wait_settings import ClickhouseWaitSettingsModel
 from tests.clickhouse._base_test import BaseClickhouseTest, DB
 
 
@@ -155,3 +165,203 @@ class TestClickhouseSystemService(BaseClickhouseTest):
             ],
             tables,
         )
+
+    def test_metadata_cache(self):
+        table_name = 'metadata_cache'
+        self.create_test_table(table_name, DB.RIPLEY_TESTS.value)
+        self.clickhouse.set_metadata_cache(ttl=60, max_size=2)
+        self.addCleanup(self.clickhouse.skip_metadata_cache)
+
+        table = self.clickhouse.get_table_by_name(table_name, DB.RIPLEY_TESTS.value)
+        self.assertEqual(table, self.clickhouse.get_table_by_name(table_name, DB.RIPLEY_TESTS.value))
+        stats = self.clickhouse.metadata_cache_stats
+        self.assertEqual((1, 1), (stats.hits, stats.misses))
+
+        self.clickhouse.truncate(table_name, DB.RIPLEY_TESTS.value)
+        table = self.clickhouse.get_table_by_name(table_name, DB.RIPLEY_TESTS.value)
+        self.assertEqual(0, table.total_rows)
+
+        self.clickhouse.get_table_columns(table_name, DB.RIPLEY_TESTS.value)
+        self.clickhouse.get_database_by_name(DB.RIPLEY_TESTS.value)
+        stats = self.clickhouse.metadata_cache_stats
+        self.assertEqual((1, 4, 1, 1, 2), (stats.hits, stats.misses, stats.invalidations, stats.evictions, stats.size))
+
+    def test_query_hooks(self):
+        table_name = 'query_hooks'
+        self.create_test_table(table_name, DB.RIPLEY_TESTS.value)
+        events = []
+        self.clickhouse.add_query_hook(events.append)
+        self.addCleanup(self.clickhouse.remove_query_hook, events.append)
+        self.clickhouse.set_query_stats()
+        self.addCleanup(self.clickhouse.skip_query_stats)
+
+        self.clickhouse.truncate(table_name, DB.RIPLEY_TESTS.value)
+        self.clickhouse.exec('SELECT * FROM numbers(100)')
+
+        self.assertEqual(['TruncateOnClusterCmd', 'exec'], [event.cmd for event in events])
+        self.assertEqual(100, events[1].read_rows)
+        self.assertTrue(all(event.query_id and event.error is None for event in events))
+        self.assertEqual(
+            [('exec', 1), ('TruncateOnClusterCmd', 1)],
+            sorted([(stats.cmd, stats.count) for stats in self.clickhouse.query_stats], reverse=True),
+        )
+
+    def test_query_hooks_mask_remote_password(self):
+        password = 'remote_password'
+        settings = ClickhouseRemoteSettingsModel('localhost:9000', DB.RIPLEY_TESTS.value, 'unknown', 'default', password)
+        events = []
+        self.clickhouse.add_query_hook(events.append)
+        self.addCleanup(self.clickhouse.remove_query_hook, events.append)
+
+        # default user has no password: remote queries fail after they are sent
+        self.assertRaises(Exception, self.clickhouse.get_remote_table_partitions, settings)
+        self.assertRaises(Exception, self.clickhouse.get_remote_metadata_snapshot, settings)
+        self.assertRaises(Exception, self.clickhouse.insert_from_remote, settings, 'unknown', create_table=True)
+
+        self.assertEqual(3, len(events))
+        self.assertTrue(all(password not in event.sql for event in events))
+
+    def test_process_watcher(self):
+        runaway = from_clickhouse(Client(host='localhost', port=9000, user='default', password=''))
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            future = executor.submit(
+                runaway.exec, 'SELECT sleepEachRow(0.5) FROM numbers(100) SETTINGS max_block_size = 1',
+            )
+            watcher = self.clickhouse.create_process_watcher([
+                ClickhouseProcessKillRuleModel(query_kind='Select', max_elapsed=0.5),
+            ])
+            kinds = set()
+            deadline = time.monotonic() + 10
+            while 'finished' not in kinds and time.monotonic() < deadline:
+                kinds.update(event.kind for event in watcher.poll() if 'sleepEachRow' in event.process.query)
+                time.sleep(0.2)
+
+            self.assertRaises(Exception, future.result)
+
+        self.assertTrue({'new', 'killed', 'finished'}.issubset(kinds))
+        self.assertTrue(all('queryID()' not in process.query for process in self.clickhouse.get_process_summaries()))
+
+    def test_wait_for_mutations(self):
+        table_name = 'wait_for_mutations'
+        self.create_test_table(table_name, DB.RIPLEY_TESTS.value)
+        self.clickhouse.exec(f"ALTER TABLE {table_name} UPDATE value = 'updated' WHERE 1")
+
+        progress = []
+        self.clickhouse.wait_for_mutations(
+            table_name,
+            DB.RIPLEY_TESTS.value,
+            settings=ClickhouseWaitSettingsModel(timeout=30, initial_delay=0.01),
+            progress=progress.append,
+        )
+        self.clickhouse.wait_for_merges(table_name, DB.RIPLEY_TESTS.value, partition_id='20240101')
+
+        self.assertListEqual([], progress[-1])
+        self.assertListEqual([], self.clickhouse.get_pending_mutations(table_name, DB.RIPLEY_TESTS.value))
+        self.assertEqual(
+            [(1000,)],
+            self.clickhouse.exec(f"SELECT count() FROM {table_name} WHERE value = 'updated'"),
+        )
+
+    def test_async_ddl_without_cluster(self):
+        self.clickhouse.set_async_ddl()
+        try:
+            self.create_test_table('async_ddl', DB.RIPLEY_TESTS.value)
+            self.clickhouse.truncate('async_ddl', DB.RIPLEY_TESTS.value)
+            # commands without ON CLUSTER are executed synchronously and are not tracked
+            self.assertListEqual([], self.clickhouse.ddl_tasks)
+            self.assertListEqual([], self.clickhouse.get_ddl_queue())
+            self.clickhouse.wait_for_ddl(ClickhouseWaitSettingsModel(timeout=1))
+        finally:
+            self.clickhouse.skip_async_ddl()
+
+        # command which never appears in distributed_ddl_queue is not finished
+        waiter = self.clickhouse._wait.create_ddl_waiter(['ripley-ddl-unknown'], ClickhouseWaitSettingsModel(timeout=1))
+        self.assertRaises(TimeoutError, waiter.wait)
+
+    def test_plan_partition_moves(self):
+        table_name = 'plan_partition_moves'
+        self.create_test_table(table_name, DB.RIPLEY_TESTS.value)
+        table = self.clickhouse.get_table_by_name(table_name, DB.RIPLEY_TESTS.value)
+
+        volumes = self.clickhouse.get_storage_volumes('default')
+        self.assertEqual([('default', 'default', ['default'])], [
+            (volume.policy_name, volume.volume_name, volume.disks) for volume in volumes
+        ])
+        partitions = self.clickhouse.get_partition_disks(table_name, DB.RIPLEY_TESTS.value)
+        self.assertEqual({'default'}, {partition.disk_name for partition in partitions})
+        self.assertEqual(table.total_bytes, sum(partition.bytes_on_disk for partition in partitions))
+
+        rules = [ClickhouseTierRuleModel(volume='default', min_age_days=0), ClickhouseTierRuleModel(disk='default')]
+        self.assertListEqual([], self.clickhouse.plan_partition_moves([table], rules))
+        self.assertListEqual([], self.clickhouse.move_partitions_to_storage([], max_bytes_per_second=1))
+        with self.assertRaises(ValueError):
+            self.clickhouse.plan_partition_moves([table], [ClickhouseTierRuleModel(volume='cold')])
+
+    @parameterized.expand([
+        [DB.RIPLEY_TESTS.value],
+        [DB.RIPLEY_TESTS2.value],
+    ])
+    def test_get_summaries(self, db_name: str):
+        table_name = 'get_summaries'
+        self.create_test_table(table_name, db_name)
+
+        tables = self.clickhouse.get_table_summaries(db_name)
+        self.assertListEqual(
+            [
+                ClickhouseTableSummaryModel(**{
+                    'database': db_name, 'name': table_name, 'engine': 'MergeTree', 'partition_key': 'day',
+                    'sorting_key': 'key', 'primary_key': 'key', 'storage_policy': 'default', 'total_rows': 1000,
+                    'total_bytes': 12667, 'parts': 2, 'active_parts': 2,
+                    'metadata_modification_time': tables[0].metadata_modification_time,
+                }),
+            ],
+            tables,
+        )
+
+        columns = self.clickhouse.get_column_summaries(table_name, db_name)
+        self.assertListEqual(
+            [('key', 'UInt64', 1), ('value', 'String', 2), ('day', 'Date', 3)],
+            [(column.name, column.type, column.position) for column in columns],
+        )
+        self.assertIsInstance(columns[0], ClickhouseColumnSummaryModel)
+
+    def test_fields_projection(self):
+        table_name = 'fields_projection'
+        self.create_test_table(table_name, DB.RIPLEY_TESTS.value)
+
+        table = self.clickhouse.get_table_by_name(table_name, DB.RIPLEY_TESTS.value, fields=['database', 'name'])
+        self.assertEqual(f'{DB.RIPLEY_TESTS.value}.{table_name}', table.full_name)
+        self.assertIsNone(table.create_table_query)
+
+        columns = self.clickhouse.get_table_columns(table_name, DB.RIPLEY_TESTS.value, fields=['name', 'type'])
+        self.assertListEqual(
+            [('key', 'UInt64', None), ('value', 'String', None), ('day', 'Date', None)],
+            [(column.name, column.type, column.compression_codec) for column in columns],
+        )
+
+    def test_iter_records(self):
+        table_name = 'iter_records'
+        self.create_test_table(table_name, DB.RIPLEY_TESTS.value)
+
+        self.assertListEqual(
+            self.clickhouse.get_table_partitions(table_name, DB.RIPLEY_TESTS.value),
+            list(self.clickhouse.iter_table_partitions(table_name, DB.RIPLEY_TESTS.value)),
+        )
+        self.assertListEqual(
+            self.clickhouse.get_table_columns(table_name, DB.RIPLEY_TESTS.value),
+            list(self.clickhouse.iter_table_columns(table_name, DB.RIPLEY_TESTS.value)),
+        )
+        self.assertListEqual(
+            self.clickhouse.get_tables_by_db(DB.RIPLEY_TESTS.value),
+            list(self.clickhouse.iter_tables_by_db(DB.RIPLEY_TESTS.value)),
+        )
+        self.assertListEqual([], list(self.clickhouse.iter_table_partitions('unknown', DB.RIPLEY_TESTS.value)))
+
+    def test_iter_records_break(self):
+        records = self.clickhouse._cmd.iter_records('SELECT number FROM system.numbers LIMIT 10000000')
+        for ix, rec in enumerate(records):
+            if ix == 10:
+                break
+
+        records.close()
+        self.assertEqual([(1,)], self.clickhouse.exec('SELECT 1'))
@@ -1,9 +1,12 @@
 import os
+import tempfile
 from datetime import datetime
+from typing import List
 
 import boto3
 from parameterized import parameterized
 
+from ripley.clickhouse_models.checkpoint_settings import ClickhouseCheckpointSettingsModel
 from ripley.clickhouse_models.s3_settings import ClickhouseS3SettingsModel, S3SelectSettingsModel
 from ripley.clickhouse_models.remote_settings import ClickhouseRemoteSettingsModel as RemoteSettings
 from tests.clickhouse._base_test import BaseClickhouseTest, DB
@@ -148,6 +151,186 @@ class TestClickhouseTableService(BaseClickhouseTest):
 
         self.assertEqual(result, [(1000, ), (1000, )])
 
+    def test_plan(self):
+        db_name = DB.RIPLEY_TESTS.value
+        self.create_test_table('plan_from', db_name)
+        snapshot = self.clickhouse.get_metadata_snapshot([db_name])
+        plan = self.clickhouse.create_plan(snapshot)
+
+        from_table = plan.get_table_by_name('plan_from', db_name)
+        for table_name in ['plan_to', 'plan_to2']:
+            to_table = plan.create_table_as(from_table, table_name, db_name)
+            plan.insert_from_table(from_table, to_table)
+
+        self.assertEqual(
+            [(0, 'CreateTableAsOnClusterCmd'), (1, 'BaseInsertIntoTableFromTable')] * 2,
+            [(step.level, step.cmd) for step in plan.steps],
+        )
+        self.assertIsNone(self.clickhouse.get_table_by_name('plan_to', db_name))
+        with self.assertRaises(NotImplementedError):
+            plan.wait_for_ddl()
+
+        results = plan.execute()
+        self.assertTrue(all(result.success for result in results))
+        result = self.clickhouse.exec(f"""
+            SELECT count() FROM {db_name}.plan_to
+             UNION ALL
+            SELECT count() FROM {db_name}.plan_to2
+        """)
+        self.assertEqual(result, [(1000, ), (1000, )])
+
+    def test_plan_insert_from_remote(self):
+        db_name = DB.RIPLEY_TESTS.value
+        self.create_test_table('plan_remote_from', db_name)
+        plan = self.clickhouse.create_plan(self.clickhouse.get_metadata_snapshot([db_name]))
+        from_table = plan.get_table_by_name('plan_remote_from', db_name)
+        plan.create_table_as(from_table, 'plan_remote_to', db_name)
+
+        settings = RemoteSettings('localhost:9000', db_name, 'plan_remote_from', 'default', '')
+        results = plan.insert_from_remote_by_partitions(settings, 'plan_remote_to', db_name)
+        self.assertEqual([('20240101', True), ('20250101', True)], [(r.key, r.success) for r in results])
+        self.assertIsNone(self.clickhouse.get_table_by_name('plan_remote_to', db_name))
+
+        self.assertTrue(all(result.success for result in plan.execute()))
+        self.assertEqual([(1000, )], self.clickhouse.exec(f'SELECT count() FROM {db_name}.plan_remote_to'))
+
+    @parameterized.expand([
+        [True],
+        [False],
+    ])
+    def test_insert_from_table_by_partitions(self, file_checkpoint: bool):
+        from_table_name = 'insert_by_partitions'
+        to_table_name = 'insert_by_partitions2'
+        self.create_test_table(from_table_name, DB.RIPLEY_TESTS.value)
+
+        from_table = self.clickhouse.get_table_by_name(from_table_name, DB.RIPLEY_TESTS.value)
+        to_table = self.clickhouse.create_table_as(from_table=from_table, table=to_table_name, db=DB.RIPLEY_TESTS2.value)
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            checkpoint = ClickhouseCheckpointSettingsModel(
+                name='insert_by_partitions',
+                file_path=os.path.join(tmp_dir, 'checkpoint') if file_checkpoint else '',
+                table='' if file_checkpoint else f'{DB.RIPLEY_TESTS2.value}.checkpoint',
+            )
+            results = self.clickhouse.insert_from_table_by_partitions(from_table, to_table, checkpoint)
+            self.assertEqual([('20240101', True), ('20250101', True)], [(r.key, r.success) for r in results])
+            # resume: all partitions are already copied
+            self.assertListEqual([], self.clickhouse.insert_from_table_by_partitions(from_table, to_table, checkpoint))
+
+        # repeated copy with replace doesn't duplicate rows
+        results = self.clickhouse.insert_from_table_by_partitions(from_table, to_table, replace=True)
+        self.assertEqual([('20240101', True), ('20250101', True)], [(r.key, r.success) for r in results])
+        result = self.clickhouse.exec(f'SELECT day, count() FROM {to_table.full_name} GROUP BY day ORDER BY day')
+        self.assertEqual([(datetime(2024, 1, 1).date(), 666), (datetime(2025, 1, 1).date(), 334)], result)
+
+        # append by default
+        self.clickhouse.insert_from_table_by_partitions(from_table, to_table)
+        self.assertEqual([(2000, )], self.clickhouse.exec(f'SELECT count() FROM {to_table.full_name}'))
+
+        other_key = self.clickhouse.create_table_as(
+            from_table=from_table, table='insert_by_partitions3', db=DB.RIPLEY_TESTS2.value, partition_by=['key'],
+        )
+        with self.assertRaises(ValueError):
+            self.clickhouse.insert_from_table_by_partitions(from_table, other_key, replace=True)
+
+    @parameterized.expand([
+        [False],
+        [True],
+    ])
+    def test_sync_table(self, from_remote: bool):
+        from_table_name = 'sync_table'
+        self.create_test_table(from_table_name, DB.RIPLEY_TESTS.value)
+        from_table = self.clickhouse.get_table_by_name(from_table_name, DB.RIPLEY_TESTS.value)
+        to_table = self.clickhouse.create_table_as(from_table=from_table, table=from_table_name, db=DB.RIPLEY_TESTS2.value)
+        self.clickhouse.insert_from_table(from_table, to_table)
+
+        self.clickhouse.exec(f"INSERT INTO {from_table.full_name} VALUES (1000, 'new', '2025-01-01')")
+        self.clickhouse.exec(f"INSERT INTO {to_table.full_name} VALUES (1000, 'vanished', '2026-01-01')")
+
+        def _sync():
+            if from_remote:
+                settings = RemoteSettings('localhost:9000', DB.RIPLEY_TESTS.value, from_table_name, 'default', '')
+                return self.clickhouse.sync_table_from_remote(settings, to_table, compare_hash=True)
+            return self.clickhouse.sync_table(from_table, to_table, compare_hash=True)
+
+        self.assertEqual(
+            [('20250101', 'copy', True), ('20260101', 'drop', True)],
+            sorted((result.key, result.value, result.success) for result in _sync()),
+        )
+        self.assertListEqual([], _sync())
+
+        result = self.clickhouse.exec(f'SELECT day, count() FROM {to_table.full_name} GROUP BY day ORDER BY day')
+        self.assertEqual([(datetime(2024, 1, 1).date(), 666), (datetime(2025, 1, 1).date(), 335)], result)
+
+    def test_sync_table_tuple_partition_key(self):
+        for db_name in (DB.RIPLEY_TESTS.value, DB.RIPLEY_TESTS2.value):
+            self.clickhouse.exec(f"""
+                CREATE TABLE {db_name}.sync_tuple (key UInt64, value String, day Date)
+                ENGINE MergeTree() PARTITION BY (day, key % 2) ORDER BY key
+            """)
+        from_table = self.clickhouse.get_table_by_name('sync_tuple', DB.RIPLEY_TESTS.value)
+        to_table = self.clickhouse.get_table_by_name('sync_tuple', DB.RIPLEY_TESTS2.value)
+        self.clickhouse.exec(f"INSERT INTO {from_table.full_name} VALUES (1, 'new', '2025-01-01')")
+        self.clickhouse.exec(f"INSERT INTO {to_table.full_name} VALUES (2, 'vanished', '2025-01-01')")
+
+        results = self.clickhouse.sync_table(from_table, to_table)
+        self.assertEqual([('copy', True), ('drop', True)], sorted((result.value, result.success) for result in results))
+        self.assertEqual([(1, 'new')], self.clickhouse.exec(f'SELECT key, value FROM {to_table.full_name}'))
+
+    def _get_shadow_tables(self) -> List[str]:
+        tables = self.clickhouse.exec(f"""
+            SELECT name FROM system.tables WHERE database = '{DB.RIPLEY_TESTS.value}' AND startsWith(name, 'rebuild_shadow')
+        """)
+        return [table[0] for table in tables]
+
+    def test_rebuild_table(self):
+        self.create_test_table('rebuild_from', DB.RIPLEY_TESTS.value)
+        self.clickhouse.exec(f"""
+            CREATE TABLE {DB.RIPLEY_TESTS.value}.rebuild (key UInt64, value String, day Date)
+            ENGINE ReplacingMergeTree(key) PARTITION BY day ORDER BY key TTL day + INTERVAL 100 YEAR
+            SETTINGS index_granularity = 4096 AS SELECT 1, 'old', '2023-01-01'
+        """)
+        # table of user with name of shadow table is kept
+        self.clickhouse.exec(f'CREATE TABLE {DB.RIPLEY_TESTS.value}.rebuild_shadow (key UInt64) ENGINE Log')
+        from_table = self.clickhouse.get_table_by_name('rebuild_from', DB.RIPLEY_TESTS.value)
+        table = self.clickhouse.get_table_by_name('rebuild', DB.RIPLEY_TESTS.value)
+
+        with self.assertRaises(RuntimeError):
+            self.clickhouse.rebuild_table(table, lambda shadow: None, expected_rows=1)
+        self.assertEqual(['rebuild_shadow'], self._get_shadow_tables())
+
+        engine_full = table.engine_full
+        table = self.clickhouse.rebuild_table_from_table(from_table, table)
+        self.assertEqual(1000, table.total_rows)
+        self.assertEqual(engine_full, table.engine_full)
+        self.assertIn('ReplacingMergeTree(key)', table.engine_full)
+        self.assertIn('TTL day + toIntervalYear(100)', table.engine_full)
+        self.assertEqual([(0, )], self.clickhouse.exec("SELECT countIf(value = 'old') FROM rebuild"))
+        self.assertEqual(['rebuild_shadow'], self._get_shadow_tables())
+
+    def test_advise_codecs(self):
+        self.create_test_table('advise_codecs', DB.RIPLEY_TESTS.value)
+        table = self.clickhouse.get_table_by_name('advise_codecs', DB.RIPLEY_TESTS.value)
+        advices = self.clickhouse.advise_codecs(table, sample_rows=500, codecs=['ZSTD(3)', 'Delta, ZSTD(1)', 'Gorilla'])
+
+        self.assertEqual(
+            {
+                'key': {'Default', 'ZSTD(3)', 'Delta, ZSTD(1)'},
+                'value': {'Default', 'ZSTD(3)'},
+                'day': {'Default', 'ZSTD(3)', 'Delta, ZSTD(1)'},
+            },
+            {advice.column: {candidate.codec for candidate in advice.candidates} for advice in advices},
+        )
+        for advice in advices:
+            sizes = [candidate.data_compressed_bytes for candidate in advice.candidates]
+            self.assertListEqual(sorted(sizes), sizes)
+            self.assertEqual(advice.best.codec != 'Default', bool(advice.alter))
+        self.assertListEqual(
+            ['advise_codecs'],
+            [table.name for table in self.clickhouse.get_tables_by_db(DB.RIPLEY_TESTS.value)
+             if table.name.startswith('advise_codecs')],
+        )
+
     @parameterized.expand([
         [DB.RIPLEY_TESTS.value],
         [DB.RIPLEY_TESTS2.value],
@@ -185,6 +368,35 @@ class TestClickhouseTableService(BaseClickhouseTest):
 
         self.assertEqual(contents, b'"value","day"\n"value","2024-01-01"\n')
 
+    def test_insert_to_s3_by_partitions(self):
+        table_name = 'to_s3_by_partitions'
+        settings = ClickhouseS3SettingsModel(
+            url='http://localhost:9001/ripley/events/{partition_id}.csv',
+            file_format='CSVWithNames',
+        )
+
+        self.clickhouse.exec(f"""CREATE TABLE {table_name} (value String, day Date)
+        ENGINE MergeTree() ORDER BY value PARTITION BY day
+        AS (SELECT 'value', toDate('2024-01-01') + number % 2 FROM numbers(3))""")
+
+        table = self.clickhouse.get_table_by_name(table_name)
+        results = self.clickhouse.insert_table_to_s3_by_partitions(
+            table,
+            settings,
+            manifest_url='http://localhost:9001/ripley/events/manifest.json',
+        )
+
+        self.assertTrue(all(result.success for result in results))
+        manifest = sorted([result.value for result in results], key=lambda item: item.partition_id)
+        self.assertEqual([(item.partition_id, item.rows) for item in manifest], [('20240101', 2), ('20240102', 1)])
+
+        contents = self.s3.get_object(Bucket=_S3_BUCKET, Key='events/20240102.csv')['Body'].read()
+        self.assertEqual(contents, b'"value","day"\n"value","2024-01-02"\n')
+        self.assertEqual(manifest[1].bytes, len(contents))
+
+        contents = self.s3.get_object(Bucket=_S3_BUCKET, Key='events/manifest.json')['Body'].read()
+        self.assertEqual(len(contents.splitlines()), 2)
+
     def test_select_from_s3(self):
         key = 'from_s3'
         table_name = 'from_s3'
@@ -205,6 +417,37 @@ class TestClickhouseTableService(BaseClickhouseTest):
         result = self.clickhouse.exec(f'SELECT * FROM {table_name}')
         self.assertEqual(result, [(1, 'system_events')])
 
+    def test_insert_from_s3_files(self):
+        table_name = 'from_s3_files'
+        for ix in range(3):
+            self.s3.put_object(Body=f'value,name\n{ix},file_{ix}', Bucket=_S3_BUCKET, Key=f'files/{ix}.csv')
+
+        self.clickhouse.exec(f'CREATE TABLE {table_name} (value UInt64, name String) ENGINE MergeTree() ORDER BY name')
+        table = self.clickhouse.get_table_by_name(table_name)
+        settings = ClickhouseS3SettingsModel(url='http://localhost:9001/ripley/files/*.csv', file_format='CSVWithNames')
+
+        results = self.clickhouse.insert_from_s3_files(table, settings, files_per_insert=2, ledger_table='s3_ledger')
+        self.assertEqual(sorted(result.value for result in results), [1, 2])
+        self.assertEqual(self.clickhouse.exec(f'SELECT count() FROM {table_name}'), [(3,)])
+
+        self.s3.put_object(Body='value,name\n3,file_3', Bucket=_S3_BUCKET, Key='files/3.csv')
+        results = self.clickhouse.insert_from_s3_files(table, settings, files_per_insert=2, ledger_table='s3_ledger')
+        self.assertEqual([result.key for result in results], ['http://localhost:9001/ripley/files/3.csv'])
+        self.assertEqual(self.clickhouse.exec(f'SELECT count() FROM {table_name}'), [(4,)])
+
+        # rewritten object of the same size: etag is changed
+        self.s3.put_object(Body='value,name\n5,file_5', Bucket=_S3_BUCKET, Key='files/0.csv')
+        results = self.clickhouse.insert_from_s3_files(table, settings, files_per_insert=2, ledger_table='s3_ledger')
+        self.assertEqual([result.key for result in results], ['http://localhost:9001/ripley/files/0.csv'])
+        self.assertEqual(self.clickhouse.exec(f'SELECT count() FROM {table_name}'), [(5,)])
+
+        # overlapping globs: each file is loaded once
+        self.clickhouse.truncate(table_name)
+        urls = ['http://localhost:9001/ripley/files/*.csv', 'http://localhost:9001/ripley/files/1.csv']
+        results = self.clickhouse.insert_from_s3_files(table, settings, urls, files_per_insert=1)
+        self.assertEqual(4, len(results))
+        self.assertEqual(self.clickhouse.exec(f'SELECT count() FROM {table_name}'), [(4,)])
+
     def test_s3_select_settings(self):
         key = 'from_s3'
         self.s3.put_object(
@@ -278,3 +521,63 @@ UNKNOWN_VALUE,2024-01-01,2025-01-01,eu-a1-123,Ridley Scott""",
                 ('new_value', datetime(2025, 1, 1).date()),
                 ('value', datetime(2024, 1, 1).date()),
             ])
+
+    def test_insert_from_remote_by_partitions(self):
+        remote_table = 'insert_from_remote_by_partitions'
+        self.create_test_table(remote_table, DB.RIPLEY_TESTS2.value)
+        settings = RemoteSettings('localhost:9000', DB.RIPLEY_TESTS2.value, remote_table, 'default', '')
+        checkpoint = ClickhouseCheckpointSettingsModel(
+            name=remote_table,
+            table=f'{DB.RIPLEY_TESTS.value}.checkpoint',
+        )
+
+        results = self.clickhouse.insert_from_remote_by_partitions(
+            settings, remote_table, DB.RIPLEY_TESTS.value, create_table=True, checkpoint=checkpoint,
+        )
+        self.assertEqual(
+            [('20240101', 666, True), ('20250101', 334, True)],
+            sorted((result.key, result.value, result.success) for result in results),
+        )
+        # resume: all partitions are already copied
+        self.assertListEqual(
+            [],
+            self.clickhouse.insert_from_remote_by_partitions(settings, remote_table, checkpoint=checkpoint),
+        )
+        self.assertEqual([(1000, )], self.clickhouse.exec(f'SELECT count() FROM {remote_table}'))
+
+    def test_insert_from_remote_snapshot(self):
+        for table in ['remote_snapshot1', 'remote_snapshot2']:
+            self.create_test_table(table, DB.RIPLEY_TESTS2.value)
+        self.clickhouse.exec(f"""
+            CREATE VIEW {DB.RIPLEY_TESTS2.value}.remote_snapshot_view AS
+            SELECT count() AS rows FROM {DB.RIPLEY_TESTS2.value}.remote_snapshot1
+        """)
+        settings = RemoteSettings('localhost:9000', DB.RIPLEY_TESTS2.value, '', 'default', '')
+
+        snapshot = self.clickhouse.get_remote_metadata_snapshot(settings)
+        self.assertEqual(
+            ['remote_snapshot1', 'remote_snapshot2', 'remote_snapshot_view'],
+            [table.name for table in snapshot.tables],
+        )
+        self.assertEqual(7, len(snapshot.columns))
+
+        results = self.clickhouse.insert_from_remote_snapshot(settings, snapshot, DB.RIPLEY_TESTS.value)
+        self.assertEqual(
+            [
+                ('remote_snapshot1/20240101', 666), ('remote_snapshot1/20250101', 334),
+                ('remote_snapshot2/20240101', 666), ('remote_snapshot2/20250101', 334),
+            ],
+            sorted((result.key, result.value) for result in results),
+        )
+        self.assertEqual(
+            [(1000, ), (1000, )],
+            self.clickhouse.exec('''
+                SELECT count() FROM remote_snapshot1
+                 UNION ALL
+                SELECT count() FROM remote_snapshot2
+            '''),
+        )
+
+        # view selects from the copy, not from the remote database
+        self.clickhouse.exec(f'TRUNCATE TABLE {DB.RIPLEY_TESTS2.value}.remote_snapshot1')
+        self.assertEqual([(1000, )], self.clickhouse.exec(f'SELECT rows FROM {DB.RIPLEY_TESTS.value}.remote_snapshot_view'))